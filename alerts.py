@@ -0,0 +1,228 @@
+import os
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('sintesa.alerts')
+
+# Batas panjang caption sendPhoto Telegram
+CAPTION_LIMIT = 1024
+
+_STOP = object()  # Penanda berhenti untuk thread pengirim
+
+
+class Alert:
+    def __init__(self, text, photo=None, photo_name='screenshot.jpg'):
+        self.text = text
+        self.photo = photo  # Isi file (bytes), dibaca saat antri agar tidak tergantung file di disk
+        self.photo_name = photo_name
+        self.attempts = 0
+
+
+class TelegramAlertDispatcher:
+    """
+    Pengirim notifikasi Telegram di thread latar belakang.
+
+    send() hanya memasukkan alert ke antrian (tidak pernah menunggu jaringan), sehingga
+    Telegram yang lambat atau tidak bisa dihubungi tidak menahan deteksi. Thread pengirim
+    memakai satu requests.Session (koneksi dipakai ulang), menjaga jeda min_interval antar
+    pesan ke chat yang sama, menghormati retry_after dari respons 429, dan mengulang
+    kegagalan lain dengan exponential backoff hingga max_retries kali. Pesan dengan
+    screenshot dikirim sebagai satu sendPhoto dengan pesan sebagai caption.
+    on_result(status, seconds) dipanggil setelah setiap alert selesai ('sent'/'failed'/'dropped').
+    Saat proses berhenti (atexit) sisa antrian, termasuk alert yang sedang menunggu retry,
+    dikirim paling lama drain_timeout detik; yang belum terkirim dicatat di log sebagai dropped.
+    """
+
+    def __init__(self, token, chat_id, api_url='https://api.telegram.org', timeout=10.0,
+                 max_retries=5, backoff_base=1.0, backoff_max=60.0, min_interval=1.0,
+                 queue_size=100, on_result=None, drain_timeout=30.0):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_interval = min_interval
+        self.queue_size = queue_size
+        self.on_result = on_result
+        self.drain_timeout = drain_timeout
+
+        self._queue = None
+        self._pending = 0  # Alert yang sudah diantrikan tetapi belum selesai (terkirim atau gagal)
+        self._abort = threading.Event()
+        self._thread = None
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_sent = 0.0
+        atexit.register(self.stop)
+
+    @property
+    def enabled(self):
+        return bool(self.token and self.chat_id)
+
+    def _ensure_started(self):
+        # Thread tidak ikut terbawa fork (mis. gunicorn --preload), jadi dibuat per proses saat dibutuhkan
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pending = 0
+            self._abort = threading.Event()
+            self._session = requests.Session()
+            self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            self._thread = threading.Thread(target=self._run, name='telegram-alerts', daemon=True)
+            self._thread.start()
+
+    def send(self, text, photo_path=None):
+        """Antrikan alert; mengembalikan False jika dinonaktifkan atau antrian penuh"""
+        if not self.enabled:
+            logger.debug("Telegram not configured, alert skipped: %s", text)
+            return False
+
+        photo = None
+        if photo_path:
+            try:
+                with open(photo_path, 'rb') as f:
+                    photo = f.read()
+            except OSError as e:
+                logger.error("Error reading photo %s: %s", photo_path, e)
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(Alert(text, photo, os.path.basename(photo_path or 'screenshot.jpg')))
+            with self._lock:
+                self._pending += 1
+            return True
+        except queue.Full:
+            logger.error("Telegram alert queue full, alert dropped: %s", text)
+            self._report('dropped', 0.0)
+            return False
+
+    def stop(self, timeout=None):
+        """
+        Kirim sisa antrian (paling lama timeout detik, default drain_timeout) lalu hentikan
+        thread pengirim. Mengembalikan jumlah alert yang tidak sempat terkirim.
+        """
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return 0
+        timeout = self.drain_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            # Batas waktu habis: hentikan retry yang sedang menunggu, sisanya tidak dikirim
+            self._abort.set()
+            self._thread.join(self.timeout)
+
+        with self._lock:
+            dropped, self._pending = self._pending, 0
+        if dropped:
+            logger.warning("%d Telegram alert(s) dropped at shutdown after waiting %.1fs", dropped, timeout)
+            for _ in range(dropped):
+                self._report('dropped', 0.0)
+        return dropped
+
+    def _report(self, status, seconds):
+        if self.on_result:
+            self.on_result(status, seconds)
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            if alert is _STOP:
+                break
+            start = time.perf_counter()
+            sent = self._deliver(alert)
+            if not sent and self._abort.is_set():
+                break  # Dihitung sebagai dropped oleh stop()
+            with self._lock:
+                self._pending -= 1
+            self._report('sent' if sent else 'failed', time.perf_counter() - start)
+        self._session.close()
+
+    def _deliver(self, alert):
+        while True:
+            alert.attempts += 1
+            try:
+                retry_after = self._post(alert)
+            except requests.RequestException as e:
+                logger.warning("Telegram request failed (attempt %d): %s", alert.attempts, e)
+                retry_after = None
+            else:
+                if retry_after == 0:
+                    return True
+
+            if alert.attempts > self.max_retries:
+                logger.error("Giving up on Telegram alert after %d attempts: %s", alert.attempts, alert.text)
+                return False
+
+            if retry_after is None:
+                # Exponential backoff dengan jitter
+                retry_after = min(self.backoff_base * 2 ** (alert.attempts - 1), self.backoff_max)
+                retry_after *= random.uniform(0.8, 1.2)
+            if self._abort.wait(retry_after):
+                return False
+
+    def _wait_for_slot(self):
+        wait = self._last_sent + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_sent = time.monotonic()
+
+    def _post(self, alert):
+        """
+        Kirim satu alert. Mengembalikan 0 jika berhasil, detik tunggu dari Telegram untuk
+        respons 429, atau None untuk kegagalan lain yang perlu diulang dengan backoff.
+        """
+        self._wait_for_slot()
+        base = f"{self.api_url}/bot{self.token}"
+
+        if alert.photo is not None and len(alert.text) <= CAPTION_LIMIT:
+            response = self._session.post(
+                f"{base}/sendPhoto",
+                data={'chat_id': self.chat_id, 'caption': alert.text, 'parse_mode': 'HTML'},
+                files={'photo': (alert.photo_name, alert.photo, 'image/jpeg')},
+                timeout=self.timeout
+            )
+        else:
+            response = self._session.post(
+                f"{base}/sendMessage",
+                data={'chat_id': self.chat_id, 'text': alert.text, 'parse_mode': 'HTML'},
+                timeout=self.timeout
+            )
+            if response.status_code == 200 and alert.photo is not None:
+                # Pesan terlalu panjang untuk caption: foto dikirim terpisah, sekali saja
+                alert.text = ''
+                return self._post(alert)
+
+        if response.status_code == 200:
+            logger.info("Telegram alert sent")
+            return 0
+        if response.status_code == 429:
+            try:
+                retry_after = response.json()['parameters']['retry_after']
+            except (ValueError, KeyError, TypeError):
+                retry_after = self.backoff_base
+            logger.warning("Telegram rate limit hit, retrying after %ss", retry_after)
+            return float(retry_after)
+        if 400 <= response.status_code < 500:
+            # Kesalahan permintaan (token/chat_id salah, dll) tidak akan berhasil jika diulang
+            logger.error("Telegram API error: %s - %s", response.status_code, response.text)
+            alert.attempts = self.max_retries + 1
+            return None
+        logger.warning("Telegram API error: %s - %s", response.status_code, response.text)
+        return None
@@ -1,119 +1,922 @@
-from flask import Flask, request, render_template, url_for, send_from_directory
+from metrics import Metrics, StartupTimer, load_snapshots, render_prometheus
+startup = StartupTimer()  # Dibuat sebelum import lain agar waktu import ikut terukur (flask --app app startup)
+
+from flask import Flask, request, render_template, url_for, send_from_directory, jsonify, Response, redirect
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from ultralytics import YOLO
 import os
 import cv2
 import time
 import glob
-import torch
-import requests
-from datetime import datetime
+import uuid
+import json
+import click
+import logging
+import shutil
+import tempfile
+import threading
+import base64
+import hashlib
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from moviepy import VideoFileClip
-import telegram
-import asyncio
+from video_io import FFmpegVideoReader, FFmpegVideoWriter, FrameRangeCapture, GrowingFileCapture, concat_videos, convert_video_for_browser, is_streamable, make_thumbnail
+from preprocessing import FramePreprocessor, restore_original
+from tiling import InferenceRegion, parse_roi, parse_room_rois
+from detections import DetectionRecorder, StoredDetections
+from pipeline import plan_shards, run_detection_pipeline
+from sampling import FixedStrideSampler, MotionSampler
+from inference import file_sha256, load_exported_model, warm_up
+from model_registry import (InferenceServer, ModelRegistry, RegistryModel, RemoteModelRegistry,
+                            parse_address, parse_model_versions, parse_traffic)
+from storage import ContentStore, find_orphans
+from streaming import CameraStream, StreamMonitor
+from alerts import TelegramAlertDispatcher
+from events import ConfidenceTrack, PeakFrames, segment_events
+startup.mark('imports')
 
 # Inisialisasi Flask
 app = Flask(__name__)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+# DATABASE_URL (mis. sqlite:///jobs.db) dapat dipakai untuk pengembangan lokal/testing
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+startup.mark('database')
 
 # Konfigurasi
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # Batas 100 MB untuk video
+app.config['INFERENCE_BATCH_SIZE'] = int(os.getenv('INFERENCE_BATCH_SIZE', 8))  # Jumlah frame per pemanggilan model
+app.config['PIPELINE_QUEUE_SIZE'] = int(os.getenv('PIPELINE_QUEUE_SIZE', 2))  # Batch yang boleh mengantri antar tahap pipeline
+
+# Decode: frame yang tidak diinferensi dan tidak ditulis ke video hasil hanya di-grab() (atau dilompati dengan seek)
+app.config['DECODE_MAX_WIDTH'] = int(os.getenv('DECODE_MAX_WIDTH', 0))  # Lebar frame decode mode detect (diperkecil ffmpeg), 0 = asli
+app.config['DECODE_HWACCEL'] = os.getenv('DECODE_HWACCEL', '')  # Decoder hardware ffmpeg (cuda, vaapi, videotoolbox, auto); kosong = OpenCV
+app.config['DECODE_SEEK_FRAMES'] = int(os.getenv('DECODE_SEEK_FRAMES', 250))  # Lompatan minimal yang memakai seek keyframe, 0 = selalu grab()
+
+# Pemilihan frame untuk inferensi: 'motion' (adaptif, lewati frame statis) atau 'fixed' (setiap frame ke-n)
+app.config['FRAME_SAMPLING'] = os.getenv('FRAME_SAMPLING', 'motion')
+app.config['SAMPLER_MIN_STRIDE'] = int(os.getenv('SAMPLER_MIN_STRIDE', 2))  # Stride saat ada deteksi / mode fixed
+app.config['SAMPLER_MAX_STRIDE'] = int(os.getenv('SAMPLER_MAX_STRIDE', 8))  # Stride maksimum saat ruangan sepi
+app.config['SAMPLER_MOTION_THRESHOLD'] = float(os.getenv('SAMPLER_MOTION_THRESHOLD', 0.005))  # Proporsi piksel berubah
+app.config['SAMPLER_IDLE_SECONDS'] = float(os.getenv('SAMPLER_IDLE_SECONDS', 2.0))  # Inferensi paksa saat tidak ada gerakan
+
+app.config['VIDEO_ENCODER_PRESET'] = os.getenv('VIDEO_ENCODER_PRESET', 'veryfast')  # Preset libx264 (ultrafast ... veryslow)
+app.config['VIDEO_ENCODER_CRF'] = int(os.getenv('VIDEO_ENCODER_CRF', 23))  # Kualitas libx264, makin kecil makin besar filenya
+app.config['VIDEO_PREVIEW_HEIGHT'] = int(os.getenv('VIDEO_PREVIEW_HEIGHT', 360))  # Rendition kecil untuk halaman detail, 0 = nonaktif
+app.config['VIDEO_PREVIEW_CRF'] = int(os.getenv('VIDEO_PREVIEW_CRF', 30))  # Kualitas rendition kecil (bitrate rendah)
+app.config['VIDEO_POSTER_WIDTH'] = int(os.getenv('VIDEO_POSTER_WIDTH', 320))  # Lebar thumbnail poster (JPEG)
+app.config['MEDIA_MAX_AGE'] = int(os.getenv('MEDIA_MAX_AGE', 0))  # Cache-Control file di uploads; 0 = selalu revalidasi (ETag)
+
+# Upload bertahap (chunked, bisa dilanjutkan); setiap chunk tetap dibatasi MAX_CONTENT_LENGTH
+app.config['UPLOAD_MAX_BYTES'] = int(os.getenv('UPLOAD_MAX_BYTES', 20 * 1024 ** 3))  # Ukuran total maksimum (20 GB)
+app.config['UPLOAD_PROGRESSIVE'] = os.getenv('UPLOAD_PROGRESSIVE', '1') == '1'  # Mulai deteksi sebelum upload selesai
+app.config['UPLOAD_PROGRESSIVE_MIN_BYTES'] = int(os.getenv('UPLOAD_PROGRESSIVE_MIN_BYTES', 8 * 1024 * 1024))
+app.config['UPLOAD_STALL_SECONDS'] = float(os.getenv('UPLOAD_STALL_SECONDS', 300.0))  # Decode berhenti menunggu data
+app.config['UPLOAD_EXPIRE_SECONDS'] = int(os.getenv('UPLOAD_EXPIRE_SECONDS', 24 * 3600))  # Upload terbengkalai dihapus
+
+# Pemrosesan paralel satu video panjang: dipecah per rentang waktu, setiap bagian di proses sendiri
+app.config['SHARD_PROCESSES'] = int(os.getenv('SHARD_PROCESSES', 1))  # 1 = nonaktif
+app.config['SHARD_MIN_SECONDS'] = float(os.getenv('SHARD_MIN_SECONDS', 120.0))  # Durasi minimum per bagian
+
+# Konfigurasi antrian pemrosesan video
+app.config['JOBS_INLINE'] = os.getenv('JOBS_INLINE', '0') == '1'  # Proses langsung di request (debug/testing)
+# Mode analisis default: full = video hasil teranotasi, detect = hanya deteksi (video hasil dirender saat diminta)
+app.config['ANALYSIS_MODE'] = os.getenv('ANALYSIS_MODE', 'full')
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))  # Jumlah proses worker
+app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 2.0))  # Detik antar pengecekan antrian
+app.config['JOB_STALE_SECONDS'] = int(os.getenv('JOB_STALE_SECONDS', 900))  # Job 'running' tanpa update dianggap mati
+
+# Konfigurasi cache hasil deteksi (menggantikan penghapusan file >1 jam)
+app.config['CACHE_MAX_AGE_SECONDS'] = int(os.getenv('CACHE_MAX_AGE_SECONDS', 7 * 24 * 3600))  # Hasil tidak dipakai > 7 hari diarsipkan
+app.config['CACHE_MAX_BYTES'] = int(os.getenv('CACHE_MAX_BYTES', 5 * 1024 ** 3))  # Kuota total file hasil (5 GB)
+app.config['ORPHAN_MAX_AGE_SECONDS'] = int(os.getenv('ORPHAN_MAX_AGE_SECONDS', 3600))  # File tanpa referensi DB
+app.config['RETENTION_INTERVAL'] = float(os.getenv('RETENTION_INTERVAL', 600))  # Detik antar retensi terjadwal di proses worker, 0 = nonaktif
+app.config['RETENTION_INDEX_BATCH'] = int(os.getenv('RETENTION_INDEX_BATCH', 500))  # Hasil lama yang diindeks per putaran retensi
+app.config['CONTENT_STORE_ENABLED'] = os.getenv('CONTENT_STORE_ENABLED', '1') == '1'  # Video asli dengan isi sama disimpan sekali (hard link)
+
+# Backend inferensi: 'torch' (PyTorch, MPS/CPU), 'onnx' (ONNX Runtime) atau 'openvino'
+app.config['INFERENCE_BACKEND'] = os.getenv('INFERENCE_BACKEND', 'torch')
+app.config['MODEL_CACHE_DIR'] = os.getenv('MODEL_CACHE_DIR', 'model_cache')  # Lokasi artefak hasil export
+app.config['MODEL_IMGSZ'] = int(os.getenv('MODEL_IMGSZ', 640))  # Ukuran input model hasil export
+app.config['INFERENCE_INTRA_OP_THREADS'] = int(os.getenv('INFERENCE_INTRA_OP_THREADS', 0))  # 0 = semua core
+app.config['INFERENCE_INTER_OP_THREADS'] = int(os.getenv('INFERENCE_INTER_OP_THREADS', 1))
+app.config['MODEL_WARMUP'] = os.getenv('MODEL_WARMUP', '1') == '1'  # Inferensi dummy saat preload (worker, monitor kamera, gunicorn)
+
+# Registry model: versi bernama yang dimuat saat pertama dipakai dan dimuat ulang saat file bobotnya berubah
+app.config['MODEL_VERSIONS'] = parse_model_versions(os.getenv('MODEL_VERSIONS'), 'yolov8violence_final.pt')  # nama=path,...
+app.config['MODEL_DEFAULT'] = os.getenv('MODEL_DEFAULT') or next(iter(app.config['MODEL_VERSIONS']))
+app.config['MODEL_TRAFFIC'] = parse_traffic(os.getenv('MODEL_TRAFFIC'))  # Porsi video per versi untuk A/B, mis. candidate=0.1
+app.config['MODEL_RELOAD_SECONDS'] = float(os.getenv('MODEL_RELOAD_SECONDS', 5.0))  # Interval pengecekan file bobot
+app.config['MODEL_RETIRE_SECONDS'] = float(os.getenv('MODEL_RETIRE_SECONDS', 300.0))  # Versi lama dilepas setelah tidak dipakai
+app.config['MODEL_SERVER'] = os.getenv('MODEL_SERVER', '')  # Path unix socket / host:port server inferensi; kosong = model di proses ini
+# Kunci rahasia koneksi server inferensi (pesan di-unpickle); wajib diisi jika MODEL_SERVER/flask models dipakai
+app.config['MODEL_SERVER_AUTHKEY'] = os.getenv('MODEL_SERVER_AUTHKEY', '').encode()
+# Frame ke server inferensi lewat shared memory: auto = hanya untuk unix socket (mesin yang sama), 1 = selalu, 0 = pickle
+app.config['MODEL_SERVER_SHARED_MEMORY'] = os.getenv('MODEL_SERVER_SHARED_MEMORY', 'auto')
+app.config['FRAME_RING_SLOTS'] = int(os.getenv('FRAME_RING_SLOTS', 8))  # Slot per thread klien (minimal sebesar batch)
+
+# Pemantauan kamera live (flask --app app streams)
+app.config['STREAM_INFERENCE_FPS'] = float(os.getenv('STREAM_INFERENCE_FPS', 2.0))  # Inferensi maksimum per kamera per detik
+app.config['STREAM_PRE_ROLL_SECONDS'] = float(os.getenv('STREAM_PRE_ROLL_SECONDS', 5.0))  # Rekaman sebelum deteksi pertama
+app.config['STREAM_POST_ROLL_SECONDS'] = float(os.getenv('STREAM_POST_ROLL_SECONDS', 5.0))  # Rekaman setelah deteksi terakhir
+app.config['STREAM_MAX_SEGMENT_SECONDS'] = float(os.getenv('STREAM_MAX_SEGMENT_SECONDS', 300.0))  # Segmen panjang dipecah
+app.config['STREAM_SYNC_INTERVAL'] = float(os.getenv('STREAM_SYNC_INTERVAL', 5.0))  # Detik antar sinkronisasi daftar kamera
+app.config['STREAM_RECONNECT_SECONDS'] = float(os.getenv('STREAM_RECONNECT_SECONDS', 5.0))  # Jeda sebelum menyambung ulang
+
+# Logging dan metrics
+app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')  # DEBUG menampilkan log per frame (disampel)
+app.config['LOG_FRAME_INTERVAL'] = int(os.getenv('LOG_FRAME_INTERVAL', 100))  # Log DEBUG setiap n frame
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'sintesa-metrics'))  # Snapshot metrics per proses
+
+# Segmentasi kejadian: confidence per frame -> interval kekerasan (juga bagian dari kunci cache)
+app.config['EVENT_ENTER_THRESHOLD'] = float(os.getenv('EVENT_ENTER_THRESHOLD', 0.35))  # Confidence (dihaluskan) untuk mulai kejadian
+app.config['EVENT_EXIT_THRESHOLD'] = float(os.getenv('EVENT_EXIT_THRESHOLD', 0.2))  # Kejadian berakhir di bawah nilai ini
+app.config['EVENT_SMOOTHING_WINDOW'] = int(os.getenv('EVENT_SMOOTHING_WINDOW', 3))  # Frame terinferensi untuk rata-rata bergerak
+app.config['EVENT_MIN_DURATION'] = float(os.getenv('EVENT_MIN_DURATION', 0.5))  # Detik; kejadian lebih pendek dibuang
+app.config['EVENT_MERGE_GAP'] = float(os.getenv('EVENT_MERGE_GAP', 2.0))  # Detik; kejadian yang lebih dekat digabung
+
+# Preprocessing (CLAHE) sebelum inferensi, membantu deteksi di ruangan gelap (juga bagian dari kunci cache)
+app.config['PREPROCESS_ENABLED'] = os.getenv('PREPROCESS_ENABLED', '0') == '1'  # Untuk semua ruangan/kamera
+app.config['PREPROCESS_ROOMS'] = [room.strip() for room in os.getenv('PREPROCESS_ROOMS', '').split(',') if room.strip()]
+app.config['PREPROCESS_TARGET_SIZE'] = int(os.getenv('PREPROCESS_TARGET_SIZE', app.config['MODEL_IMGSZ']))  # 0 = resolusi penuh
+app.config['PREPROCESS_CLIP_LIMIT'] = float(os.getenv('PREPROCESS_CLIP_LIMIT', 2.0))
+app.config['PREPROCESS_DENOISE'] = int(os.getenv('PREPROCESS_DENOISE', 0))  # Diameter bilateralFilter, 0 = nonaktif
+
+# Region of interest dan inferensi per tile untuk kamera resolusi tinggi (juga bagian dari kunci cache)
+app.config['ROI_ROOMS'] = parse_room_rois(os.getenv('ROI_ROOMS', ''))  # 'D404=0 0.3 1 1|0.6 0 1 0.3, D405=...' (relatif 0..1)
+app.config['TILE_ENABLED'] = os.getenv('TILE_ENABLED', '0') == '1'  # Untuk semua ruangan/kamera
+app.config['TILE_ROOMS'] = [room.strip() for room in os.getenv('TILE_ROOMS', '').split(',') if room.strip()]
+app.config['TILE_SIZE'] = int(os.getenv('TILE_SIZE', app.config['MODEL_IMGSZ']))  # Sisi tile dalam piksel frame asli
+app.config['TILE_OVERLAP'] = float(os.getenv('TILE_OVERLAP', 0.2))  # Fraksi tumpang tindih antar tile
+app.config['TILE_FULL_FRAME'] = os.getenv('TILE_FULL_FRAME', '1') == '1'  # Tambah crop utuh untuk objek besar
+app.config['TILE_MERGE_THRESHOLD'] = float(os.getenv('TILE_MERGE_THRESHOLD', 0.6))  # NMS lintas tile (irisan/kotak terkecil)
+
+# Parameter inferensi (juga bagian dari kunci cache)
+MODEL_PATH = app.config['MODEL_VERSIONS'][app.config['MODEL_DEFAULT']]
+DETECTION_CLASSES = [1]
+DETECTION_CONF = 0.25
+DETECTION_IOU = 0.5
+
+# Status job
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+# Mode analisis (per request/job); render = buat video hasil dari deteksi tersimpan
+MODE_FULL = 'full'
+MODE_DETECT = 'detect'
+MODE_RENDER = 'render'
+ANALYSIS_MODES = (MODE_FULL, MODE_DETECT)
+
+# Status upload bertahap
+UPLOAD_ACTIVE = 'uploading'
+UPLOAD_COMPLETE = 'complete'
+UPLOAD_FAILED = 'failed'
 
 # Konfigurasi Telegram
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+app.config['TELEGRAM_API_URL'] = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+app.config['TELEGRAM_TIMEOUT'] = float(os.getenv('TELEGRAM_TIMEOUT', 10.0))  # Timeout per request ke API
+app.config['TELEGRAM_MAX_RETRIES'] = int(os.getenv('TELEGRAM_MAX_RETRIES', 5))  # Percobaan ulang dengan exponential backoff
+app.config['TELEGRAM_MIN_INTERVAL'] = float(os.getenv('TELEGRAM_MIN_INTERVAL', 1.0))  # Jeda minimum antar pesan ke chat
+app.config['TELEGRAM_QUEUE_SIZE'] = int(os.getenv('TELEGRAM_QUEUE_SIZE', 100))  # Alert yang boleh mengantri
+app.config['TELEGRAM_DRAIN_TIMEOUT'] = float(os.getenv('TELEGRAM_DRAIN_TIMEOUT', 30.0))  # Detik menunggu sisa alert terkirim saat proses berhenti
+
+logging.basicConfig(format='%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s')
+logger = logging.getLogger('sintesa')
+logger.setLevel(app.config['LOG_LEVEL'].upper())
+
+# Timer per tahap dan counter frame, diekspos lewat /metrics
+metrics = Metrics()
+startup.mark('config')
+
+def media_url(path):
+    """URL file di folder upload (lihat uploaded_file), None jika path kosong"""
+    return f'/static/uploads/{os.path.basename(path)}' if path else None
 
 class DetectionHistory(db.Model):
     __tablename__ = 'detection_history'
+    __table_args__ = (
+        db.Index('ix_detection_history_room_recorded_at', 'room', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     room = db.Column(db.String(50), nullable=True)
     detection_date = db.Column(db.String(50), nullable=True)
     detection_time = db.Column(db.String(20), nullable=True)
-    processed_at = db.Column(db.DateTime, default=datetime.utcnow)
-    violence_detected = db.Column(db.Boolean, default=False)
+    recorded_at = db.Column(db.DateTime, nullable=True)  # Waktu rekaman (dari nama file / kamera), untuk filter tanggal
+    processed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    violence_detected = db.Column(db.Boolean, default=False, index=True)
     original_video_path = db.Column(db.String(255))
     result_video_path = db.Column(db.String(255))
     screenshot_path = db.Column(db.String(255), nullable=True)
+    poster_path = db.Column(db.String(255), nullable=True)  # Thumbnail JPEG kecil untuk riwayat dan poster video
+    preview_path = db.Column(db.String(255), nullable=True)  # Rendition video hasil beresolusi rendah
+    detections_path = db.Column(db.String(255), nullable=True)  # Kotak deteksi per frame (.npz), dasar render ulang
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 file video asli
+    cache_key = db.Column(db.String(64), nullable=True, index=True)  # Hash video + model + setting inferensi
+    last_used_at = db.Column(db.DateTime, nullable=True)  # Terakhir dipakai sebagai hasil cache
+    stream_source_id = db.Column(db.Integer, db.ForeignKey('stream_source.id'), nullable=True)  # Segmen dari kamera live
+    model_version = db.Column(db.String(64), nullable=True, index=True)  # Versi model registry, mis. default:1a2b3c4d5e6f
+    storage_bytes = db.Column(db.BigInteger, nullable=True)  # Total ukuran file di stored_artifact; None = belum diindeks
+    archived_at = db.Column(db.DateTime, nullable=True, index=True)  # File sudah dihapus retensi; riwayat tetap ada
+
+    events = db.relationship('ViolenceEvent', back_populates='detection', order_by='ViolenceEvent.start_time',
+                             cascade='all, delete-orphan')
+    artifacts = db.relationship('StoredArtifact', back_populates='detection', cascade='all, delete-orphan')
+
+    def artifact_kinds(self):
+        """(jenis, path) semua file milik deteksi ini, tanpa duplikat path"""
+        paths = [('original', self.original_video_path), ('result', self.result_video_path),
+                 ('screenshot', self.screenshot_path), ('poster', self.poster_path), ('preview', self.preview_path),
+                 ('detections', self.detections_path)]
+        paths.extend(('screenshot', event.screenshot_path) for event in self.events)
+        kinds = {}
+        for kind, path in paths:
+            if path and path not in kinds:
+                kinds[path] = kind
+        return [(kind, path) for path, kind in kinds.items()]
+
+    def artifact_paths(self):
+        return [path for _, path in self.artifact_kinds()]
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'room': self.room,
+            'detection_date': self.detection_date,
+            'detection_time': self.detection_time,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'violence_detected': bool(self.violence_detected),
+            'model_version': self.model_version,
+            'archived': self.archived_at is not None,
+            'rendered': self.result_video_path is not None,
+            'poster_url': media_url(self.poster_path) if self.archived_at is None else None,
+            'preview_url': media_url(self.preview_path) if self.archived_at is None else None,
+            'events': [event.to_dict() for event in self.events],
+            'view_url': f'/view/{self.id}',
+            'detections_url': f'/view/{self.id}/detections' if self.detections_path and self.archived_at is None else None,
+        }
     
     def __repr__(self):
         return f'<Detection {self.id}: {self.filename}>'
 
-# Inisialisasi bot Telegram dengan konfigurasi connection pool
-bot = telegram.Bot(
-    token=TELEGRAM_BOT_TOKEN,
-    request=telegram.request.HTTPXRequest(
-        connection_pool_size=50,  # Tingkatkan ukuran pool
-        pool_timeout=30.0         # Timeout 30 detik
-    )
-)
+class ViolenceEvent(db.Model):
+    """Satu interval kekerasan di dalam video (hasil segment_events), waktu relatif terhadap awal video"""
+    __tablename__ = 'violence_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection_history.id'), nullable=False, index=True)
+    start_frame = db.Column(db.Integer, nullable=False)
+    end_frame = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.Float, nullable=False)  # Detik
+    end_time = db.Column(db.Float, nullable=False)
+    peak_frame = db.Column(db.Integer, nullable=True)
+    peak_confidence = db.Column(db.Float, nullable=False)
+    mean_confidence = db.Column(db.Float, nullable=False)
+    screenshot_path = db.Column(db.String(255), nullable=True)  # Frame teranotasi dengan confidence tertinggi
+
+    detection = db.relationship('DetectionHistory', back_populates='events')
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'start_frame': self.start_frame,
+            'end_frame': self.end_frame,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'peak_frame': self.peak_frame,
+            'peak_confidence': self.peak_confidence,
+            'mean_confidence': self.mean_confidence,
+            'screenshot_url': media_url(self.screenshot_path) if self.detection.archived_at is None else None,
+        }
+
+    def __repr__(self):
+        return f'<ViolenceEvent {self.id}: {self.start_time:.1f}-{self.end_time:.1f}s>'
+
+class DetectionJob(db.Model):
+    __tablename__ = 'detection_job'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)
+    mode = db.Column(db.String(10), nullable=False, default=MODE_FULL)  # full, detect atau render (detection_id sudah ada)
+    status = db.Column(db.String(20), nullable=False, default=JOB_QUEUED, index=True)
+    progress = db.Column(db.Float, default=0.0)  # Persentase 0 - 100
+    error = db.Column(db.Text, nullable=True)
+    stats = db.Column(db.JSON, nullable=True)  # Statistik pemrosesan (frame diinferensi/dilewati, dll)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection_history.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    detection = db.relationship('DetectionHistory')
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'filename': self.filename,
+            'mode': self.mode,
+            'status': self.status,
+            'progress': self.progress or 0.0,
+            'error': self.error,
+            'stats': self.stats,
+            'detection_id': self.detection_id,
+            'status_url': f'/jobs/{self.id}',
+            'progress_url': f'/jobs/{self.id}/progress',
+        }
+        if self.detection_id:
+            data['view_url'] = f'/view/{self.detection_id}'
+        return data
+
+    def __repr__(self):
+        return f'<DetectionJob {self.id}: {self.filename} ({self.status})>'
 
-# Buat event loop global
-loop = asyncio.get_event_loop()
+class StoredArtifact(db.Model):
+    """Indeks file hasil di folder upload: ukuran dan pemiliknya, dasar kuota retensi tanpa stat ke disk"""
+    __tablename__ = 'stored_artifact'
+
+    id = db.Column(db.Integer, primary_key=True)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection_history.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # original, result, screenshot, poster, preview
+    path = db.Column(db.String(255), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # Isi yang sama (content store) hanya dihitung sekali
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    detection = db.relationship('DetectionHistory', back_populates='artifacts')
+
+    @property
+    def storage_key(self):
+        return self.content_hash or self.path
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_session'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # Ukuran total yang diumumkan klien
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # Byte yang sudah tersimpan di disk
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256 dari klien, diverifikasi di akhir
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 hasil perhitungan server
+    mode = db.Column(db.String(10), nullable=False, default=MODE_FULL)  # Mode analisis job-nya
+    status = db.Column(db.String(20), nullable=False, default=UPLOAD_ACTIVE, index=True)
+    error = db.Column(db.Text, nullable=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('detection_job.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    job = db.relationship('DetectionJob')
+
+    def to_dict(self):
+        data = {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.offset,
+            'status': self.status,
+            'error': self.error,
+            'upload_url': f'/uploads/{self.id}',
+            'job_id': self.job_id,
+        }
+        if self.job_id:
+            data['status_url'] = f'/jobs/{self.job_id}'
+            data['progress_url'] = f'/jobs/{self.job_id}/progress'
+        return data
+
+    def __repr__(self):
+        return f'<UploadSession {self.id}: {self.filename} ({self.offset}/{self.size})>'
+
+class StreamSource(db.Model):
+    __tablename__ = 'stream_source'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    url = db.Column(db.String(500), nullable=False)  # RTSP/HTTP atau path file yang bisa dibuka cv2.VideoCapture
+    room = db.Column(db.String(50), nullable=True)
+    loop = db.Column(db.Boolean, default=False)  # Putar ulang file lokal (pengganti kamera untuk testing)
+    preprocess = db.Column(db.Boolean, nullable=True)  # CLAHE sebelum inferensi; None = ikuti PREPROCESS_*
+    roi = db.Column(db.String(500), nullable=True)  # 'x1 y1 x2 y2|...' relatif 0..1; None = ikuti ROI_ROOMS
+    tiled = db.Column(db.Boolean, nullable=True)  # Inferensi per tile; None = ikuti TILE_*
+    enabled = db.Column(db.Boolean, default=True, index=True)
+    status = db.Column(db.String(20), default='pending')  # Diisi proses monitor: running/reconnecting/error/stopped
+    error = db.Column(db.Text, nullable=True)
+    stats = db.Column(db.JSON, nullable=True)  # Frame dibaca/diinferensi/dilewati, segmen terekam
+    last_frame_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'url': self.url,
+            'room': self.room,
+            'loop': bool(self.loop),
+            'preprocess': self.preprocess,
+            'roi': self.roi,
+            'tiled': self.tiled,
+            'enabled': bool(self.enabled),
+            'status': self.status,
+            'error': self.error,
+            'stats': self.stats,
+            'last_frame_at': self.last_frame_at.isoformat() if self.last_frame_at else None,
+        }
+
+    def __repr__(self):
+        return f'<StreamSource {self.id}: {self.name} ({self.status})>'
+
+class VideoProcessingError(Exception):
+    """Kesalahan pemrosesan video yang pesannya bisa ditampilkan ke pengguna"""
+
+def record_alert_result(status, seconds):
+    metrics.inc('sintesa_alerts_total', status=status)
+    if status != 'dropped':
+        metrics.observe('sintesa_stage_seconds', seconds, stage='telegram')
+
+# Notifikasi Telegram dikirim di thread latar belakang agar tidak menahan deteksi
+alert_dispatcher = TelegramAlertDispatcher(
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID,
+    api_url=app.config['TELEGRAM_API_URL'],
+    timeout=app.config['TELEGRAM_TIMEOUT'],
+    max_retries=app.config['TELEGRAM_MAX_RETRIES'],
+    min_interval=app.config['TELEGRAM_MIN_INTERVAL'],
+    queue_size=app.config['TELEGRAM_QUEUE_SIZE'],
+    drain_timeout=app.config['TELEGRAM_DRAIN_TIMEOUT'],
+    on_result=record_alert_result
+)
 
 # Pastikan folder upload ada
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Load model YOLOv8
-model = YOLO('yolov8violence_final.pt')
+startup.mark('alerts')
+
+_device = None
+
+def inference_device():
+    """Optimasi untuk M1 (MPS) atau CPU; torch baru diimport saat pertama kali dibutuhkan"""
+    global _device
+    if _device is None:
+        if app.config['INFERENCE_BACKEND'] != 'torch':
+            _device = 'cpu'
+        else:
+            with startup.phase('import_torch'):
+                import torch
+            _device = 'mps' if torch.backends.mps.is_available() else 'cpu'
+    return _device
+
+def load_model_weights(path):
+    """Muat satu file bobot untuk ModelRegistry sesuai INFERENCE_BACKEND"""
+    if app.config['INFERENCE_BACKEND'] == 'torch':
+        device = inference_device()
+        from ultralytics import YOLO
+
+        # Load model YOLOv8
+        yolo = YOLO(path)
+        yolo.to(device)
+        yolo.overrides['device'] = device
 
-# Optimasi untuk M1 (MPS) atau CPU
-device = 'mps' if torch.backends.mps.is_available() else 'cpu'
-model.to(device)
+        # Model optimization settings
+        yolo.overrides['conf'] = 0.25  # Much lower confidence threshold for testing
+        yolo.overrides['iou'] = 0.5    # IoU threshold untuk NMS
+        yolo.overrides['max_det'] = 50  # More detections per image
+        yolo.overrides['half'] = False  # Disable FP16 untuk akurasi lebih baik
+        return yolo
 
-# Model optimization settings
-model.overrides['conf'] = 0.25  # Much lower confidence threshold for testing
-model.overrides['iou'] = 0.5    # IoU threshold untuk NMS
-model.overrides['max_det'] = 50  # More detections per image
-model.overrides['half'] = False  # Disable FP16 untuk akurasi lebih baik
+    # Backend CPU hasil export (ONNX Runtime / OpenVINO), diexport sekali lalu dicache di disk
+    return load_exported_model(
+        path, app.config['INFERENCE_BACKEND'],
+        cache_dir=app.config['MODEL_CACHE_DIR'],
+        imgsz=app.config['MODEL_IMGSZ'],
+        intra_op_threads=app.config['INFERENCE_INTRA_OP_THREADS'],
+        inter_op_threads=app.config['INFERENCE_INTER_OP_THREADS'],
+        max_det=50
+    )
+
+def create_model_registry(local=False):
+    """Registry di proses ini, atau klien server inferensi bersama jika MODEL_SERVER diisi"""
+    if app.config['MODEL_SERVER'] and not local:
+        if not app.config['MODEL_SERVER_AUTHKEY']:
+            raise RuntimeError('MODEL_SERVER_AUTHKEY must be set to connect to MODEL_SERVER')
+        address = parse_address(app.config['MODEL_SERVER'])
+        shared = app.config['MODEL_SERVER_SHARED_MEMORY']
+        return RemoteModelRegistry(address, authkey=app.config['MODEL_SERVER_AUTHKEY'],
+                                   shared_memory=shared == '1' or (shared == 'auto' and isinstance(address, str)),
+                                   ring_slots=app.config['FRAME_RING_SLOTS'])
+    return ModelRegistry(
+        app.config['MODEL_VERSIONS'], load_model_weights,
+        default=app.config['MODEL_DEFAULT'],
+        traffic=app.config['MODEL_TRAFFIC'],
+        reload_interval=app.config['MODEL_RELOAD_SECONDS'],
+        retire_seconds=app.config['MODEL_RETIRE_SECONDS']
+    )
+
+def warm_up_model(registry):
+    # Inferensi dummy agar request pertama tidak membayar pemuatan model dan inisialisasi graph
+    warmup_start = time.time()
+    warm_up(RegistryModel(registry), batch_size=app.config['INFERENCE_BATCH_SIZE'], imgsz=app.config['MODEL_IMGSZ'],
+            classes=DETECTION_CLASSES, conf=DETECTION_CONF, iou=DETECTION_IOU, verbose=False)
+    logger.info("Model warm-up done in %.2fs", time.time() - warmup_start)
+
+def preload(warmup=None):
+    """
+    Muat model default sekarang, bukan saat inferensi pertama: dipanggil proses worker,
+    monitor kamera dan master gunicorn (--preload, lihat gunicorn.conf.py) sebelum fork
+    sehingga bobot model dibagi copy-on-write. warmup (default MODEL_WARMUP) menjalankan
+    inferensi dummy; jangan dilakukan sebelum fork karena thread pool torch tidak aman di-fork.
+    """
+    if app.config['MODEL_SERVER']:
+        logger.info("Using inference server at %s", app.config['MODEL_SERVER'])
+        return
+    logger.info("Using device: %s (%s backend)", inference_device(), app.config['INFERENCE_BACKEND'])
+    with startup.phase('model_load'):
+        model_registry.get()
+    if app.config['MODEL_WARMUP'] if warmup is None else warmup:
+        with startup.phase('warm_up'):
+            warm_up_model(model_registry)
 
-print(f"Using device: {device}")
-print(f"Model settings - conf: {model.overrides['conf']}, iou: {model.overrides['iou']}")
+# Model dimuat saat inferensi pertama (atau di server inferensi, atau lewat preload());
+# dipanggil seperti objek YOLO
+model_registry = create_model_registry()
+model = RegistryModel(model_registry)
+logger.info("Model settings - conf: %s, iou: %s", DETECTION_CONF, DETECTION_IOU)
+startup.mark('model_registry')
 
 # Cek ekstensi file yang diizinkan
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Bersihkan file lama (>1 jam)
-def clean_uploads():
-    for f in glob.glob(os.path.join(app.config['UPLOAD_FOLDER'], '*')):
-        if os.path.getmtime(f) < time.time() - 3600:
-            os.remove(f)
+# Simpan file upload sambil menghitung hash SHA-256 dalam satu kali baca
+def upload_path_in_use(filename, filepath):
+    """
+    Nama sudah dipakai deteksi (file asli atau file turunan result_/preview_/poster_/detections_
+    yang namanya diambil dari stem), job yang antri/berjalan, atau upload yang masih aktif
+    """
+    stem = os.path.splitext(filename)[0]
+    detections_path = os.path.join(app.config['UPLOAD_FOLDER'], f"detections_{stem}.npz")
+    detection = DetectionHistory.query.filter(db.or_(DetectionHistory.original_video_path == filepath,
+                                                     DetectionHistory.detections_path == detections_path)).first()
+    return (detection is not None
+            or DetectionJob.query.filter(DetectionJob.filepath == filepath,
+                                         DetectionJob.status.in_((JOB_QUEUED, JOB_RUNNING))).first() is not None
+            or UploadSession.query.filter_by(filepath=filepath, status=UPLOAD_ACTIVE).first() is not None)
+
+def claim_upload_path(filename):
+    """
+    Pesan path baru di UPLOAD_FOLDER untuk video masuk (upload, upload bertahap, ingest) dengan
+    membuat file kosong secara atomik, sehingga dua proses tidak mendapat path yang sama.
+    Nama yang sudah dipakai (lihat upload_path_in_use) diberi akhiran _<8 karakter acak> agar
+    input job lain dan file hasil deteksi sebelumnya tidak tertimpa; metadata nama file tetap
+    terbaca (lihat parse_filename_metadata). Mengembalikan (filename, filepath).
+    """
+    stem, ext = os.path.splitext(filename)
+    for name in (filename, f"{stem}_{uuid.uuid4().hex[:8]}{ext}"):
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], name)
+        if upload_path_in_use(name, filepath):
+            continue
+        try:
+            open(filepath, 'xb').close()
+        except FileExistsError:
+            continue
+        return name, filepath
+    raise VideoProcessingError(f'File name {filename} is already in use')
+
+def save_upload(file, filepath, chunk_size=1024 * 1024):
+    """Tulis upload ke filepath (file baru dari claim_upload_path); mengembalikan SHA-256 isinya"""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            chunk = file.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+_shard_executor = None
+
+def inference_settings():
+    """Setting yang mempengaruhi hasil deteksi; perubahan apapun membuat cache lama tidak berlaku"""
+    return {
+        'backend': app.config['INFERENCE_BACKEND'],
+        'classes': DETECTION_CLASSES,
+        'conf': DETECTION_CONF,
+        'iou': DETECTION_IOU,
+        'sampling': app.config['FRAME_SAMPLING'],
+        'min_stride': app.config['SAMPLER_MIN_STRIDE'],
+        'max_stride': app.config['SAMPLER_MAX_STRIDE'],
+        'motion_threshold': app.config['SAMPLER_MOTION_THRESHOLD'],
+        'idle_seconds': app.config['SAMPLER_IDLE_SECONDS'],
+        'event_enter': app.config['EVENT_ENTER_THRESHOLD'],
+        'event_exit': app.config['EVENT_EXIT_THRESHOLD'],
+        'event_smoothing': app.config['EVENT_SMOOTHING_WINDOW'],
+        'event_min_duration': app.config['EVENT_MIN_DURATION'],
+        'event_merge_gap': app.config['EVENT_MERGE_GAP'],
+    }
 
-# Add this function after the import statements
+def event_settings():
+    """Parameter segment_events dari konfigurasi EVENT_*"""
+    return {
+        'enter_threshold': app.config['EVENT_ENTER_THRESHOLD'],
+        'exit_threshold': app.config['EVENT_EXIT_THRESHOLD'],
+        'smoothing_window': app.config['EVENT_SMOOTHING_WINDOW'],
+        'min_duration': app.config['EVENT_MIN_DURATION'],
+        'merge_gap': app.config['EVENT_MERGE_GAP'],
+    }
+
+def preprocess_enabled(room=None):
+    return app.config['PREPROCESS_ENABLED'] or (room is not None and room in app.config['PREPROCESS_ROOMS'])
+
+def create_preprocessor(region=None):
+    # Dengan ROI/tile frame tidak diperkecil dulu: crop dan tile diperkecil sendiri oleh model
+    return FramePreprocessor(
+        clip_limit=app.config['PREPROCESS_CLIP_LIMIT'],
+        target_size=None if region is not None else app.config['PREPROCESS_TARGET_SIZE'] or None,
+        denoise_diameter=app.config['PREPROCESS_DENOISE']
+    )
 
-def preprocess_frame(frame):
+def tile_enabled(room=None):
+    return app.config['TILE_ENABLED'] or (room is not None and room in app.config['TILE_ROOMS'])
+
+def inference_region(room=None, roi=None, tiled=None):
     """
-    Preprocess frame untuk meningkatkan akurasi deteksi
+    InferenceRegion untuk ruangan (ROI_ROOMS/TILE_*); roi dan tiled (pengaturan kamera)
+    menggantikan konfigurasi ruangan jika tidak None. None = seluruh frame tanpa tiling.
     """
-    # Enhance contrast dan brightness untuk deteksi yang lebih baik
-    lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    l = clahe.apply(l)
-    
-    # Merge channels dan convert kembali ke BGR
-    enhanced = cv2.merge([l, a, b])
-    enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
-    
-    # Optional: noise reduction
-    enhanced = cv2.bilateralFilter(enhanced, 9, 75, 75)
-    
-    return enhanced
+    roi = roi if roi is not None else app.config['ROI_ROOMS'].get(room)
+    tiled = tiled if tiled is not None else tile_enabled(room)
+    if not roi and not tiled:
+        return None
+    return InferenceRegion(
+        roi=roi,
+        tile_size=app.config['TILE_SIZE'] if tiled else None,
+        overlap=app.config['TILE_OVERLAP'],
+        full_frame=app.config['TILE_FULL_FRAME'],
+        merge_threshold=app.config['TILE_MERGE_THRESHOLD']
+    )
+
+def filename_room(filename):
+    metadata = parse_filename_metadata(filename)
+    return metadata['room'] if metadata else None
+
+def compute_cache_key(content_hash, room=None, model_version=None, mode=MODE_FULL):
+    """
+    Kunci cache hasil deteksi; room menentukan apakah preprocessing (PREPROCESS_ROOMS), ROI dan
+    tiling (ROI_ROOMS, TILE_ROOMS) dipakai, mode apakah video didecode diperkecil (scaled_decode).
+    model_version default-nya versi yang akan dipilih registry untuk video ini.
+    """
+    model_version = model_version or model_registry.version(model_registry.select(content_hash))
+    settings = inference_settings()
+    if preprocess_enabled(room):
+        settings['preprocess'] = {
+            'clip_limit': app.config['PREPROCESS_CLIP_LIMIT'],
+            'target_size': app.config['PREPROCESS_TARGET_SIZE'],
+            'denoise': app.config['PREPROCESS_DENOISE'],
+        }
+    region = inference_region(room)
+    if region is not None:
+        settings['region'] = region.settings()
+    if scaled_decode(mode != MODE_DETECT, region):
+        # Hasil mode detect ini didecode pada resolusi lebih kecil
+        settings['decode_max_width'] = app.config['DECODE_MAX_WIDTH']
+    settings = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{model_version}:{settings}".encode()).hexdigest()
+
+def find_cached_detection(cache_key):
+    """Cari hasil deteksi sebelumnya dengan kunci cache yang sama dan file yang masih lengkap"""
+    detection = DetectionHistory.query.filter_by(cache_key=cache_key, archived_at=None).order_by(
+        DetectionHistory.processed_at.desc()).first()
+    if detection is None:
+        return None
+
+    if not all(os.path.exists(p) for p in detection.artifact_paths()):
+        # File sudah hilang, entri ini tidak bisa dipakai lagi sebagai cache
+        archive_detection(detection)
+        db.session.commit()
+        return None
+
+    detection.last_used_at = datetime.utcnow()
+    db.session.commit()
+    return detection
+
+def get_content_store():
+    # Objek disimpan di dalam UPLOAD_FOLDER agar hard link berada di filesystem yang sama
+    return ContentStore(os.path.join(app.config['UPLOAD_FOLDER'], 'objects'))
+
+def store_content(filepath, content_hash):
+    """Simpan video asli di content store (lihat CONTENT_STORE_ENABLED)"""
+    if app.config['CONTENT_STORE_ENABLED'] and content_hash:
+        if get_content_store().add(filepath, content_hash):
+            logger.info("Deduplicated %s with stored content %s", os.path.basename(filepath), content_hash[:12])
+
+def index_artifacts(detection):
+    """Catat file milik detection beserta ukurannya di stored_artifact; False jika ada file yang hilang"""
+    artifacts = []
+    for kind, path in detection.artifact_kinds():
+        if not os.path.exists(path):
+            return False
+        artifacts.append(StoredArtifact(kind=kind, path=path, size=os.path.getsize(path),
+                                        content_hash=detection.content_hash if kind == 'original' else None))
+    detection.artifacts = artifacts
+    detection.storage_bytes = sum(artifact.size for artifact in artifacts)
+    return True
+
+def archive_detection(detection, now=None):
+    """
+    Hapus file milik detection dan tandai barisnya diarsipkan: riwayat dan kejadiannya tetap
+    ada, tetapi tidak lagi menunjuk ke file yang hilang. File yang juga dipakai deteksi lain
+    (path yang sama) tidak dihapus.
+    """
+    paths = {artifact.path for artifact in detection.artifacts} or set(detection.artifact_paths())
+    shared = {path for (path,) in db.session.query(StoredArtifact.path).join(DetectionHistory).filter(
+        StoredArtifact.path.in_(paths), StoredArtifact.detection_id != detection.id,
+        DetectionHistory.archived_at.is_(None))} if paths else set()
+    for path in paths - shared:
+        if os.path.exists(path):
+            os.remove(path)
+    detection.artifacts = []
+    detection.storage_bytes = 0
+    detection.cache_key = None
+    detection.archived_at = now or datetime.utcnow()
+
+def enforce_retention(now=None):
+    """
+    Satu putaran retensi folder upload (dijalankan terjadwal, lihat RETENTION_INTERVAL):
+    1. indeks maksimal RETENTION_INDEX_BATCH hasil yang belum ada di stored_artifact,
+    2. arsipkan hasil upload yang tidak dipakai lebih dari CACHE_MAX_AGE_SECONDS,
+    3. arsipkan hasil yang paling lama tidak dipakai (LRU) selama total ukuran indeks
+       melebihi CACHE_MAX_BYTES (isi yang sama di content store dihitung sekali),
+    4. hapus file tanpa referensi yang lebih tua dari ORPHAN_MAX_AGE_SECONDS dan objek
+       content store yang tidak dipakai lagi.
+    Mengembalikan ringkasan jumlah yang diindeks, diarsipkan, dihapus dan byte yang dibebaskan.
+    """
+    now = now or datetime.utcnow()
+    summary = {'indexed': 0, 'archived': 0, 'orphans': 0, 'freed_bytes': 0}
+    live = DetectionHistory.archived_at.is_(None)
+    last_used = db.func.coalesce(DetectionHistory.last_used_at, DetectionHistory.processed_at)
+
+    def archive(detection):
+        summary['freed_bytes'] += detection.storage_bytes or 0
+        summary['archived'] += 1
+        archive_detection(detection, now)
+
+    # Hasil lama (sebelum indeks ada, atau dibuat di luar process_video) diindeks bertahap
+    backlog = DetectionHistory.query.options(db.selectinload(DetectionHistory.events)).filter(
+        live, DetectionHistory.storage_bytes.is_(None)).limit(app.config['RETENTION_INDEX_BATCH'])
+    for detection in backlog:
+        if index_artifacts(detection):
+            summary['indexed'] += 1
+        else:
+            logger.warning("Archiving detection %s: files are missing", detection.id)
+            archive(detection)
+    db.session.commit()
+
+    # Umur: segmen kamera live tidak kedaluwarsa, hanya dibatasi kuota
+    expired_before = now - timedelta(seconds=app.config['CACHE_MAX_AGE_SECONDS'])
+    for detection in DetectionHistory.query.filter(live, DetectionHistory.storage_bytes.isnot(None),
+                                                   DetectionHistory.stream_source_id.is_(None),
+                                                   last_used < expired_before):
+        archive(detection)
+    db.session.commit()
+
+    # Kuota: dihitung dari indeks, tanpa stat ke setiap file
+    owners, sizes = {}, {}
+    for artifact in StoredArtifact.query.join(DetectionHistory).filter(live):
+        owners.setdefault(artifact.storage_key, set()).add(artifact.detection_id)
+        sizes[artifact.storage_key] = artifact.size
+    total_size = sum(sizes.values())
+    if total_size > app.config['CACHE_MAX_BYTES']:
+        candidates = DetectionHistory.query.filter(live, DetectionHistory.storage_bytes.isnot(None)).order_by(
+            last_used, DetectionHistory.id)
+        for detection in candidates:
+            if total_size <= app.config['CACHE_MAX_BYTES']:
+                break
+            for artifact in detection.artifacts:
+                holders = owners.get(artifact.storage_key, set())
+                holders.discard(detection.id)
+                if not holders:
+                    total_size -= sizes.pop(artifact.storage_key, 0)
+            archive(detection)
+        db.session.commit()
+
+    referenced = {os.path.abspath(path) for (path,) in
+                  db.session.query(StoredArtifact.path).join(DetectionHistory).filter(live)}
+    for detection in DetectionHistory.query.options(db.selectinload(DetectionHistory.events)).filter(
+            live, DetectionHistory.storage_bytes.is_(None)):
+        referenced.update(os.path.abspath(p) for p in detection.artifact_paths())
+    active_jobs = DetectionJob.query.filter(DetectionJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+    referenced.update(os.path.abspath(job.filepath) for job in active_jobs)
+
+    # Upload bertahap yang tidak dilanjutkan dianggap batal
+    upload_expired_before = now - timedelta(seconds=app.config['UPLOAD_EXPIRE_SECONDS'])
+    for upload in UploadSession.query.filter_by(status=UPLOAD_ACTIVE):
+        if upload.updated_at and upload.updated_at < upload_expired_before:
+            upload.status = UPLOAD_FAILED
+            upload.error = 'Upload expired'
+        else:
+            referenced.add(os.path.abspath(upload.filepath))
+    db.session.commit()
+
+    cutoff = time.time() - app.config['ORPHAN_MAX_AGE_SECONDS']
+    for path in find_orphans(app.config['UPLOAD_FOLDER'], referenced, cutoff):
+        summary['freed_bytes'] += os.path.getsize(path)
+        summary['orphans'] += 1
+        os.remove(path)
+    summary['freed_bytes'] += get_content_store().collect_garbage()
+
+    if summary['archived'] or summary['orphans']:
+        logger.info("Retention: archived %d detection(s), removed %d orphan file(s), freed %.1f MB",
+                    summary['archived'], summary['orphans'], summary['freed_bytes'] / 1e6)
+    return summary
+
+def run_retention_loop(stop):
+    """Jalankan enforce_retention setiap RETENTION_INTERVAL detik sampai stop di-set"""
+    while True:
+        try:
+            with app.app_context(), metrics.timer('sintesa_stage_seconds', stage='retention'):
+                enforce_retention()
+        except Exception:
+            logger.exception("Retention run failed")
+        if stop.wait(app.config['RETENTION_INTERVAL']):
+            return
+
+def detect_violence_batch(frames, conf_threshold=0.25, originals=None, model_version=None, regions=None):
+    """
+    Jalankan inferensi YOLO untuk beberapa frame sekaligus dalam satu pemanggilan model.
+    Mengembalikan list (result, confidence) dengan urutan yang sama seperti frames;
+    confidence bernilai None jika tidak ada deteksi di atas threshold.
+    originals (opsional) adalah frame asli sebelum preprocessing; hasilnya dipetakan ke sana.
+    model_version (nama atau id versi registry) default-nya model default.
+    regions (opsional) berisi InferenceRegion atau None per frame: crop ROI dan tile semua
+    frame dikirim dalam satu pemanggilan model lalu digabung kembali per frame.
+    """
+    if not frames:
+        return []
+
+    inputs, counts = frames, None
+    if regions is not None and any(region is not None for region in regions):
+        with metrics.timer('sintesa_stage_seconds', stage='tiling'):
+            parts = [region.split(frame) if region is not None else [frame] for frame, region in zip(frames, regions)]
+        inputs = [part for frame_parts in parts for part in frame_parts]
+        counts = [len(frame_parts) for frame_parts in parts]
+        metrics.inc('sintesa_tiles_total', len(inputs))
+
+    with metrics.timer('sintesa_stage_seconds', stage='inference'):
+        results = model(inputs, version=model_version, classes=DETECTION_CLASSES, conf=DETECTION_CONF, iou=DETECTION_IOU)
+
+    if counts is not None:
+        with metrics.timer('sintesa_stage_seconds', stage='tiling'):
+            merged, start = [], 0
+            for frame, region, count in zip(frames, regions, counts):
+                frame_results = results[start:start + count]
+                merged.append(region.merge(frame_results, frame) if region is not None else frame_results[0])
+                start += count
+        results = merged
+
+    if originals is not None:
+        results = [restore_original(result, original) for result, original in zip(results, originals)]
+
+    detections = []
+    for result in results:
+        confidence = None
+        if len(result.boxes) > 0:
+            for conf in result.boxes.conf.cpu().numpy():
+                if conf >= conf_threshold:
+                    confidence = conf
+                    break
+        detections.append((result, confidence))
+    return detections
+
+def create_frame_sampler(fps):
+    """Buat pemilih frame sesuai konfigurasi FRAME_SAMPLING"""
+    if app.config['FRAME_SAMPLING'] == 'fixed':
+        return FixedStrideSampler(app.config['SAMPLER_MIN_STRIDE'])
+    return MotionSampler(
+        min_stride=app.config['SAMPLER_MIN_STRIDE'],
+        max_stride=app.config['SAMPLER_MAX_STRIDE'],
+        motion_threshold=app.config['SAMPLER_MOTION_THRESHOLD'],
+        idle_interval=int(fps * app.config['SAMPLER_IDLE_SECONDS'])
+    )
 
 def parse_filename_metadata(filename):
     """
@@ -127,6 +930,10 @@ def parse_filename_metadata(filename):
         # Split by underscore
         parts = name_without_ext.split('_')
         
+        # Ignore the _<suffix> claim_upload_path adds to duplicate names
+        if len(parts) == 4 and len(parts[3]) == 8:
+            parts = parts[:3]
+
         if len(parts) != 3:
             return None
             
@@ -150,79 +957,1455 @@ def parse_filename_metadata(filename):
         return {
             'room': room,
             'date': formatted_date,
-            'time': formatted_time
+            'time': formatted_time,
+            'recorded_at': datetime(int(year), int(month), int(day), int(hour), int(minute))
         }
     except Exception as e:
-        print(f"Error parsing filename metadata: {e}")
+        logger.warning("Error parsing filename metadata: %s", e)
         return None
 
-# Konversi video untuk kompatibilitas browser
-def convert_video_for_browser(input_path, output_path):
+@app.template_filter('timestamp')
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+def send_violence_alert(filename, metadata, screenshot_path, event=None):
+    """Antrikan pesan kekerasan (beserta cuplikannya sebagai satu sendPhoto) ke Telegram"""
+    metadata_str = ""
+    if metadata:
+        metadata_str = f"\nRuangan: {metadata['room']}\nTanggal: {metadata['date']}\nWaktu: {metadata['time']}"
+    event_str = ""
+    if event is not None:
+        event_str = (f"\nKejadian: {format_timestamp(event.start_time)} - {format_timestamp(event.end_time)}"
+                     f" (confidence {event.peak_confidence:.2f})")
+
+    message = f"⚠️ Tindak kekerasan terjadi pada video: {filename}{metadata_str}{event_str}\nDiproses pada: {time.strftime('%Y-%m-%d %H:%M:%S')}"
+    queued = alert_dispatcher.send(message, photo_path=screenshot_path)
+    if not queued:
+        logger.warning("Could not queue Telegram notification")
+    return queued
+
+class TimedCapture:
+    """Bungkus capture (lihat open_capture) agar waktu decode, grab dan seek tercatat di metrics"""
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def read(self):
+        with metrics.timer('sintesa_stage_seconds', stage='decode'):
+            return self.capture.read()
+
+    def grab(self):
+        with metrics.timer('sintesa_stage_seconds', stage='grab'):
+            return self.capture.grab()
+
+    def seek(self, frame_index):
+        seek = getattr(self.capture, 'seek', None)
+        if seek is None:
+            return False
+        with metrics.timer('sintesa_stage_seconds', stage='seek'):
+            return seek(frame_index)
+
+def open_capture(filepath, start_frame=1, end_frame=None, scaled=False):
+    """
+    Capture frame start_frame..end_frame sebuah file: FFmpegVideoReader jika DECODE_HWACCEL diisi
+    atau scaled (decode diperkecil ke DECODE_MAX_WIDTH), selain itu FrameRangeCapture (OpenCV).
+    scaled hanya untuk analisis tanpa video hasil, karena video hasil ditulis pada resolusi asli.
+    """
+    max_width = app.config['DECODE_MAX_WIDTH'] if scaled else 0
+    if max_width or app.config['DECODE_HWACCEL']:
+        return FFmpegVideoReader(filepath, start_frame, end_frame, max_width=max_width or None,
+                                 hwaccel=app.config['DECODE_HWACCEL'] or None)
+    return FrameRangeCapture(filepath, start_frame, end_frame, capture_factory=cv2.VideoCapture)
+
+def scaled_decode(render, region=None):
+    """Decode resolusi rendah hanya tanpa video hasil dan tanpa tile (tile butuh piksel resolusi penuh)"""
+    return not render and app.config['DECODE_MAX_WIDTH'] > 0 and not (region is not None and region.tile_size)
+
+class VideoAnalysis:
+    """Hasil decode -> inferensi -> encode untuk satu video atau satu shard"""
+
+    def __init__(self, fps, scale=1.0):
+        self.track = ConfidenceTrack()  # Confidence setiap frame yang diinferensi (0 jika tidak ada deteksi)
+        # Kotak setiap frame yang dianotasi, dalam koordinat video asli (scale: frame decode diperkecil)
+        self.detections = DetectionRecorder(scale)
+        self.peaks = PeakFrames(gap_frames=int(app.config['EVENT_MERGE_GAP'] * fps))
+        self.frames_detected = 0
+        self.frames_processed = 0
+        self.sampling = {}
+        self.encoded = False
+        self.poster = None  # Thumbnail frame pertama video hasil
+
+    def extend(self, other):
+        """Gabungkan hasil shard berikutnya (urutan frame harus berurutan)"""
+        self.track.extend(other.track)
+        self.detections.extend(other.detections)
+        self.peaks.extend(other.peaks)
+        self.frames_detected += other.frames_detected
+        self.frames_processed += other.frames_processed
+        if self.poster is None:
+            self.poster = other.poster
+        for key, value in other.sampling.items():
+            if key in self.sampling and isinstance(value, (int, float)):
+                self.sampling[key] += value
+            else:
+                self.sampling.setdefault(key, value)
+
+def analyze_video(cap, out, fps, total_frames=0, progress_callback=None, first_frame=1, output_from=None,
+                  preprocessor=None, model_version=None, region=None):
+    """
+    Jalankan decode -> inferensi -> anotasi/encode pada cap dan tulis frame hasil ke out.
+    out None = mode detect: frame tidak dianotasi dan tidak di-encode, hanya deteksinya yang
+    dicatat (analysis.detections) dan peak disimpan sebagai hasil model (lihat peak_image).
+    first_frame adalah nomor frame pertama yang dibaca cap. Frame sebelum output_from hanya
+    dipakai untuk menyamakan state sampler (warm-up shard): ikut diinferensi, tetapi tidak
+    ditulis ke out dan tidak dicatat. preprocessor (opsional) diterapkan pada frame yang
+    diinferensi; video hasil tetap memakai frame asli. model_version memilih versi model
+    registry dan region (InferenceRegion, opsional) crop ROI/tile setiap frame (lihat
+    detect_violence_batch). Frame yang tidak dipilih sampler dan tidak ditulis ke out tidak
+    didecode penuh (lihat next_decode). cap dan out tidak ditutup di sini.
+    """
+    output_from = output_from or first_frame
+    analysis = VideoAnalysis(fps, scale=getattr(cap, 'scale', 1.0))
+    log_interval = max(1, app.config['LOG_FRAME_INTERVAL'])
+    warmup_stats = {}
+
+    # Hanya frame dengan gerakan yang dikirim ke model (lihat FRAME_SAMPLING)
+    sampler = create_frame_sampler(fps)
+
+    def should_infer(frame_index, frame):
+        if frame_index == output_from:
+            warmup_stats.update(sampler.stats())
+        return sampler(frame_index, frame)
+
+    def next_decode(frame_index):
+        # Semua frame video hasil didecode; selain itu hanya frame yang mungkin dipilih sampler
+        if out is None:
+            return sampler.next_frame(frame_index)
+        return frame_index if frame_index >= output_from else min(sampler.next_frame(frame_index), output_from)
+
+    def handle_frame(frame_index, frame, sampled, result, conf):
+        # Dijalankan di thread encode, sesuai urutan frame aslinya
+        if frame_index < output_from:
+            return
+        if analysis.poster is None and frame is not None:
+            analysis.poster = make_thumbnail(frame, app.config['VIDEO_POSTER_WIDTH'])
+        if frame_index % log_interval == 0:
+            logger.debug("Frame %d/%d: %d inferred, %d with violence",
+                         frame_index, total_frames, analysis.frames_processed, analysis.frames_detected)
+
+        if not sampled:
+            metrics.inc('sintesa_frames_total', result='skipped')
+            if out is not None:
+                with metrics.timer('sintesa_stage_seconds', stage='encode'):
+                    out.write(frame)
+            return
+
+        analysis.frames_processed += 1
+        metrics.inc('sintesa_frames_total', result='processed')
+        analysis.track.append(frame_index, conf)
+        if conf is not None:
+            if not analysis.frames_detected:
+                logger.info("Frame %d: violence first detected with confidence %.3f", frame_index, conf)
+            analysis.frames_detected += 1
+            metrics.inc('sintesa_frames_total', result='detected')
+            analysis.detections.append(frame_index, result)
+            if out is None:
+                analysis.peaks.offer(frame_index, conf, result)
+                return
+            with metrics.timer('sintesa_stage_seconds', stage='annotation'):
+                frame = result.plot()
+            analysis.peaks.offer(frame_index, conf, frame)
+        if out is None:
+            return
+        with metrics.timer('sintesa_stage_seconds', stage='encode'):
+            out.write(frame)
+
+    def on_batch(frame_index, detections):
+        # Thread inferensi: stride sampler menyesuaikan begitu hasil model ada, tanpa menunggu encode
+        for sampled_index, conf in detections:
+            sampler.record_detection(sampled_index, conf is not None)
+        if progress_callback and total_frames > 0:
+            progress_callback(min(frame_index / total_frames, 1.0))
+
+    def preprocess(frame):
+        with metrics.timer('sintesa_stage_seconds', stage='preprocess'):
+            return preprocessor(frame)
+
+    def infer_batch(frames, originals=None):
+        return detect_violence_batch(frames, originals=originals, model_version=model_version,
+                                     regions=[region] * len(frames) if region is not None else None)
+
+    run_detection_pipeline(
+        TimedCapture(cap), should_infer, infer_batch, handle_frame,
+        batch_size=max(1, app.config['INFERENCE_BATCH_SIZE']),
+        queue_size=max(1, app.config['PIPELINE_QUEUE_SIZE']),
+        on_batch=on_batch,
+        first_frame=first_frame,
+        preprocess=preprocess if preprocessor else None,
+        next_decode=next_decode,
+        seek_frames=app.config['DECODE_SEEK_FRAMES']
+    )
+
+    # Statistik sampler tanpa frame warm-up
+    analysis.sampling = {
+        key: value - warmup_stats[key] if key in warmup_stats and isinstance(value, (int, float)) else value
+        for key, value in sampler.stats().items()
+    }
+    return analysis
+
+def peak_image(peak):
+    """Gambar teranotasi dari PeakFrames: mode detect menyimpan hasil model, di-plot hanya untuk screenshot"""
+    return peak.plot() if peak is not None and hasattr(peak, 'plot') else peak
+
+def open_video_writer(output_path, fps, frame_size, preview_path=None):
+    """FFmpegVideoWriter dengan pengaturan encoder aplikasi; preview_path menulis rendition kecil sekaligus"""
+    return FFmpegVideoWriter(output_path, fps, frame_size,
+                             preset=app.config['VIDEO_ENCODER_PRESET'],
+                             crf=app.config['VIDEO_ENCODER_CRF'],
+                             preview_path=preview_path,
+                             preview_height=app.config['VIDEO_PREVIEW_HEIGHT'],
+                             preview_crf=app.config['VIDEO_PREVIEW_CRF'])
+
+def process_shard(filepath, output_path, start_frame, end_frame, warmup_frames=0, preprocess=False,
+                  model_version=None, preview_path=None, region=None):
+    """
+    Proses frame start_frame..end_frame (end_frame None = sampai akhir) di proses shard.
+    Posisi awal dicari dengan seek; warmup_frames frame sebelumnya menyamakan state sampler.
+    region (InferenceRegion) dikirim dari proses utama agar semua shard memakai pengaturan yang sama.
+    Hasil anotasi di-encode ke output_path (dan preview_path jika ada; output_path None = mode
+    detect tanpa encode); mengembalikan VideoAnalysis.
+    """
+    cap = open_capture(filepath, max(1, start_frame - warmup_frames), end_frame,
+                       scaled=scaled_decode(output_path is not None, region))
+    if not cap.isOpened():
+        raise VideoProcessingError('Error opening video')
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    out = None
+    if output_path:
+        out = open_video_writer(output_path, fps, (int(cap.get(3)), int(cap.get(4))), preview_path)
+        if not out.isOpened():
+            cap.release()
+            raise VideoProcessingError('Failed to initialize video writer')
+
     try:
-        clip = VideoFileClip(input_path)
-        clip.write_videofile(output_path, codec='libx264', audio=False, fps=clip.fps)
-        clip.close()
-        return True
-    except Exception as e:
-        print(f"Conversion error: {e}")
-        return False
+        analysis = analyze_video(cap, out, fps, first_frame=cap.start_frame, output_from=start_frame,
+                                 preprocessor=create_preprocessor(region) if preprocess else None,
+                                 model_version=model_version, region=region)
+    finally:
+        cap.release()
+        encoded = False
+        if out is not None:
+            with metrics.timer('sintesa_stage_seconds', stage='transcode'):
+                encoded = out.release()
+    analysis.encoded = encoded
+    metrics.flush(app.config['METRICS_DIR'])
+    return analysis
+
+def init_shard_worker(threads):
+    # Setiap proses shard mendapat bagian core yang sama untuk operasi torch
+    import torch
+    torch.set_num_threads(threads)
+
+def get_shard_executor():
+    """Pool proses shard (dibuat sekali per proses); setiap proses memuat modelnya sendiri"""
+    global _shard_executor
+    if _shard_executor is None:
+        processes = app.config['SHARD_PROCESSES']
+        _shard_executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_shard_worker,
+            initargs=(max(1, (os.cpu_count() or 1) // processes),)
+        )
+    return _shard_executor
 
-# Kirim notifikasi ke Telegram
-def send_telegram_notification_sync(message):
+def analyze_sharded(filepath, output_path, fps, shards, progress_callback=None, executor=None, preprocess=False,
+                    model_version=None, preview_path=None, region=None):
+    """
+    Proses setiap rentang frame di shards secara paralel lalu gabungkan hasilnya sesuai urutan.
+    Setiap frame tetap di-encode sekali: potongan H.264 dari setiap shard disambung dengan
+    stream copy (begitu juga potongan preview jika preview_path diisi). Segmentasi kejadian
+    dilakukan setelah penggabungan, sehingga kejadian yang melewati batas shard tetap menjadi satu.
+    output_path None = mode detect: shard tidak meng-encode apa pun.
+    """
+    executor = executor or get_shard_executor()
+    # Motion sampler bergantung pada frame sebelumnya; fixed stride memakai nomor frame global
+    warmup = 0
+    if app.config['FRAME_SAMPLING'] != 'fixed':
+        warmup = int(fps * app.config['SAMPLER_IDLE_SECONDS']) + app.config['SAMPLER_MAX_STRIDE']
+
+    stem = os.path.splitext(output_path)[0] if output_path else None
+    part_paths = [f"{stem}.part{number:03d}.mp4" if output_path else None for number in range(len(shards))]
+    preview_parts = [f"{stem}.part{number:03d}.preview.mp4" if output_path and preview_path else None
+                     for number in range(len(shards))]
+    logger.info("Processing %s in %d shards", os.path.basename(filepath), len(shards))
+
+    futures = {
+        executor.submit(process_shard, filepath, part_path, start, end, warmup, preprocess, model_version,
+                        preview_part, region): number
+        for number, (part_path, preview_part, (start, end)) in enumerate(zip(part_paths, preview_parts, shards))
+    }
+    results = [None] * len(shards)
     try:
-        print(f"Attempting to send to chat_id: {TELEGRAM_CHAT_ID}")
-        api_url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": message,
-            "parse_mode": "HTML"
-        }
-        
-        response = requests.post(api_url, data=payload)
-        if response.status_code == 200:
-            print(f"Telegram notification sent: {message}")
-            print(f"Telegram API response: {response.json()}")
-            return True
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(sum(r is not None for r in results) / len(results))
+
+        analysis = VideoAnalysis(fps)
+        for result in results:
+            analysis.extend(result)
+        if output_path and all(result.encoded for result in results):
+            with metrics.timer('sintesa_stage_seconds', stage='concat'):
+                analysis.encoded = concat_videos(part_paths, output_path)
+                if preview_path and not concat_videos(preview_parts, preview_path) and os.path.exists(preview_path):
+                    os.remove(preview_path)  # Preview opsional: video hasil tetap dipakai
+    finally:
+        for future in futures:
+            future.cancel()
+        for part_path in [path for path in part_paths + preview_parts if path]:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    return analysis
+
+def process_video(filepath, filename, progress_callback=None, stats=None, content_hash=None, capture=None,
+                  commit=True, mode=MODE_FULL):
+    """
+    Jalankan seluruh pipeline deteksi untuk satu video yang sudah tersimpan:
+    decode, inferensi YOLO, encode hasil, notifikasi Telegram dan simpan ke database.
+    progress_callback (opsional) dipanggil dengan nilai 0.0 - 1.0 setiap batch selesai.
+    stats (opsional, dict) diisi statistik pemilihan frame (diinferensi vs dilewati).
+    content_hash (opsional) menjadikan hasilnya entri cache untuk upload berikutnya.
+    capture (opsional) menggantikan open_capture(filepath), mis. GrowingFileCapture.
+    Video yang cukup panjang dipecah ke SHARD_PROCESSES proses (lihat analyze_sharded).
+    Seluruh video diproses satu versi model (dipilih registry, lihat MODEL_TRAFFIC) yang
+    dicatat di DetectionHistory.model_version.
+    commit=False mengembalikan DetectionHistory yang belum ditambahkan ke session dan belum
+    mengirim notifikasi; pemanggil yang menyimpannya (mis. ingest per batch transaksi).
+    mode=MODE_DETECT hanya decode dan inferensi: tanpa anotasi, encode maupun preview. Kotak
+    deteksi per frame selalu disimpan (detections_path), sehingga video hasil bisa dirender
+    kemudian tanpa inferensi ulang (lihat render_detection).
+    Mengembalikan DetectionHistory yang baru disimpan.
+    """
+    render = mode != MODE_DETECT
+    metadata = parse_filename_metadata(filename)
+    room = metadata['room'] if metadata else None
+    preprocess = preprocess_enabled(room)
+    region = inference_region(room)
+    model_version = model_registry.version(model_registry.select(content_hash or filename))
+
+    cap = capture or open_capture(filepath, scaled=scaled_decode(render, region))
+    if not cap.isOpened():
+        if capture is None:
+            os.remove(filepath)  # Capture dari pemanggil (upload bertahap) masih menulis ke file ini
+        raise VideoProcessingError('Error opening video')
+
+    # Dapatkan resolusi dan frame rate
+    width = int(cap.get(3))  # Lebar
+    height = int(cap.get(4))  # Tinggi
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # Default 30 FPS jika tidak terdeteksi
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+    output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"result_{filename}") if render else None
+    stem = os.path.splitext(filename)[0]
+    # Rendition kecil untuk halaman detail, di-encode bersamaan dengan video hasil
+    preview_path = None
+    if render and app.config['VIDEO_PREVIEW_HEIGHT'] > 0:
+        preview_path = os.path.join(app.config['UPLOAD_FOLDER'], f"preview_{stem}.mp4")
+
+    logger.info("Starting video processing: %s (%dx%d, %.2f fps, %d frames) with model %s, %s mode",
+                filename, width, height, fps, total_frames, model_version, mode)
+
+    shards = plan_shards(total_frames, app.config['SHARD_PROCESSES'],
+                         int(app.config['SHARD_MIN_SECONDS'] * fps)) if capture is None else []
+    if len(shards) > 1:
+        # Video panjang: setiap rentang waktu diproses di proses terpisah lalu disambung
+        cap.release()
+        analysis = analyze_sharded(filepath, output_path, fps, shards, progress_callback, preprocess=preprocess,
+                                   model_version=model_version, preview_path=preview_path, region=region)
+    else:
+        # Frame hasil anotasi langsung di-encode ke H.264 yang kompatibel dengan browser
+        out = open_video_writer(output_path, fps, (width, height), preview_path) if render else None
+
+        if out is not None and not out.isOpened():
+            cap.release()
+            if capture is None:
+                os.remove(filepath)
+            raise VideoProcessingError('Failed to initialize video writer')
+
+        try:
+            analysis = analyze_video(cap, out, fps, total_frames, progress_callback,
+                                     preprocessor=create_preprocessor(region) if preprocess else None,
+                                     model_version=model_version, region=region)
+        except Exception:
+            cap.release()
+            if out is not None:
+                out.release()
+            raise
+
+        cap.release()
+        if out is not None:
+            # Menunggu ffmpeg menyelesaikan file H.264 (pengganti tahap transcode MoviePy)
+            with metrics.timer('sintesa_stage_seconds', stage='transcode'):
+                analysis.encoded = out.release()
+    encoded = analysis.encoded
+
+    # Deteksi per frame -> interval kekerasan; deteksi satu frame yang terisolasi tidak dihitung
+    with metrics.timer('sintesa_stage_seconds', stage='segmentation'):
+        intervals = segment_events(analysis.track.frame_indices, analysis.track.confidences, fps,
+                                   **event_settings())
+    violence_detected = bool(intervals)
+
+    sampling_stats = analysis.sampling
+    if stats is not None:
+        stats.update(sampling_stats)
+        stats['frames_detected'] = analysis.frames_detected
+        stats['events'] = len(intervals)
+        stats['model_version'] = model_version
+        stats['analysis_mode'] = mode
+        stats['duration'] = round(sampling_stats['frames_total'] / fps, 3)
+        if len(shards) > 1:
+            stats['shards'] = len(shards)
+        if preprocess:
+            stats['preprocess'] = True
+        if region is not None:
+            stats['region'] = region.settings()
+
+    logger.info("Finished %s: %d frames with violence in %d events, %d processed, %d of %d skipped (%s sampling)",
+                filename, analysis.frames_detected, len(intervals), analysis.frames_processed,
+                sampling_stats['frames_skipped'], sampling_stats['frames_total'], sampling_stats['mode'])
+    for interval in intervals:
+        logger.info("Violence event %.2f-%.2fs: peak confidence %.3f, mean %.3f",
+                    interval.start_time, interval.end_time, interval.peak_confidence, interval.mean_confidence)
+
+    # Pastikan encoder selesai dan menghasilkan file
+    if render and (not encoded or not os.path.exists(output_path) or os.path.getsize(output_path) == 0):
+        for path in (output_path, preview_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        if capture is None:
+            os.remove(filepath)
+        raise VideoProcessingError('Failed to generate detected video')
+    if preview_path and not os.path.exists(preview_path):
+        preview_path = None
+
+    # Screenshot per kejadian; yang confidence-nya tertinggi juga menjadi screenshot video
+    events = []
+    for number, interval in enumerate(intervals, start=1):
+        screenshot_path = None
+        image = peak_image(analysis.peaks.best(interval.start_frame, interval.end_frame))
+        if image is not None:
+            screenshot_path = os.path.join(app.config['UPLOAD_FOLDER'], f"violence_frame_{stem}_{number}.jpg")
+            cv2.imwrite(screenshot_path, image)
+        events.append(ViolenceEvent(
+            start_frame=interval.start_frame,
+            end_frame=interval.end_frame,
+            start_time=interval.start_time,
+            end_time=interval.end_time,
+            peak_frame=interval.peak_frame,
+            peak_confidence=interval.peak_confidence,
+            mean_confidence=interval.mean_confidence,
+            screenshot_path=screenshot_path
+        ))
+    peak_event = max(events, key=lambda e: e.peak_confidence, default=None)
+
+    # Poster kecil untuk riwayat dan player: frame puncak kejadian, atau frame pertama video hasil
+    poster_path = None
+    image = peak_image(analysis.peaks.best(peak_event.start_frame, peak_event.end_frame)) if peak_event else None
+    poster = make_thumbnail(image, app.config['VIDEO_POSTER_WIDTH']) if image is not None else analysis.poster
+    if poster is not None:
+        poster_path = os.path.join(app.config['UPLOAD_FOLDER'], f"poster_{stem}.jpg")
+        cv2.imwrite(poster_path, poster)
+
+    # Kotak deteksi per frame: dasar render video hasil (mode detect) dan audit
+    detections_path = os.path.join(app.config['UPLOAD_FOLDER'], f"detections_{stem}.npz")
+    analysis.detections.save(detections_path, analysis.track, fps=fps, width=width, height=height,
+                             frames_total=sampling_stats['frames_total'], model_version=model_version)
+
+    # Save detection to database
+    detection = DetectionHistory(
+        filename=filename,
+        room=room,
+        detection_date=metadata['date'] if metadata else None,
+        detection_time=metadata['time'] if metadata else None,
+        recorded_at=metadata['recorded_at'] if metadata else None,
+        violence_detected=violence_detected,
+        original_video_path=filepath,
+        result_video_path=output_path,
+        screenshot_path=peak_event.screenshot_path if peak_event else None,
+        poster_path=poster_path,
+        preview_path=preview_path,
+        detections_path=detections_path,
+        content_hash=content_hash,
+        cache_key=compute_cache_key(content_hash, room, model_version, mode) if content_hash else None,
+        model_version=model_version,
+        events=events
+    )
+    index_artifacts(detection)
+    if not commit:
+        return detection
+
+    db.session.add(detection)
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+
+    # Kirim notifikasi ke Telegram, satu pesan per kejadian
+    for event in events:
+        send_violence_alert(filename, metadata, event.screenshot_path, event)
+
+    metrics.inc('sintesa_videos_total', status='completed')
+    return detection
+
+def render_detection(detection, progress_callback=None, stats=None):
+    """
+    Buat video hasil (dan preview) untuk deteksi mode detect dari kotak yang tersimpan:
+    hanya decode, gambar kotak dan encode, tanpa inferensi. Frame yang sama dianotasi dengan
+    kotak yang sama, jadi hasilnya sama dengan mode full. Perubahan path di-commit.
+    """
+    if detection.archived_at is not None or not detection.detections_path:
+        raise VideoProcessingError('Detection has no stored detections to render')
+    stored = StoredDetections.load(detection.detections_path)
+    cap = open_capture(detection.original_video_path)
+    if not cap.isOpened():
+        raise VideoProcessingError('Error opening video')
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"result_{detection.filename}")
+    preview_path = None
+    if app.config['VIDEO_PREVIEW_HEIGHT'] > 0:
+        stem = os.path.splitext(detection.filename)[0]
+        preview_path = os.path.join(app.config['UPLOAD_FOLDER'], f"preview_{stem}.mp4")
+    out = open_video_writer(output_path, fps, (int(cap.get(3)), int(cap.get(4))), preview_path)
+    if not out.isOpened():
+        cap.release()
+        raise VideoProcessingError('Failed to initialize video writer')
+
+    logger.info("Rendering %s from %d stored detections", detection.filename, len(stored.frames))
+    frame_index = 0
+    try:
+        capture = TimedCapture(cap)
+        while True:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frame_index += 1  # Sama dengan penomoran pipeline (frame pertama = 1)
+            with metrics.timer('sintesa_stage_seconds', stage='annotation'):
+                frame = stored.annotate(frame, frame_index)
+            with metrics.timer('sintesa_stage_seconds', stage='encode'):
+                out.write(frame)
+            if progress_callback and total_frames > 0 and frame_index % 30 == 0:
+                progress_callback(min(frame_index / total_frames, 1.0))
+    finally:
+        cap.release()
+        with metrics.timer('sintesa_stage_seconds', stage='transcode'):
+            encoded = out.release()
+
+    if not encoded or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        for path in (output_path, preview_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        raise VideoProcessingError('Failed to generate detected video')
+
+    detection.result_video_path = output_path
+    detection.preview_path = preview_path if preview_path and os.path.exists(preview_path) else None
+    index_artifacts(detection)
+    if stats is not None:
+        stats.update(analysis_mode=MODE_RENDER, frames_total=frame_index, frames_annotated=len(stored.frames))
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+    return detection
+
+# Masukkan video yang sudah tersimpan ke antrian pemrosesan
+def enqueue_detection_job(filepath, filename, content_hash=None, mode=MODE_FULL):
+    job = DetectionJob(filename=filename, filepath=filepath, content_hash=content_hash, mode=mode, status=JOB_QUEUED)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def enqueue_render_job(detection):
+    """Antrikan render video hasil deteksi mode detect (lihat render_detection)"""
+    job = DetectionJob(filename=detection.filename, filepath=detection.original_video_path,
+                       content_hash=detection.content_hash, mode=MODE_RENDER, detection_id=detection.id,
+                       status=JOB_QUEUED)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def cached_job(cached, filepath, filename, content_hash, mode):
+    """Job untuk upload yang hasilnya sudah ada di cache; mode full tanpa video hasil menjadi job render"""
+    if mode == MODE_FULL and cached.result_video_path is None:
+        return enqueue_render_job(cached)
+    return record_cached_job(cached, filepath, filename, content_hash)
+
+# Catat job yang langsung selesai karena hasilnya diambil dari cache
+def record_cached_job(detection, filepath, filename, content_hash):
+    now = datetime.utcnow()
+    job = DetectionJob(
+        filename=filename,
+        filepath=filepath,
+        content_hash=content_hash,
+        status=JOB_COMPLETED,
+        progress=100.0,
+        detection_id=detection.id,
+        stats={'cache_hit': True},
+        started_at=now,
+        finished_at=now
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_next_job():
+    """
+    Ambil job tertua yang masih antri dan tandai sebagai running.
+    UPDATE bersyarat pada status memastikan satu job hanya diambil oleh satu worker.
+    """
+    job = DetectionJob.query.filter_by(status=JOB_QUEUED).order_by(DetectionJob.created_at).first()
+    if job is None:
+        return None
+
+    now = datetime.utcnow()
+    claimed = DetectionJob.query.filter_by(id=job.id, status=JOB_QUEUED).update(
+        {'status': JOB_RUNNING, 'started_at': now, 'updated_at': now},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if not claimed:
+        return None
+
+    db.session.refresh(job)
+    return job
+
+def requeue_stale_jobs():
+    """Kembalikan job 'running' yang workernya mati (tidak ada update) ke antrian"""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['JOB_STALE_SECONDS'])
+    count = DetectionJob.query.filter(
+        DetectionJob.status == JOB_RUNNING,
+        DetectionJob.updated_at < cutoff
+    ).update({'status': JOB_QUEUED, 'progress': 0.0}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def run_detection_job(job, progress_callback, stats):
+    """Analisis video job (mode full/detect); mengembalikan DetectionHistory yang disimpan"""
+    # Upload bertahap yang belum selesai: decode mengikuti file selagi bagian akhirnya datang
+    upload = UploadSession.query.filter_by(job_id=job.id).first()
+    capture = None
+    if upload is not None and upload.status == UPLOAD_ACTIVE:
+        capture = GrowingFileCapture(job.filepath, lambda: upload_finished(upload.id),
+                                     stall_timeout=app.config['UPLOAD_STALL_SECONDS'])
+        stats['progressive'] = True
+
+    if upload is None:
+        return process_video(job.filepath, job.filename, progress_callback=progress_callback,
+                             stats=stats, content_hash=job.content_hash, mode=job.mode)
+
+    # Hasil upload baru disimpan (dan dinotifikasi) setelah upload terbukti lengkap dan checksum-nya cocok
+    detection = process_video(job.filepath, job.filename, progress_callback=progress_callback, stats=stats,
+                              content_hash=job.content_hash, capture=capture, commit=False, mode=job.mode)
+    db.session.refresh(upload)
+    if upload.status != UPLOAD_COMPLETE or (upload.checksum and upload.checksum.lower() != upload.content_hash):
+        for path in detection.artifact_paths():
+            if path != detection.original_video_path and os.path.exists(path):
+                os.remove(path)
+        raise VideoProcessingError(upload.error or 'Upload did not complete')
+    if detection.content_hash is None:
+        job.content_hash = detection.content_hash = upload.content_hash
+        detection.cache_key = compute_cache_key(upload.content_hash, detection.room, detection.model_version,
+                                                job.mode)
+        index_artifacts(detection)
+
+    db.session.add(detection)
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+    metadata = parse_filename_metadata(detection.filename)
+    for event in detection.events:
+        send_violence_alert(detection.filename, metadata, event.screenshot_path, event)
+    metrics.inc('sintesa_videos_total', status='completed')
+    return detection
+
+def run_job(job):
+    """Proses satu job dan simpan hasil/errornya ke database"""
+    last_update = time.time()
+
+    def report_progress(fraction):
+        nonlocal last_update
+        # Batasi frekuensi commit ke database, sekaligus berfungsi sebagai heartbeat
+        if time.time() - last_update < 1.0:
+            return
+        last_update = time.time()
+        job.progress = round(fraction * 100, 1)
+        db.session.commit()
+
+    stats = {}
+    try:
+        if job.mode == MODE_RENDER:
+            # Deteksi sudah ada; video hasil yang sudah dirender job lain tidak dibuat ulang
+            detection = job.detection
+            if detection.result_video_path is None:
+                render_detection(detection, progress_callback=report_progress, stats=stats)
         else:
-            print(f"Telegram API error: {response.status_code} - {response.text}")
-            return False
-            
+            detection = run_detection_job(job, report_progress, stats)
     except Exception as e:
-        print(f"Failed to send Telegram notification: {e}")
-        return False
-    
-def send_telegram_photo(photo_path, caption):
+        db.session.rollback()
+        logger.error("Job %s failed: %s", job.id, e)
+        metrics.inc('sintesa_videos_total', status='failed')
+        job.status = JOB_FAILED
+        job.error = str(e)
+    else:
+        job.status = JOB_COMPLETED
+        job.progress = 100.0
+        job.detection_id = detection.id
+        job.stats = stats
+
+    job.finished_at = datetime.utcnow()
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+    metrics.flush(app.config['METRICS_DIR'])
+    return job
+
+def upload_finished(upload_id):
+    """(selesai, ukuran akhir) untuk GrowingFileCapture; dipanggil dari thread feeder"""
+    with app.app_context():
+        upload = db.session.get(UploadSession, upload_id)
+        if upload is None or upload.status == UPLOAD_FAILED:
+            return True, 0
+        return upload.status == UPLOAD_COMPLETE, upload.size
+
+def start_progressive_job(upload):
+    """Antrikan deteksi sebelum upload selesai jika awal file sudah cukup untuk didecode"""
+    if upload.job_id or not app.config['UPLOAD_PROGRESSIVE']:
+        return None
+    if upload.offset < min(app.config['UPLOAD_PROGRESSIVE_MIN_BYTES'], upload.size):
+        return None
+    if not is_streamable(upload.filepath):
+        return None
+    job = enqueue_detection_job(upload.filepath, upload.filename, mode=upload.mode)
+    upload.job_id = job.id
+    db.session.commit()
+    logger.info("Started progressive job %s for upload %s", job.id, upload.id)
+    return job
+
+def finalize_upload(upload):
+    """Verifikasi checksum upload yang sudah lengkap lalu antrikan (atau ambil dari cache) deteksinya"""
+    content_hash = file_sha256(upload.filepath)
+    if upload.checksum and upload.checksum.lower() != content_hash:
+        upload.status = UPLOAD_FAILED
+        upload.error = 'Checksum mismatch'
+        db.session.commit()
+        if not upload.job_id and os.path.exists(upload.filepath):
+            os.remove(upload.filepath)
+        return upload
+
+    upload.status = UPLOAD_COMPLETE
+    upload.content_hash = content_hash
+    db.session.commit()
+    store_content(upload.filepath, content_hash)
+
+    if upload.job_id and upload.job.status != JOB_FAILED:
+        return upload  # Job progresif sudah berjalan dan akan melihat status complete
+
+    cached = find_cached_detection(compute_cache_key(content_hash, filename_room(upload.filename), mode=upload.mode))
+    if cached:
+        if os.path.abspath(cached.original_video_path) != os.path.abspath(upload.filepath):
+            os.remove(upload.filepath)
+        logger.info("Cache hit for %s: detection %s", upload.filename, cached.id)
+        metrics.inc('sintesa_videos_total', status='cached')
+        job = cached_job(cached, upload.filepath, upload.filename, content_hash, upload.mode)
+    else:
+        job = enqueue_detection_job(upload.filepath, upload.filename, content_hash, upload.mode)
+    upload.job_id = job.id
+    db.session.commit()
+    return upload
+
+def run_job_worker():
+    """Loop worker: ambil job dari antrian dan proses satu per satu"""
+    preload()
+    logger.info("Worker %s ready", os.getpid())
+    while True:
+        with app.app_context():
+            job = claim_next_job()
+            if job is not None:
+                logger.info("Worker %s processing job %s: %s", os.getpid(), job.id, job.filename)
+                run_job(job)
+                continue
+        time.sleep(app.config['JOB_POLL_INTERVAL'])
+
+@app.cli.command('worker')
+@click.option('--processes', '-p', type=int, default=None, help='Jumlah proses worker (default JOB_WORKERS).')
+def worker_command(processes):
+    """Jalankan worker pemrosesan video di latar belakang."""
+    processes = processes or app.config['JOB_WORKERS']
+
+    requeued = requeue_stale_jobs()
+    if requeued:
+        logger.info("Requeued %d stale job(s)", requeued)
+
+    # Retensi folder upload berjalan terjadwal di proses induk worker, bukan per request
+    stop = threading.Event()
+    if app.config['RETENTION_INTERVAL'] > 0:
+        threading.Thread(target=run_retention_loop, args=(stop,), name='retention', daemon=True).start()
+
+    # spawn: setiap proses memuat modelnya sendiri tanpa mewarisi state thread torch
+    ctx = multiprocessing.get_context('spawn')
+    workers = [ctx.Process(target=run_job_worker) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    logger.info("Started %d worker process(es)", processes)
+
     try:
-        with open(photo_path, 'rb') as photo:
-            url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendPhoto"
-            files = {'photo': photo}
-            data = {'chat_id': TELEGRAM_CHAT_ID, 'caption': caption}
-            response = requests.post(url, files=files, data=data)
-            return response.status_code == 200
-    except Exception as e:
-        print(f"Error sending photo: {e}")
-        return False
-    
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+    finally:
+        stop.set()
+
+@app.cli.command('retention')
+def retention_command():
+    """Jalankan satu putaran retensi folder upload (mis. dari cron tanpa worker)."""
+    summary = enforce_retention()
+    click.echo(f"Indexed {summary['indexed']} detection(s), archived {summary['archived']}, "
+               f"removed {summary['orphans']} orphan file(s), freed {summary['freed_bytes'] / 1e6:.1f} MB")
+
+def find_ingest_files(directory, recursive=False):
+    """Path video (ALLOWED_EXTENSIONS) di directory, urut nama agar urutan pemrosesan stabil"""
+    pattern = os.path.join(directory, '**', '*') if recursive else os.path.join(directory, '*')
+    return sorted(path for path in glob.glob(pattern, recursive=recursive)
+                  if os.path.isfile(path) and allowed_file(path))
+
+def link_or_copy(source, destination):
+    """
+    Hard link jika satu filesystem (tanpa menyalin isi), selain itu salin. Destination diganti
+    secara atomik, jadi path yang sudah dipesan claim_upload_path tidak pernah kosong.
+    """
+    temp_path = f"{destination}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+def ingest_file(path, content_hash, mode=MODE_FULL):
+    """
+    Analisis satu file rekaman untuk ingest (dijalankan di thread pool). File sumber tidak
+    diubah: salinannya di UPLOAD_FOLDER (lihat claim_upload_path; mis. cam1/x.mp4 dan cam2/x.mp4
+    dengan --recursive tidak saling menimpa) yang diproses dan direferensikan hasilnya.
+    Mengembalikan (detection, stats); detection belum disimpan.
+    """
+    stats = {}
+    with app.app_context():
+        filename, filepath = claim_upload_path(secure_filename(os.path.basename(path)))
+        link_or_copy(path, filepath)
+        store_content(filepath, content_hash)
+        detection = process_video(filepath, filename, stats=stats, content_hash=content_hash, commit=False,
+                                  mode=mode)
+    return detection, stats
+
+def save_ingested(detections, alerts=False):
+    """Simpan hasil ingest dalam satu transaksi, lalu (opsional) kirim notifikasinya"""
+    if not detections:
+        return
+    db.session.add_all(detections)
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+    for detection in detections:
+        metrics.inc('sintesa_videos_total', status='completed')
+        if alerts:
+            metadata = parse_filename_metadata(detection.filename)
+            for event in detection.events:
+                send_violence_alert(detection.filename, metadata, event.screenshot_path, event)
+    detections.clear()
+
+@app.cli.command('ingest')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', '-w', type=int, default=None, help='Jumlah video yang diproses bersamaan (default JOB_WORKERS).')
+@click.option('--recursive', '-r', is_flag=True, help='Ikut memindai subfolder.')
+@click.option('--watch', is_flag=True, help='Terus pantau folder untuk file baru (hentikan dengan Ctrl+C).')
+@click.option('--interval', type=float, default=10.0, help='Detik antar pemindaian folder pada mode --watch.')
+@click.option('--commit-every', type=int, default=20, help='Jumlah hasil per transaksi database.')
+@click.option('--alerts', is_flag=True, help='Kirim notifikasi Telegram untuk kejadian yang ditemukan.')
+@click.option('--mode', type=click.Choice(ANALYSIS_MODES), default=None,
+              help='full (dengan video hasil) atau detect (hanya deteksi, render nanti); default ANALYSIS_MODE.')
+def ingest_command(directory, workers, recursive, watch, interval, commit_every, alerts, mode):
+    """Analisis semua rekaman video di DIRECTORY (mis. ROOM_DD-MM-YY_HH-MM.mp4).
+
+    File yang isinya (SHA-256) sudah ada di riwayat deteksi dilewati, sehingga perintah
+    yang terhenti bisa dijalankan ulang dan melanjutkan dari file yang belum selesai.
+    """
+    workers = workers or app.config['JOB_WORKERS']
+    mode = mode or app.config['ANALYSIS_MODE']
+    known_hashes = {content_hash for (content_hash,) in db.session.query(DetectionHistory.content_hash)
+                    .filter(DetectionHistory.content_hash.isnot(None))}
+    totals = {'found': 0, 'processed': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'duration': 0.0,
+              'frames': 0, 'violent': 0, 'events': 0}
+    pending = []
+    seen = {}  # path -> (ukuran, mtime) saat terakhir dilihat; None jika sudah diantrikan
+    futures = {}
+    start = time.time()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+
+    def scan():
+        for path in find_ingest_files(directory, recursive):
+            if seen.get(path, ()) is None:
+                continue
+            stat = os.stat(path)
+            state = (stat.st_size, stat.st_mtime)
+            # Mode watch: file yang masih ditulis (ukurannya berubah) ditunggu scan berikutnya
+            if watch and seen.get(path) != state:
+                seen[path] = state
+                continue
+            seen[path] = None
+            totals['found'] += 1
+            # Hash dihitung berurutan di sini agar duplikat di dalam folder diproses tepat sekali
+            content_hash = file_sha256(path)
+            if content_hash in known_hashes:
+                totals['skipped'] += 1
+                continue
+            known_hashes.add(content_hash)
+            futures[executor.submit(ingest_file, path, content_hash, mode)] = path
+
+    def collect(future):
+        path = futures.pop(future)
+        try:
+            detection, stats = future.result()
+        except Exception as e:
+            logger.error("Failed to ingest %s: %s", path, e)
+            metrics.inc('sintesa_videos_total', status='failed')
+            totals['failed'] += 1
+            return
+        totals['processed'] += 1
+        totals['bytes'] += os.path.getsize(path)
+        logger.info("Ingested %s: %s", os.path.basename(path),
+                    f"{len(detection.events)} event(s)" if detection.violence_detected else 'no violence')
+        totals['duration'] += stats.get('duration', 0.0)
+        totals['frames'] += stats.get('frames_total', 0)
+        totals['violent'] += int(detection.violence_detected)
+        totals['events'] += len(detection.events)
+        pending.append(detection)
+        if len(pending) >= commit_every:
+            save_ingested(pending, alerts)
+
+    try:
+        scan()
+        while futures or watch:
+            done, _ = wait(list(futures), timeout=interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future)
+            if watch:
+                scan()
+    except KeyboardInterrupt:
+        # File yang belum mulai diproses dilanjutkan saat perintah dijalankan lagi
+        click.echo('Interrupted, finishing videos in progress (Ctrl+C again to abort)...')
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in [f for f in futures if not f.cancelled()]:
+            collect(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        save_ingested(pending, alerts)
+        metrics.flush(app.config['METRICS_DIR'])
+
+    elapsed = max(time.time() - start, 1e-9)
+    click.echo(f"Files: {totals['found']} found, {totals['processed']} processed, "
+               f"{totals['skipped']} skipped (already analyzed), {totals['failed']} failed")
+    click.echo(f"Video: {totals['duration'] / 60:.1f} min in {elapsed / 60:.1f} min "
+               f"({totals['duration'] / elapsed:.1f}x realtime), {totals['frames']} frames "
+               f"({totals['frames'] / elapsed:.1f} fps)")
+    click.echo(f"Data: {totals['bytes'] / 1e6:.1f} MB ({totals['bytes'] / 1e6 / elapsed:.1f} MB/s), "
+               f"{totals['processed'] / elapsed * 3600:.0f} videos/hour")
+    click.echo(f"Violence: {totals['violent']} video(s), {totals['events']} event(s)")
+
+def stream_name(source):
+    # Dipakai sebagai awalan nama file segmen, mis. D404_16-10-26_11-00-05.mp4
+    return secure_filename(source.room or source.name).replace('_', '-') or f'camera-{source.id}'
+
+def save_stream_segment(segment):
+    """Simpan segmen kekerasan dari kamera live sebagai DetectionHistory dan kirim notifikasi"""
+    if not segment.ok:
+        logger.error("Failed to record segment %s from stream %s", segment.filename, segment.source_id)
+        for path in (segment.raw_path, segment.result_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    source = db.session.get(StreamSource, segment.source_id)
+    room = (source.room or source.name) if source else None
+
+    screenshot_path = poster_path = None
+    if segment.screenshot is not None:
+        stem = os.path.splitext(segment.filename)[0]
+        screenshot_path = os.path.join(app.config['UPLOAD_FOLDER'], f"violence_frame_{stem}.jpg")
+        cv2.imwrite(screenshot_path, segment.screenshot)
+        poster_path = os.path.join(app.config['UPLOAD_FOLDER'], f"poster_{stem}.jpg")
+        cv2.imwrite(poster_path, make_thumbnail(segment.screenshot, app.config['VIDEO_POSTER_WIDTH']))
+
+    started = segment.started_at
+    metadata = {
+        'room': room,
+        'date': f"{started.day} {started:%B} {started.year}",
+        'time': f"{started:%H:%M} WIB",
+    }
+
+    # Satu segmen = satu kejadian, dari deteksi pertama hingga terakhir di dalam file segmen
+    event = None
+    if segment.first_detection_frame is not None:
+        event = ViolenceEvent(
+            start_frame=segment.first_detection_frame,
+            end_frame=segment.last_detection_frame,
+            start_time=(segment.first_detection_frame - 1) / segment.fps,
+            end_time=segment.last_detection_frame / segment.fps,
+            peak_frame=segment.peak_frame,
+            peak_confidence=segment.peak_confidence,
+            mean_confidence=segment.mean_confidence,
+            screenshot_path=screenshot_path
+        )
+
+    detection = DetectionHistory(
+        filename=segment.filename,
+        room=room,
+        detection_date=metadata['date'],
+        detection_time=metadata['time'],
+        recorded_at=started,
+        violence_detected=True,
+        original_video_path=segment.raw_path,
+        result_video_path=segment.result_path,
+        screenshot_path=screenshot_path,
+        poster_path=poster_path,
+        stream_source_id=segment.source_id,
+        model_version=model_registry.version(),
+        events=[event] if event else []
+    )
+    index_artifacts(detection)
+    db.session.add(detection)
+    with metrics.timer('sintesa_stage_seconds', stage='db_commit'):
+        db.session.commit()
+
+    logger.info("Recorded segment %s (%d frames, peak confidence %.3f)",
+                segment.filename, segment.frames, segment.peak_confidence)
+    send_violence_alert(segment.filename, metadata, screenshot_path, event)
+    return detection
+
+def source_preprocess(source):
+    return source.preprocess if source.preprocess is not None else preprocess_enabled(source.room)
+
+def source_region(source):
+    # roi kosong ('') pada kamera berarti seluruh frame walaupun ruangannya punya ROI_ROOMS
+    return inference_region(source.room, roi=parse_roi(source.roi) or [] if source.roi is not None else None,
+                            tiled=source.tiled)
+
+def create_camera_stream(source):
+    region = source_region(source)
+
+    def on_segment(segment):
+        # Dipanggil dari thread perekam, di luar request
+        with app.app_context():
+            save_stream_segment(segment)
+
+    return CameraStream(
+        source.id, source.url, stream_name(source), app.config['UPLOAD_FOLDER'],
+        open_video_writer, on_segment,
+        pre_roll=app.config['STREAM_PRE_ROLL_SECONDS'],
+        post_roll=app.config['STREAM_POST_ROLL_SECONDS'],
+        max_segment=app.config['STREAM_MAX_SEGMENT_SECONDS'],
+        loop=bool(source.loop),
+        reconnect_delay=app.config['STREAM_RECONNECT_SECONDS'],
+        preprocess=create_preprocessor(region) if source_preprocess(source) else None,
+        region=region
+    )
+
+def sync_stream_sources(monitor):
+    """Samakan kamera yang dipantau dengan tabel stream_source lalu simpan status tiap kamera"""
+    sources = StreamSource.query.all()
+    enabled = {source.id: source for source in sources if source.enabled}
+
+    for source_id, stream in list(monitor.streams.items()):
+        source = enabled.get(source_id)
+        settings = None
+        if source:
+            region = source_region(source)
+            settings = (source.url, bool(source.loop), stream_name(source), source_preprocess(source),
+                        region.settings() if region else None)
+        current = (stream.url, stream.loop, stream.name, stream.preprocess is not None,
+                   stream.region.settings() if stream.region else None)
+        if settings != current:
+            monitor.remove(source_id)
+            logger.info("Stopped monitoring stream %s", source_id)
+
+    for source in sources:
+        stream = monitor.streams.get(source.id)
+        if stream is None and source.enabled:
+            stream = monitor.add(create_camera_stream(source))
+            logger.info("Monitoring stream %s: %s", source.id, source.name)
+        if stream is None:
+            source.status = 'stopped'
+            continue
+        source.status = stream.status
+        source.error = stream.error
+        source.stats = stream.stats()
+        if stream.last_frame_at:
+            source.last_frame_at = datetime.utcfromtimestamp(stream.last_frame_at)
+    db.session.commit()
+
+@app.cli.command('streams')
+def streams_command():
+    """Pantau kamera live dari tabel stream_source dan rekam segmen kekerasan."""
+    monitor = StreamMonitor(detect_violence_batch,
+                            inference_fps=app.config['STREAM_INFERENCE_FPS'],
+                            max_batch=max(1, app.config['INFERENCE_BATCH_SIZE']))
+    stop = threading.Event()
+    inference = threading.Thread(target=monitor.run, args=(stop,), name='stream-inference', daemon=True)
+    inference.start()
+    preload()
+    logger.info("Stream monitor %s ready", os.getpid())
+
+    try:
+        while True:
+            with app.app_context():
+                sync_stream_sources(monitor)
+            metrics.flush(app.config['METRICS_DIR'])
+            time.sleep(app.config['STREAM_SYNC_INTERVAL'])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        inference.join()
+        monitor.stop()
+        with app.app_context():
+            StreamSource.query.filter_by(enabled=True).update({'status': 'stopped'}, synchronize_session=False)
+            db.session.commit()
+
+@app.cli.command('models')
+@click.option('--address', default=None, help='Alamat server (default MODEL_SERVER atau <tmp>/sintesa-models.sock).')
+def models_command(address):
+    """Jalankan server inferensi bersama untuk proses web, worker dan monitor kamera."""
+    address = address or app.config['MODEL_SERVER'] or os.path.join(tempfile.gettempdir(), 'sintesa-models.sock')
+    if not app.config['MODEL_SERVER_AUTHKEY']:
+        # Tanpa kunci siapa pun yang bisa menjangkau socket/port bisa menjalankan kode lewat pickle
+        raise click.ClickException('MODEL_SERVER_AUTHKEY must be set to start the inference server')
+    registry = create_model_registry(local=True)
+    if app.config['MODEL_WARMUP']:
+        warm_up_model(registry)
+    logger.info("Model server %s ready (device: %s, models: %s)", os.getpid(), inference_device(),
+                ', '.join(registry.versions))
+    try:
+        InferenceServer(registry, parse_address(address), authkey=app.config['MODEL_SERVER_AUTHKEY']).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
 # Route untuk melayani file statis dari uploads
 @app.route('/static/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, mimetype='video/mp4')
+    # Respons kondisional: Range (206) untuk seek video, ETag/Last-Modified untuk 304.
+    # Mimetype ditebak dari ekstensi (mp4, jpg, ...)
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, conditional=True,
+                               max_age=app.config['MEDIA_MAX_AGE'] or None)
+
+@app.after_request
+def flush_metrics(response):
+    # Snapshot proses web ini untuk /metrics di proses lain (dibatasi agar tidak menulis tiap request)
+    try:
+        metrics.flush(app.config['METRICS_DIR'], min_interval=5.0)
+    except OSError as e:
+        logger.warning("Could not write metrics snapshot: %s", e)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    snapshots = load_snapshots(app.config['METRICS_DIR'], live=metrics)
+    return Response(render_prometheus(snapshots), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def encode_history_cursor(detection):
+    value = f"{detection.processed_at.isoformat()}|{detection.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    processed_at, detection_id = value.split('|')
+    return datetime.fromisoformat(processed_at), int(detection_id)
+
+def query_history(room=None, date_from=None, date_to=None, verdict=None, cursor=None, limit=50):
+    """
+    Satu halaman riwayat, terbaru lebih dulu. Pagination memakai keyset (processed_at, id)
+    dari baris terakhir halaman sebelumnya, sehingga biaya query tidak bertambah di
+    halaman-halaman akhir. date_from/date_to (date) memfilter recorded_at, inklusif.
+    Mengembalikan (detections, next_cursor); next_cursor None jika sudah halaman terakhir.
+    """
+    query = DetectionHistory.query.options(db.selectinload(DetectionHistory.events))
+    if room:
+        query = query.filter(DetectionHistory.room == room)
+    if date_from:
+        query = query.filter(DetectionHistory.recorded_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(DetectionHistory.recorded_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if verdict in ('violence', 'safe'):
+        query = query.filter(DetectionHistory.violence_detected.is_(verdict == 'violence'))
+    if cursor:
+        processed_at, detection_id = decode_history_cursor(cursor)
+        query = query.filter(db.or_(
+            DetectionHistory.processed_at < processed_at,
+            db.and_(DetectionHistory.processed_at == processed_at, DetectionHistory.id < detection_id)
+        ))
+
+    detections = query.order_by(DetectionHistory.processed_at.desc(), DetectionHistory.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_history_cursor(detections[limit - 1]) if len(detections) > limit else None
+    return detections[:limit], next_cursor
+
+def model_usage():
+    """Jumlah video dan video dengan kekerasan per versi model, untuk membandingkan versi (A/B)"""
+    rows = db.session.query(
+        DetectionHistory.model_version,
+        db.func.count(DetectionHistory.id),
+        db.func.sum(db.case((DetectionHistory.violence_detected.is_(True), 1), else_=0))
+    ).filter(DetectionHistory.model_version.isnot(None)).group_by(DetectionHistory.model_version)
+    return {version: {'detections': count, 'violence_detected': int(violent or 0)} for version, count, violent in rows}
+
+@app.route('/models')
+def models():
+    usage = model_usage()
+    versions = model_registry.describe()
+    for info in versions:
+        info['usage'] = {version: counts for version, counts in usage.items() if version.startswith(f"{info['name']}:")}
+    return jsonify(versions)
+
+@app.route('/models/<name>/reload', methods=['POST'])
+def reload_model(name):
+    # Tanpa MODEL_SERVER hanya registry proses web ini yang diperiksa ulang; proses lain mengikuti MODEL_RELOAD_SECONDS
+    if name not in {info['name'] for info in model_registry.describe()}:
+        return jsonify({'error': 'Unknown model'}), 404
+    return jsonify({'name': name, 'version': model_registry.reload(name)})
 
 @app.route('/history')
 def history():
-    detections = DetectionHistory.query.order_by(DetectionHistory.processed_at.desc()).all()
-    return render_template('history.html', detections=detections)
+    filters = {
+        'room': request.args.get('room') or None,
+        'date_from': request.args.get('date_from') or None,
+        'date_to': request.args.get('date_to') or None,
+        'verdict': request.args.get('verdict') or None,
+    }
+    try:
+        date_from = datetime.strptime(filters['date_from'], '%Y-%m-%d').date() if filters['date_from'] else None
+        date_to = datetime.strptime(filters['date_to'], '%Y-%m-%d').date() if filters['date_to'] else None
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        detections, next_cursor = query_history(filters['room'], date_from, date_to, filters['verdict'],
+                                                cursor=request.args.get('cursor'), limit=limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter or cursor'}), 400
+
+    next_url = None
+    if next_cursor:
+        args = {k: v for k, v in filters.items() if v}
+        next_url = url_for('history', cursor=next_cursor, limit=limit, **args)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'detections': [detection.to_dict() for detection in detections],
+            'next_cursor': next_cursor,
+            'next_url': next_url,
+        })
+
+    rooms = [room for (room,) in db.session.query(DetectionHistory.room).filter(
+        DetectionHistory.room.isnot(None)).distinct().order_by(DetectionHistory.room)]
+    return render_template('history.html', detections=detections, next_url=next_url,
+                           filters=filters, rooms=rooms)
 
 @app.route('/view/<int:detection_id>')
 def view_detection(detection_id):
     detection = DetectionHistory.query.get_or_404(detection_id)
     return render_template('view_detection.html', detection=detection)
 
+@app.route('/view/<int:detection_id>/render', methods=['POST'])
+def render_detection_video(detection_id):
+    """Render video hasil deteksi mode detect dari kotak tersimpan (tanpa inferensi ulang)"""
+    detection = DetectionHistory.query.get_or_404(detection_id)
+    if detection.archived_at is not None or not detection.detections_path:
+        return jsonify({'error': 'Detection has no stored detections to render'}), 409
+    if detection.result_video_path is not None:
+        return jsonify({'error': 'Result video already exists'}), 409
+
+    if app.config['JOBS_INLINE']:
+        try:
+            render_detection(detection)
+        except VideoProcessingError as e:
+            return jsonify({'error': str(e)}), 500
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(detection.to_dict()), 200
+        return redirect(url_for('view_detection', detection_id=detection.id))
+
+    job = enqueue_render_job(detection)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job.to_dict()), 202
+    return render_template('index.html', job_id=job.id)
+
+@app.route('/view/<int:detection_id>/detections')
+def detection_boxes(detection_id):
+    """Kotak deteksi per frame yang tersimpan (lihat DetectionRecorder)"""
+    detection = DetectionHistory.query.get_or_404(detection_id)
+    if detection.archived_at is not None or not detection.detections_path or not os.path.exists(detection.detections_path):
+        return jsonify({'error': 'No stored detections'}), 404
+    return jsonify(StoredDetections.load(detection.detections_path).to_dict())
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = DetectionJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    job = DetectionJob.query.get_or_404(job_id)
+    data = {'job_id': job.id, 'status': job.status, 'progress': job.progress or 0.0}
+    if job.status == JOB_COMPLETED and job.detection_id:
+        data['view_url'] = f'/view/{job.detection_id}'
+    if job.status == JOB_FAILED:
+        data['error'] = job.error
+    return jsonify(data)
+
+@app.route('/streams', methods=['GET', 'POST'])
+def streams():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not data.get('url'):
+            return jsonify({'error': 'url is required'}), 400
+        try:
+            parse_roi(data.get('roi'))
+        except ValueError as e:
+            return jsonify({'error': f'invalid roi: {e}'}), 400
+
+        source = StreamSource(
+            name=data.get('name') or data.get('room') or 'camera',
+            url=data['url'],
+            room=data.get('room'),
+            loop=bool(data.get('loop', False)),
+            preprocess=data.get('preprocess'),
+            roi=data.get('roi'),
+            tiled=data.get('tiled'),
+            enabled=True,
+            status='pending'
+        )
+        db.session.add(source)
+        db.session.commit()
+        return jsonify(source.to_dict()), 201
+
+    sources = StreamSource.query.order_by(StreamSource.id).all()
+    return jsonify([source.to_dict() for source in sources])
+
+@app.route('/streams/<int:source_id>', methods=['GET', 'DELETE'])
+def stream_detail(source_id):
+    source = StreamSource.query.get_or_404(source_id)
+    if request.method == 'DELETE':
+        # Hanya dinonaktifkan agar segmen yang sudah terekam tetap terhubung ke kameranya
+        source.enabled = False
+        db.session.commit()
+    return jsonify(source.to_dict())
+
+def upload_response(upload, status=200):
+    response = jsonify(upload.to_dict())
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(upload.offset)
+    response.headers['Upload-Length'] = str(upload.size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Mulai upload bertahap: {filename, size, sha256 (opsional), mode (opsional: full/detect)}"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    mode = data.get('mode') or app.config['ANALYSIS_MODE']
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    if mode not in ANALYSIS_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(ANALYSIS_MODES)}"}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size is required'}), 400
+    if size > app.config['UPLOAD_MAX_BYTES']:
+        return jsonify({'error': 'File too large'}), 413
+
+    # Path baru yang tidak dipakai upload aktif, job maupun deteksi lain (lihat claim_upload_path)
+    try:
+        filename, filepath = claim_upload_path(filename)
+    except VideoProcessingError as e:
+        return jsonify({'error': str(e)}), 409
+    upload = UploadSession(filename=filename, filepath=filepath, size=size, checksum=data.get('sha256'), mode=mode)
+    db.session.add(upload)
+    db.session.commit()
+
+    response = upload_response(upload, 201)
+    response.headers['Location'] = f'/uploads/{upload.id}'
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def upload_status(upload_id):
+    upload = UploadSession.query.get_or_404(upload_id)
+    return upload_response(upload)
+
+@app.route('/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def upload_chunk(upload_id):
+    """
+    Tulis satu chunk mulai dari header Upload-Offset langsung dari request stream ke disk.
+    Offset yang tidak sama dengan posisi server dijawab 409 beserta offset yang benar,
+    sehingga klien bisa melanjutkan setelah koneksi putus.
+    """
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.status != UPLOAD_ACTIVE:
+        return upload_response(upload, 409)
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    if offset != upload.offset:
+        return upload_response(upload, 409)
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Chunk too large'}), 413
+
+    remaining = upload.size - offset
+    written = 0
+    too_large = False
+    try:
+        with open(upload.filepath, 'r+b') as f:
+            f.seek(offset)
+            while True:
+                chunk = request.stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                if written + len(chunk) > remaining:
+                    too_large = True
+                    break
+                f.write(chunk)
+                written += len(chunk)
+            f.truncate(offset + written)
+    except Exception as e:
+        # Koneksi putus di tengah chunk: byte yang sudah tertulis tetap disimpan
+        logger.warning("Upload %s interrupted at byte %d: %s", upload.id, offset + written, e)
+
+    if too_large:
+        with open(upload.filepath, 'r+b') as f:
+            f.truncate(offset)
+        return jsonify({'error': 'Chunk exceeds declared upload size'}), 413
+
+    # UPDATE bersyarat: chunk paralel untuk offset yang sama hanya diterima sekali
+    updated = UploadSession.query.filter_by(id=upload.id, offset=offset).update(
+        {'offset': offset + written, 'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    db.session.refresh(upload)
+    if not updated:
+        return upload_response(upload, 409)
+
+    if upload.offset >= upload.size:
+        finalize_upload(upload)
+    else:
+        start_progressive_job(upload)
+    return upload_response(upload)
+
 # Route untuk halaman utama dan deteksi video
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    clean_uploads()
-
     if request.method == 'POST':
         if 'file' not in request.files:
             return render_template('index.html', error='No file uploaded')
@@ -230,182 +2413,79 @@ def index():
 
         if file.filename == '':
             return render_template('index.html', error='No file selected')
+        # Mode analisis per request (form atau query string), default ANALYSIS_MODE
+        mode = request.values.get('mode') or app.config['ANALYSIS_MODE']
+        if mode not in ANALYSIS_MODES:
+            return render_template('index.html', error='Invalid analysis mode'), 400
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
+            try:
+                filename, filepath = claim_upload_path(secure_filename(file.filename))
+            except VideoProcessingError as e:
+                return render_template('index.html', error=str(e))
             metadata = parse_filename_metadata(filename)
+            content_hash = save_upload(file, filepath)
 
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # Video yang sama dengan model & setting yang sama sudah pernah diproses
+            cached = find_cached_detection(compute_cache_key(content_hash, metadata['room'] if metadata else None,
+                                                            mode=mode))
+            if cached:
+                if os.path.abspath(cached.original_video_path) != os.path.abspath(filepath):
+                    os.remove(filepath)
+                logger.info("Cache hit for %s: detection %s", filename, cached.id)
+                metrics.inc('sintesa_videos_total', status='cached')
 
-            # Proses video
-            cap = cv2.VideoCapture(filepath)
-            if not cap.isOpened():
-                os.remove(filepath)
-                return render_template('index.html', error='Error opening video')
+                if mode == MODE_FULL and cached.result_video_path is None and not app.config['JOBS_INLINE']:
+                    # Deteksi sudah ada tanpa video hasil: cukup render dari kotak tersimpan
+                    job = enqueue_render_job(cached)
+                    if request.accept_mimetypes.best == 'application/json':
+                        return jsonify(job.to_dict()), 202
+                    return render_template('index.html', job_id=job.id, metadata=metadata)
+                if mode == MODE_FULL and cached.result_video_path is None:
+                    try:
+                        render_detection(cached)
+                    except VideoProcessingError as e:
+                        return render_template('index.html', error=str(e))
+                if request.accept_mimetypes.best == 'application/json':
+                    job = record_cached_job(cached, filepath, filename, content_hash)
+                    return jsonify(job.to_dict()), 200
+                return render_template('index.html',
+                                    original_video=media_url(cached.original_video_path),
+                                    result_video=media_url(cached.result_video_path),
+                                    view_url=f'/view/{cached.id}',
+                                    metadata=metadata, violence_detected=cached.violence_detected, cached=True)
 
-            # Dapatkan resolusi dan frame rate
-            width = int(cap.get(3))  # Lebar
-            height = int(cap.get(4))  # Tinggi
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # Default 30 FPS jika tidak terdeteksi
+            store_content(filepath, content_hash)
+            if app.config['JOBS_INLINE']:
+                # Mode sinkron (debug/testing): proses langsung di dalam request
+                try:
+                    detection = process_video(filepath, filename, content_hash=content_hash, mode=mode)
+                except VideoProcessingError as e:
+                    metrics.inc('sintesa_videos_total', status='failed')
+                    return render_template('index.html', error=str(e))
 
-            output_filename = f"result_{filename}"
-            output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-            temp_output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{output_filename}")
+                result_video = f'/static/uploads/result_{filename}?t={int(time.time())}' if mode == MODE_FULL else None
+                return render_template('index.html',
+                                    original_video=f'/static/uploads/{filename}',
+                                    result_video=result_video, view_url=f'/view/{detection.id}',
+                                    violence_detected=detection.violence_detected, metadata=metadata)
 
-            # Gunakan codec sementara untuk OpenCV
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(temp_output_path, fourcc, fps, (width, height))
+            # Masukkan ke antrian, worker di latar belakang yang akan memproses
+            job = enqueue_detection_job(filepath, filename, content_hash, mode)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job.to_dict()), 202
+            return render_template('index.html', job_id=job.id, metadata=metadata)
 
-            if not out.isOpened():
-                cap.release()
-                os.remove(filepath)
-                return render_template('index.html', error='Failed to initialize video writer')
-
-            frame_count = 0
-            violence_detected = False  # Flag untuk mendeteksi kekerasan
-            violence_frames = []  # Store frames with violence detection
-            violence_confidence_scores = []  # Store confidence scores
-            consecutive_violence_frames = 0  # Track consecutive violence detections
-            total_frames_processed = 0
-            
-            print(f"Starting video processing...")
-            print(f"Video dimensions: {width}x{height}")
-            print(f"Video FPS: {fps}")
-            print(f"Model classes available: {model.names}")
-            print(f"Looking for class index 1 (should be violence)")
-            
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                frame_count += 1
-                # Proses setiap frame ke-2 untuk debugging (lebih sering)
-                if frame_count % 2 != 0:
-                    out.write(frame)
-                    continue
-                
-                total_frames_processed += 1
-                
-                # Sementara tidak menggunakan preprocessing untuk debug
-                # processed_frame = preprocess_frame(frame)
-                
-                # Gunakan confidence threshold yang sangat rendah untuk testing
-                results = model(frame, classes=[1], device=device, conf=0.25, iou=0.5)
-                
-                print(f"Frame {frame_count}: Processing results...")
-                
-                # Simplify detection logic untuk debugging
-                if results and len(results) > 0 and len(results[0].boxes) > 0:
-                    boxes = results[0].boxes
-                    confidences = boxes.conf.cpu().numpy()
-                    
-                    print(f"Frame {frame_count}: Found {len(confidences)} detections")
-                    print(f"Frame {frame_count}: Confidences: {confidences}")
-                    
-                    # Accept any detection above 0.25
-                    for conf in confidences:
-                        if conf >= 0.25:
-                            violence_detected = True
-                            violence_frames.append(frame_count)
-                            violence_confidence_scores.append(conf)
-                            annotated_frame = results[0].plot()
-                            out.write(annotated_frame)
-                            print(f"Frame {frame_count}: VIOLENCE DETECTED with confidence {conf:.3f}")
-                            break
-                    else:
-                        out.write(frame)
-                        print(f"Frame {frame_count}: No qualifying detections")
-                else:
-                    out.write(frame)
-                    print(f"Frame {frame_count}: No detections found")
+    return render_template('index.html')
 
-            cap.release()
-            out.release()
+startup.mark('routes')
 
-            # Simplified post-processing untuk debugging
-            print(f"\nFinal violence detection stats:")
-            print(f"- Violence detected flag: {violence_detected}")
-            print(f"- Frames with violence: {len(violence_frames)}")
-            print(f"- Total frames processed: {total_frames_processed}")
-            
-            if len(violence_frames) > 0:
-                violence_frame_ratio = len(violence_frames) / max(total_frames_processed, 1)
-                avg_confidence = sum(violence_confidence_scores) / len(violence_confidence_scores)
-                print(f"- Violence ratio: {violence_frame_ratio:.3f}")
-                print(f"- Average confidence: {avg_confidence:.3f}")
-                
-                # Much more permissive validation
-                if len(violence_frames) >= 1:  # Just need 1 frame
-                    print("Violence detection ACCEPTED")
-                    violence_detected = True
-                else:
-                    print("Violence detection REJECTED: no frames")
-                    violence_detected = False
-            else:
-                print("Violence detection REJECTED: no violence frames detected")
-                violence_detected = False
-
-
-            # Kirim notifikasi ke Telegram jika kekerasan terdeteksi
-            if violence_detected:
-                
-                screenshot_filename = f"violence_frame_{os.path.splitext(filename)[0]}.jpg"
-                screenshot_path = os.path.join(app.config['UPLOAD_FOLDER'], screenshot_filename)
-                cv2.imwrite(screenshot_path, annotated_frame)
-                photo_path = screenshot_path
-
-                # Extract metadata from filename if available
-                metadata_str = ""
-                metadata = parse_filename_metadata(filename)
-                if metadata:
-                    metadata_str = f"\nRuangan: {metadata['room']}\nTanggal: {metadata['date']}\nWaktu: {metadata['time']}"
-                
-                message = f"⚠️ Tindak kekerasan terjadi pada video: {filename}{metadata_str}\nDiproses pada: {time.strftime('%Y-%m-%d %H:%M:%S')}"
-                notification_sent = send_telegram_notification_sync(message)
-                photo_caption = "Cuplikan tindak kekerasan pada video"
-                if metadata:
-                    photo_caption += f" - Ruangan: {metadata['room']}"
-                photo_sent = send_telegram_photo(photo_path, photo_caption)
-                if not notification_sent:
-                    print("Warning: Could not send Telegram notification")
-
-            # Konversi video untuk kompatibilitas browser
-            if os.path.exists(temp_output_path) and os.path.getsize(temp_output_path) > 0:
-                if convert_video_for_browser(temp_output_path, output_path):
-                    os.remove(temp_output_path)  # Hapus file sementara
-
-                     # Save detection to database
-                    screenshot_path = None
-                    if violence_detected:
-                        screenshot_filename = f"violence_frame_{os.path.splitext(filename)[0]}.jpg"
-                        screenshot_path = os.path.join(app.config['UPLOAD_FOLDER'], screenshot_filename)
-                    
-                    detection = DetectionHistory(
-                        filename=filename,
-                        room=metadata['room'] if metadata else None,
-                        detection_date=metadata['date'] if metadata else None,
-                        detection_time=metadata['time'] if metadata else None,
-                        violence_detected=violence_detected,
-                        original_video_path=filepath,
-                        result_video_path=output_path,
-                        screenshot_path=screenshot_path
-                    )
-                    
-                    db.session.add(detection)
-                    db.session.commit()
-
-                    return render_template('index.html',
-                                        original_video=f'/static/uploads/{filename}',
-                                        result_video=f'/static/uploads/{output_filename}?t={int(time.time())}', metadata=metadata)
-                else:
-                    os.remove(temp_output_path)
-                    os.remove(filepath)
-                    return render_template('index.html', error='Failed to convert video for browser')
-            else:
-                os.remove(filepath)
-                return render_template('index.html', error='Failed to generate detected video')
-
-    return render_template('index.html')
+@app.cli.command('startup')
+@click.option('--preload/--no-preload', 'load', default=True, help='Ikut ukur pemuatan model (dan warm-up jika MODEL_WARMUP).')
+def startup_command(load):
+    """Tampilkan rincian waktu start-up proses ini per tahap."""
+    if load:
+        preload()
+    click.echo(startup.report())
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+Benchmark throughput pipeline deteksi dengan video sintetis.
+
+Contoh:
+    python benchmark.py --resolutions 640x360,1280x720 --frames 90 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.15
+
+Video dibuat lokal dengan OpenCV lalu dijalankan melalui tahap-tahap yang sama dengan
+aplikasi (decode biasa, dengan grab() untuk frame yang tidak disampel dan diperkecil ffmpeg, preprocessing, inferensi biasa dan per tile, plot, encode, convert_video_for_browser
+dan pipeline lengkap). Tanpa --weights dipakai model YOLOv8n dengan bobot acak, cukup
+untuk mengukur performa di mesin CPU tanpa bobot asli.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from pipeline import run_detection_pipeline
+from preprocessing import FramePreprocessor, preprocess_frame, restore_original
+from tiling import InferenceRegion
+from sampling import FixedStrideSampler
+from video_io import FFmpegVideoReader, FFmpegVideoWriter, FrameRangeCapture, convert_video_for_browser, iter_frames
+
+DETECTION_CLASSES = [1]
+
+
+def make_synthetic_video(path, width, height, frames, fps=30.0):
+    """Video sintetis: latar statis bertekstur dengan beberapa kotak yang bergerak"""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (21, 21), 0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    box = max(8, min(width, height) // 6)
+    for i in range(frames):
+        frame = background.copy()
+        for k in range(3):
+            x = int((i * (4 + k * 3)) % max(1, width - box))
+            y = int((height - box) * (0.2 + 0.3 * k))
+            cv2.rectangle(frame, (x, y), (x + box, y + box), (40 + 80 * k, 200, 255 - 60 * k), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q) * 1000), 3) if samples else None
+
+def summarize(samples, frames, total=None):
+    """Ringkas latensi per frame (detik) menjadi fps, p50 dan p95 (ms)"""
+    total = sum(samples) if total is None else total
+    return {
+        'frames': frames,
+        'total_s': round(total, 4),
+        'fps': round(frames / total, 2) if total > 0 else None,
+        'p50_ms': percentile_ms(samples, 50),
+        'p95_ms': percentile_ms(samples, 95),
+    }
+
+def peak_rss_mb():
+    # ru_maxrss dalam KB di Linux dan byte di macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+def load_model(weights=None, backend='torch', imgsz=640, workdir=None):
+    from ultralytics import YOLO
+
+    if weights is None:
+        # Model kecil dengan bobot acak; disimpan ke .pt agar bisa diexport untuk backend lain
+        model = YOLO('yolov8n.yaml')
+        if backend == 'torch':
+            return model
+        weights = os.path.join(workdir, 'yolov8n-random.pt')
+        model.save(weights)
+
+    if backend == 'torch':
+        return YOLO(weights)
+
+    from inference import load_exported_model
+    return load_exported_model(weights, backend, cache_dir=os.path.join(workdir, 'model_cache'), imgsz=imgsz)
+
+def run_infer(model, frames, conf, iou):
+    return model(frames, classes=DETECTION_CLASSES, conf=conf, iou=iou, verbose=False)
+
+def benchmark_video(path, model, batch_size, workdir, conf=0.25, iou=0.5, include_transcode=True,
+                    imgsz=640, preprocess=False):
+    stages = {}
+
+    # Decode
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames, samples = [], []
+    while True:
+        start = time.perf_counter()
+        ret, frame = cap.read()
+        elapsed = time.perf_counter() - start
+        if not ret:
+            break
+        frames.append(frame)
+        samples.append(elapsed)
+    cap.release()
+    stages['decode'] = summarize(samples, len(frames))
+    height, width = frames[0].shape[:2]
+
+    # Decode untuk analisis tanpa video hasil: frame di luar stride 2 hanya di-grab(), lalu
+    # sama tetapi didecode ffmpeg pada lebar input model; fps dihitung atas semua frame video
+    sampler = FixedStrideSampler(2)
+    for stage, capture in (('decode_sampled', FrameRangeCapture(path)),
+                           ('decode_scaled', FFmpegVideoReader(path, max_width=imgsz))):
+        samples = []
+        frame_iter = iter_frames(capture, next_decode=sampler.next_frame)
+        while True:
+            start = time.perf_counter()
+            item = next(frame_iter, None)
+            if item is None:
+                break
+            samples.append(time.perf_counter() - start)
+        capture.release()
+        stages[stage] = summarize(samples, len(samples))
+
+    # Preprocessing: resolusi penuh dengan noise reduction (preprocess_frame), resolusi penuh
+    # tanpa noise reduction, dan pada resolusi inferensi (PREPROCESS_TARGET_SIZE)
+    preprocessors = {
+        'preprocess_denoise': preprocess_frame,
+        'preprocess': FramePreprocessor(),
+        'preprocess_imgsz': FramePreprocessor(target_size=imgsz),
+    }
+    for stage, preprocessor in preprocessors.items():
+        samples = []
+        for frame in frames:
+            start = time.perf_counter()
+            preprocessor(frame)
+            samples.append(time.perf_counter() - start)
+        stages[stage] = summarize(samples, len(frames))
+
+    # Inferensi per batch, latensi dibagi rata ke setiap frame dalam batch
+    run_infer(model, frames[:batch_size], conf, iou)  # warm-up
+    samples, results = [], []
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        start = time.perf_counter()
+        results.extend(run_infer(model, batch, conf, iou))
+        samples.extend([(time.perf_counter() - start) / len(batch)] * len(batch))
+    stages['inference'] = summarize(samples, len(frames))
+
+    # Inferensi per tile (TILE_SIZE = imgsz): biaya tambahan akurasi untuk kamera resolusi tinggi
+    region = InferenceRegion(tile_size=imgsz)
+    samples = []
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        start = time.perf_counter()
+        parts = [region.split(frame) for frame in batch]
+        tiled = run_infer(model, [part for frame_parts in parts for part in frame_parts], conf, iou)
+        for frame, frame_parts in zip(batch, parts):
+            region.merge(tiled[:len(frame_parts)], frame)
+            tiled = tiled[len(frame_parts):]
+        samples.extend([(time.perf_counter() - start) / len(batch)] * len(batch))
+    stages['inference_tiled'] = summarize(samples, len(frames))
+    stages['inference_tiled']['tiles_per_frame'] = len(region.windows(width, height))
+
+    # Anotasi
+    samples, annotated = [], []
+    for result in results:
+        start = time.perf_counter()
+        annotated.append(result.plot())
+        samples.append(time.perf_counter() - start)
+    stages['plot'] = summarize(samples, len(frames))
+
+    # Encode H.264 satu tahap (termasuk waktu menunggu ffmpeg selesai)
+    encoded_path = os.path.join(workdir, 'encoded.mp4')
+    writer = FFmpegVideoWriter(encoded_path, fps, (width, height))
+    samples = []
+    total_start = time.perf_counter()
+    for frame in annotated:
+        start = time.perf_counter()
+        writer.write(frame)
+        samples.append(time.perf_counter() - start)
+    writer.release()
+    stages['encode'] = summarize(samples, len(frames), total=time.perf_counter() - total_start)
+
+    # Transcode MoviePy (jalur lama), hanya total per video
+    if include_transcode:
+        start = time.perf_counter()
+        convert_video_for_browser(path, os.path.join(workdir, 'transcoded.mp4'))
+        stages['transcode'] = summarize([], len(frames), total=time.perf_counter() - start)
+
+    # Pipeline lengkap: decode -> inferensi -> anotasi/encode secara bersamaan
+    cap = cv2.VideoCapture(path)
+    writer = FFmpegVideoWriter(os.path.join(workdir, 'pipeline.mp4'), fps, (width, height))
+
+    def handle_frame(frame_index, frame, sampled, result, detection_conf):
+        writer.write(result.plot() if sampled else frame)
+
+    def infer_batch(batch, originals=None):
+        if not batch:
+            return []
+        results = run_infer(model, batch, conf, iou)
+        if originals is not None:
+            results = [restore_original(result, original) for result, original in zip(results, originals)]
+        return [(result, None) for result in results]
+
+    start = time.perf_counter()
+    run_detection_pipeline(cap, FixedStrideSampler(2), infer_batch, handle_frame, batch_size=batch_size,
+                           preprocess=FramePreprocessor(target_size=imgsz) if preprocess else None)
+    writer.release()
+    cap.release()
+    stages['pipeline'] = summarize([], len(frames), total=time.perf_counter() - start)
+
+    return {'width': width, 'height': height, 'frames': len(frames), 'stages': stages}
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Kembalikan daftar regresi: stage dengan fps turun lebih dari tolerance dibanding baseline"""
+    regressions = []
+    baseline_runs = {run['video']: run for run in baseline.get('runs', [])}
+    for run in report['runs']:
+        base_run = baseline_runs.get(run['video'])
+        if base_run is None:
+            continue
+        for stage, stats in run['stages'].items():
+            base_fps = base_run['stages'].get(stage, {}).get('fps')
+            if not base_fps or stats['fps'] is None:
+                continue
+            change = stats['fps'] / base_fps - 1
+            if change < -tolerance:
+                regressions.append({
+                    'video': run['video'], 'stage': stage,
+                    'baseline_fps': base_fps, 'fps': stats['fps'], 'change': round(change, 3),
+                })
+    return regressions
+
+def parse_resolutions(value):
+    return [tuple(int(x) for x in item.lower().split('x')) for item in value.split(',') if item]
+
+def run_benchmark(resolutions, lengths, batch_size=8, weights=None, backend='torch', imgsz=640,
+                  include_transcode=True, preprocess=False):
+    workdir = tempfile.mkdtemp(prefix='sintesa-bench-')
+    try:
+        model = load_model(weights, backend, imgsz, workdir)
+        runs = []
+        for width, height in resolutions:
+            for frames in lengths:
+                name = f"{width}x{height}_{frames}f"
+                print(f"Benchmarking {name}...")
+                path = make_synthetic_video(os.path.join(workdir, f"{name}.mp4"), width, height, frames)
+                run = benchmark_video(path, model, batch_size, workdir, include_transcode=include_transcode,
+                                      imgsz=imgsz, preprocess=preprocess)
+                run['video'] = name
+                runs.append(run)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': backend,
+            'weights': weights or 'yolov8n.yaml (random)',
+            'batch_size': batch_size,
+            'preprocess': preprocess,
+        },
+        'runs': runs,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark pipeline deteksi kekerasan dengan video sintetis')
+    parser.add_argument('--resolutions', default='640x360,1280x720', help='Daftar resolusi, mis. 640x360,1920x1080')
+    parser.add_argument('--frames', default='60', help='Daftar panjang video dalam frame, mis. 30,120')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--weights', default=None, help='Bobot .pt (default: YOLOv8n bobot acak)')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--skip-transcode', action='store_true', help='Lewati tahap MoviePy yang lambat')
+    parser.add_argument('--preprocess', action='store_true', help='Jalankan pipeline lengkap dengan preprocessing')
+    parser.add_argument('--output', default=None, help='Simpan hasil JSON ke file ini')
+    parser.add_argument('--baseline', default=None, help='JSON hasil sebelumnya untuk dibandingkan')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Penurunan fps maksimum sebelum dianggap regresi')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        parse_resolutions(args.resolutions),
+        [int(x) for x in args.frames.split(',') if x],
+        batch_size=args.batch_size,
+        weights=args.weights,
+        backend=args.backend,
+        imgsz=args.imgsz,
+        include_transcode=not args.skip_transcode,
+        preprocess=args.preprocess,
+    )
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['regressions'] = compare_with_baseline(report, baseline, args.tolerance)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['video']} {regression['stage']}: "
+                  f"{regression['baseline_fps']} -> {regression['fps']} fps ({regression['change']:+.1%})")
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+
+# Kolom kotak: x1, y1, x2, y2, confidence, kelas
+BOX_COLUMNS = 6
+
+
+def result_boxes(result):
+    """Kotak deteksi hasil Ultralytics sebagai array float32 (n, 6)"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, BOX_COLUMNS), dtype=np.float32)
+    data = boxes.data
+    data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+    return data[:, [0, 1, 2, 3, -2, -1]].astype(np.float32)
+
+
+class DetectionRecorder:
+    """
+    Kotak deteksi per frame selama analisis, cukup untuk me-render video hasil nanti tanpa
+    inferensi ulang (lihat StoredDetections). Hanya frame yang dianotasi (ada deteksi di atas
+    threshold) yang dicatat; confidence semua frame yang diinferensi ada di ConfidenceTrack.
+    """
+
+    def __init__(self, scale=1.0):
+        self.frames = []
+        self.boxes = []
+        self.names = None  # Nama kelas model, untuk label saat render
+        self.scale = scale  # Pengali koordinat frame yang diinferensi ke frame video asli
+
+    def append(self, frame_index, result):
+        boxes = result_boxes(result)
+        if self.scale != 1.0:
+            boxes[:, :4] *= self.scale
+        self.frames.append(frame_index)
+        self.boxes.append(boxes)
+        if self.names is None:
+            self.names = dict(result.names)
+
+    def extend(self, other):
+        """Gabungkan hasil shard berikutnya (urutan frame harus berurutan)"""
+        self.frames.extend(other.frames)
+        self.boxes.extend(other.boxes)
+        if self.names is None:
+            self.names = other.names
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, path, track, **metadata):
+        """
+        Simpan ke file .npz terkompresi dalam format kolom: frames (int32), offsets (int32,
+        baris kotak frame ke-i = boxes[offsets[i]:offsets[i + 1]]), boxes (float32 n x 6),
+        confidence semua frame yang diinferensi (track_frames, track_confidences) dan
+        metadata JSON (mis. fps, ukuran frame, versi model).
+        """
+        counts = [len(boxes) for boxes in self.boxes]
+        metadata = dict(metadata, names={str(k): v for k, v in (self.names or {}).items()})
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                frames=np.asarray(self.frames, dtype=np.int32),
+                offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int32),
+                boxes=np.concatenate(self.boxes) if self.boxes else np.zeros((0, BOX_COLUMNS), dtype=np.float32),
+                track_frames=np.asarray(track.frame_indices, dtype=np.int32),
+                track_confidences=np.asarray(track.confidences, dtype=np.float32),
+                metadata=np.array(json.dumps(metadata)),
+            )
+
+
+class StoredDetections:
+    """Isi file DetectionRecorder.save(); boxes(frame_index) mencari kotak satu frame dengan searchsorted"""
+
+    def __init__(self, frames, offsets, boxes, track_frames, track_confidences, metadata):
+        self.frames = frames
+        self.offsets = offsets
+        self._boxes = boxes
+        self.track_frames = track_frames
+        self.track_confidences = track_confidences
+        self.metadata = metadata
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            return cls(data['frames'], data['offsets'], data['boxes'], data['track_frames'],
+                       data['track_confidences'], metadata)
+
+    @property
+    def names(self):
+        return {int(k): v for k, v in self.metadata.get('names', {}).items()}
+
+    def boxes(self, frame_index):
+        """Kotak (n, 6) frame frame_index; array kosong jika frame tidak dianotasi"""
+        position = np.searchsorted(self.frames, frame_index)
+        if position == len(self.frames) or self.frames[position] != frame_index:
+            return self._boxes[:0]
+        return self._boxes[self.offsets[position]:self.offsets[position + 1]]
+
+    def annotate(self, frame, frame_index):
+        """Frame dengan kotak frame_index digambar seperti Results.plot() saat analisis; frame itu sendiri jika tidak ada"""
+        boxes = self.boxes(frame_index)
+        if not len(boxes):
+            return frame
+        # Diimport di sini: membaca hasil deteksi tidak perlu memuat torch
+        import torch
+        from ultralytics.engine.results import Results
+
+        return Results(frame, path='', names=self.names, boxes=torch.from_numpy(np.ascontiguousarray(boxes))).plot()
+
+    def to_dict(self):
+        fps = self.metadata.get('fps') or 30.0
+        return {
+            'metadata': self.metadata,
+            'frames': [{
+                'frame': int(frame),
+                'time': round((int(frame) - 1) / fps, 3),  # frame_index dimulai dari 1
+                'boxes': self._boxes[self.offsets[i]:self.offsets[i + 1]].round(3).tolist(),
+            } for i, frame in enumerate(self.frames)],
+        }
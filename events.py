@@ -0,0 +1,171 @@
+import numpy as np
+
+
+class ConfidenceTrack:
+    """
+    Confidence per frame yang diinferensi, disimpan di buffer NumPy yang tumbuh dua kali
+    lipat saat penuh. Frame tanpa deteksi dicatat dengan confidence 0.
+    """
+
+    def __init__(self, capacity=1024):
+        self._frames = np.empty(capacity, dtype=np.int64)
+        self._confidences = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def _reserve(self, size):
+        if size > len(self._frames):
+            capacity = max(size, len(self._frames) * 2)
+            self._frames = np.resize(self._frames, capacity)
+            self._confidences = np.resize(self._confidences, capacity)
+
+    def append(self, frame_index, confidence):
+        self._reserve(self.size + 1)
+        self._frames[self.size] = frame_index
+        self._confidences[self.size] = confidence or 0.0
+        self.size += 1
+
+    def extend(self, other):
+        end = self.size + other.size
+        self._reserve(end)
+        self._frames[self.size:end] = other.frame_indices
+        self._confidences[self.size:end] = other.confidences
+        self.size = end
+
+    @property
+    def frame_indices(self):
+        return self._frames[:self.size]
+
+    @property
+    def confidences(self):
+        return self._confidences[:self.size]
+
+
+class ViolenceInterval:
+    def __init__(self, start_frame, end_frame, fps, peak_frame, peak_confidence, mean_confidence):
+        self.start_frame = int(start_frame)
+        self.end_frame = int(end_frame)
+        self.start_time = (self.start_frame - 1) / fps  # frame_index dimulai dari 1
+        self.end_time = self.end_frame / fps
+        self.peak_frame = int(peak_frame)
+        self.peak_confidence = float(peak_confidence)
+        self.mean_confidence = float(mean_confidence)
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def __repr__(self):
+        return f'<ViolenceInterval {self.start_time:.2f}-{self.end_time:.2f}s peak={self.peak_confidence:.3f}>'
+
+
+def smooth(confidences, window):
+    """Rata-rata bergerak terpusat; sampel di luar video dianggap tanpa deteksi (0)"""
+    if window <= 1 or len(confidences) == 0:
+        return confidences.astype(np.float32, copy=True)
+    kernel = np.full(window, 1.0 / window, dtype=np.float32)
+    return np.convolve(confidences, kernel, mode='same')
+
+def hysteresis(values, enter_threshold, exit_threshold):
+    """
+    Status aktif per sampel: mulai aktif saat values >= enter_threshold dan tetap aktif
+    hingga values < exit_threshold. Dihitung tanpa loop Python dengan meneruskan indeks
+    keputusan terakhir (masuk/keluar) ke sampel-sampel di antaranya.
+    """
+    enter = values >= enter_threshold
+    leave = values < exit_threshold
+    decided = enter | leave
+    last_decision = np.where(decided, np.arange(len(values)), -1)
+    np.maximum.accumulate(last_decision, out=last_decision)
+    return np.where(last_decision >= 0, enter[np.maximum(last_decision, 0)], False)
+
+def segment_events(frame_indices, confidences, fps, enter_threshold=0.35, exit_threshold=0.2,
+                   smoothing_window=3, min_duration=0.5, merge_gap=2.0):
+    """
+    Ubah confidence per frame yang diinferensi menjadi interval kekerasan.
+
+    frame_indices/confidences adalah array sejajar (confidence 0 jika tidak ada deteksi).
+    Confidence dihaluskan dengan rata-rata bergerak smoothing_window sampel, lalu diberi
+    hysteresis (enter/exit threshold), sehingga deteksi satu frame yang terisolasi hilang.
+    Interval dimulai pada deteksi pertama dan berakhir tepat sebelum frame terinferensi
+    setelah deteksi terakhirnya (setiap sampel mewakili frame hingga sampel berikutnya).
+    Interval yang berjarak <= merge_gap detik digabung, lalu interval yang lebih pendek
+    dari min_duration detik dibuang. Peak/mean dihitung dari confidence asli di dalam
+    interval (hanya frame dengan deteksi).
+    """
+    frame_indices = np.asarray(frame_indices)
+    confidences = np.asarray(confidences, dtype=np.float32)
+    if len(confidences) == 0:
+        return []
+
+    active = hysteresis(smooth(confidences, smoothing_window), enter_threshold, exit_threshold)
+
+    # Awal dan akhir setiap run status aktif (indeks sampel)
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    if len(starts) == 0:
+        return []
+
+    # Batas interval mengikuti deteksi asli (smoothing hanya memutuskan ada/tidaknya kejadian)
+    detected = np.flatnonzero(confidences > 0)
+    first = np.searchsorted(detected, starts)
+    last = np.searchsorted(detected, ends, side='right') - 1
+    has_detection = first <= last
+    if not has_detection.any():
+        return []
+    starts = detected[first[has_detection]]
+    ends = detected[last[has_detection]]
+
+    # Frame terakhir yang diwakili setiap sampel
+    last_frames = np.append(frame_indices[1:] - 1, frame_indices[-1])
+
+    # Gabungkan interval yang jaraknya kecil
+    gaps = (frame_indices[starts[1:]] - last_frames[ends[:-1]]) / fps
+    keep = np.concatenate(([True], gaps > merge_gap))
+    merged_starts = starts[keep]
+    merged_ends = np.append(ends[np.flatnonzero(keep)[1:] - 1], ends[-1])
+
+    intervals = []
+    for start, end in zip(merged_starts, merged_ends):
+        window = confidences[start:end + 1]
+        peak = int(np.argmax(window))
+        interval = ViolenceInterval(
+            frame_indices[start], last_frames[end], fps,
+            peak_frame=frame_indices[start + peak],
+            peak_confidence=window[peak],
+            mean_confidence=window[window > 0].mean()
+        )
+        if interval.duration >= min_duration:
+            intervals.append(interval)
+    return intervals
+
+
+class PeakFrames:
+    """
+    Frame teranotasi dengan confidence tertinggi untuk setiap kelompok deteksi yang
+    berdekatan (jarak <= gap_frames), dikumpulkan selama video diproses sehingga setiap
+    kejadian punya screenshot sendiri tanpa menyimpan semua frame teranotasi.
+    """
+
+    def __init__(self, gap_frames):
+        self.gap_frames = gap_frames
+        self.clusters = []  # [frame pertama, frame terakhir, confidence, frame peak, gambar]
+
+    def offer(self, frame_index, confidence, image):
+        if not self.clusters or frame_index - self.clusters[-1][1] > self.gap_frames:
+            self.clusters.append([frame_index, frame_index, -1.0, None, None])
+        cluster = self.clusters[-1]
+        cluster[1] = frame_index
+        if confidence > cluster[2]:
+            cluster[2:] = [confidence, frame_index, image]
+
+    def extend(self, other):
+        # Kelompok di batas shard tidak perlu disatukan: best() memilih dari semua yang beririsan
+        self.clusters.extend(other.clusters)
+
+    def best(self, start_frame, end_frame):
+        """Gambar peak tertinggi dari kelompok yang beririsan dengan [start_frame, end_frame]"""
+        overlapping = [c for c in self.clusters if c[0] <= end_frame and c[1] >= start_frame]
+        if not overlapping:
+            return None
+        return max(overlapping, key=lambda c: c[2])[4]
@@ -0,0 +1,145 @@
+import time
+import logging
+import weakref
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+logger = logging.getLogger('sintesa')
+
+# Header: counter written (ditulis produsen) dan released (ditulis konsumen), satu cache line
+HEADER_BYTES = 64
+
+# Segmen yang dibuat proses ini (pendaftarannya di resource tracker milik pembuat)
+_created = set()
+
+
+class RingFull(RuntimeError):
+    """Semua slot masih dipakai konsumen sampai batas waktu habis"""
+
+
+def _attach(name):
+    # Proses yang hanya menempel tidak boleh ikut menghapus segmen saat keluar (resource
+    # tracker Python < 3.13 mendaftarkan setiap SharedMemory, bukan hanya pembuatnya)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FrameRing:
+    """
+    Ring buffer frame di multiprocessing.shared_memory untuk mengirim frame antar proses
+    tanpa pickle (frame 1080p = 6 MB per pickle, ditambah salinan di socket dan unpickle).
+
+    Segmen berisi header dua counter int64 (written, released) dan slots slot berukuran
+    slot_bytes yang dialokasikan sekali. Produsen menulis frame ke slot (put, atau decode
+    langsung ke view dari reserve), lalu mengirim deskriptor kecil (index, shape, dtype)
+    lewat koneksi biasa; konsumen membuka frame sebagai view NumPy tanpa salinan (view)
+    dan memajukan released setelah selesai (release), sehingga slot bisa dipakai ulang.
+    Slot dipakai berurutan: index ke-n berada di slot n % slots. Setiap counter hanya
+    ditulis satu pihak, jadi tidak perlu lock lintas proses; satu ring untuk satu
+    pasangan produsen/konsumen. Pembuat ring (create) menghapus segmen saat close().
+    """
+
+    def __init__(self, shm, slots, slot_bytes, owner=False):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = owner
+        # Segmen dilepas walaupun close() tidak dipanggil (mis. thread pemiliknya selesai)
+        self._finalizer = weakref.finalize(self, FrameRing._release_segment, shm, owner)
+
+    def _counters(self):
+        # View sementara: view yang disimpan akan menahan mmap sehingga segmen tidak bisa ditutup
+        return np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+
+    @classmethod
+    def create(cls, slots, slot_bytes):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + slots * slot_bytes)
+        _created.add(shm.name)
+        ring = cls(shm, slots, slot_bytes, owner=True)
+        ring._counters()[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(_attach(name), slots, slot_bytes)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def descriptor(self):
+        """(name, slots, slot_bytes) untuk attach() di proses lain"""
+        return self.name, self.slots, self.slot_bytes
+
+    @property
+    def written(self):
+        return int(self._counters()[0])
+
+    @property
+    def released(self):
+        return int(self._counters()[1])
+
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def _slot(self, index, shape, dtype):
+        offset = HEADER_BYTES + (index % self.slots) * self.slot_bytes
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def reserve(self, shape, dtype=np.uint8, timeout=5.0):
+        """
+        (index, view) slot berikutnya untuk ditulis langsung oleh produsen, mis.
+        capture.read(view). Menunggu hingga timeout detik jika ring penuh. Slot baru
+        terlihat oleh konsumen setelah commit().
+        """
+        dtype = np.dtype(dtype)
+        if int(np.prod(shape)) * dtype.itemsize > self.slot_bytes:
+            raise ValueError(f"Frame {shape} {dtype} does not fit in a {self.slot_bytes} byte slot")
+        index = self.written
+        deadline = time.monotonic() + timeout
+        while index - self.released >= self.slots:
+            if time.monotonic() >= deadline:
+                raise RingFull(f"No free slot in frame ring {self.name}")
+            time.sleep(0.0005)
+        return index, self._slot(index, shape, dtype)
+
+    def commit(self, index):
+        self._counters()[0] = index + 1
+
+    def put(self, frame, timeout=5.0):
+        """Salin frame ke slot berikutnya (satu memcpy); mengembalikan deskriptor untuk view()"""
+        index, view = self.reserve(frame.shape, frame.dtype, timeout)
+        view[...] = frame
+        self.commit(index)
+        return index, frame.shape, frame.dtype.str
+
+    def view(self, index, shape, dtype):
+        """Frame di slot index sebagai view NumPy (tanpa salinan); valid sampai release()"""
+        return self._slot(index, shape, np.dtype(dtype))
+
+    def release(self, index):
+        """Konsumen selesai dengan semua frame sampai index; slotnya boleh ditulis ulang"""
+        self._counters()[1] = max(self.released, index + 1)
+
+    def close(self):
+        self._finalizer()
+
+    @staticmethod
+    def _release_segment(shm, owner):
+        try:
+            shm.close()
+        except BufferError:
+            # Masih ada view yang hidup; mmap dilepas saat view terakhir dibuang
+            logger.warning("Frame ring %s closed with live views", shm.name)
+        if owner:
+            _created.discard(shm.name)
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
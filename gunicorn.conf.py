@@ -0,0 +1,35 @@
+# Konfigurasi gunicorn untuk proses web: gunicorn -c gunicorn.conf.py app:app
+#
+# Dengan preload_app, app.py diimport sekali di proses master lalu worker di-fork darinya.
+# on_starting memuat bobot model di master (tanpa inferensi), sehingga semua worker
+# memakai memori bobot yang sama secara copy-on-write. Warm-up dijalankan per worker
+# setelah fork karena thread pool torch tidak aman dibawa melewati fork.
+import gc
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+preload_model = os.getenv('WEB_PRELOAD_MODEL', '1') == '1'  # 0 = model dimuat saat inferensi pertama di tiap worker
+
+
+def on_starting(server):
+    if not preload_app:
+        return
+    import app
+
+    if preload_model:
+        app.preload(warmup=False)
+    # Objek yang sudah ada tidak lagi disentuh GC, agar halaman memori master tetap dibagi
+    gc.freeze()
+    server.log.info("Startup breakdown:\n%s", app.startup.report())
+
+
+def post_fork(server, worker):
+    if not (preload_app and preload_model):
+        return
+    import app
+
+    if app.app.config['MODEL_WARMUP'] and not app.app.config['MODEL_SERVER']:
+        app.warm_up_model(app.model_registry)
@@ -0,0 +1,206 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import importlib.util
+
+import cv2
+import numpy as np
+
+# torch/ultralytics diimport di dalam fungsi: modul ini juga dipakai proses yang tidak menjalankan model
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+# Paket opsional per backend hasil export (requirements-inference.txt); onnx dipakai saat export
+BACKEND_PACKAGES = {'onnx': ('onnx', 'onnxruntime'), 'openvino': ('openvino',)}
+
+logger = logging.getLogger('sintesa')
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def export_model(weights_path, backend, cache_dir='model_cache', imgsz=640):
+    """
+    Export bobot .pt ke format backend ('onnx' atau 'openvino') satu kali dan simpan di cache_dir.
+    Nama artefak mengandung hash bobot, sehingga bobot baru otomatis diexport ulang.
+    Mengembalikan path artefak (file .onnx atau folder model OpenVINO).
+    """
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    name = f"{stem}-{file_sha256(weights_path)[:12]}-{imgsz}"
+    artifact = os.path.join(cache_dir, f"{name}.onnx" if backend == 'onnx' else f"{name}_openvino_model")
+    if os.path.exists(artifact):
+        return artifact
+
+    from ultralytics import YOLO
+
+    os.makedirs(cache_dir, exist_ok=True)
+    logger.info("Exporting %s to %s (%s)", weights_path, backend, artifact)
+
+    # Export di folder sementara agar beberapa worker yang start bersamaan tidak saling menimpa
+    with tempfile.TemporaryDirectory(dir=cache_dir) as workdir:
+        local_weights = os.path.join(workdir, os.path.basename(weights_path))
+        shutil.copy(weights_path, local_weights)
+        yolo = YOLO(local_weights)
+        exported = yolo.export(format=backend, imgsz=imgsz, dynamic=True, verbose=False)
+
+        # Simpan nama kelas dan ukuran input di samping artefak
+        metadata_path = os.path.join(exported, 'sintesa.json') if os.path.isdir(exported) else f"{exported}.json"
+        with open(metadata_path, 'w') as f:
+            json.dump({'names': yolo.names, 'imgsz': imgsz}, f)
+
+        if os.path.isdir(exported):
+            os.replace(exported, artifact)
+        else:
+            os.replace(f"{exported}.json", f"{artifact}.json")
+            os.replace(exported, artifact)
+    return artifact
+
+def _read_metadata(artifact):
+    path = os.path.join(artifact, 'sintesa.json') if os.path.isdir(artifact) else f"{artifact}.json"
+    with open(path) as f:
+        metadata = json.load(f)
+    metadata['names'] = {int(k): v for k, v in metadata['names'].items()}
+    return metadata
+
+
+class ExportedModel:
+    """
+    Dasar backend untuk model hasil export. Objeknya dapat dipanggil seperti YOLO
+    (model(frames, classes=..., conf=..., iou=...)) dan mengembalikan list Results
+    ultralytics, sehingga loop deteksi tetap memakai boxes.conf dan plot() yang sama.
+    """
+
+    def __init__(self, artifact, max_det=50):
+        metadata = _read_metadata(artifact)
+        self.names = metadata['names']
+        self.imgsz = metadata['imgsz']
+        self.max_det = max_det
+
+    def _letterbox(self, frame):
+        # Resize dengan rasio tetap lalu padding ke ukuran input persegi (seperti LetterBox ultralytics)
+        height, width = frame.shape[:2]
+        gain = min(self.imgsz / height, self.imgsz / width)
+        new_w, new_h = int(round(width * gain)), int(round(height * gain))
+        pad_x, pad_y = (self.imgsz - new_w) / 2, (self.imgsz - new_h) / 2
+
+        if (new_w, new_h) != (width, height):
+            frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return frame, gain, (left, top)
+
+    def _preprocess(self, frames):
+        blob = np.empty((len(frames), 3, self.imgsz, self.imgsz), dtype=np.float32)
+        transforms = []
+        for i, frame in enumerate(frames):
+            padded, gain, pad = self._letterbox(frame)
+            # BGR HWC uint8 -> RGB CHW float 0..1
+            blob[i] = padded[:, :, ::-1].transpose(2, 0, 1) / 255.0
+            transforms.append((gain, pad))
+        return blob, transforms
+
+    def _postprocess(self, output, frames, transforms, classes, conf, iou):
+        import torch
+        import torchvision
+        from ultralytics.engine.results import Results
+
+        results = []
+        for prediction, frame, (gain, (pad_x, pad_y)) in zip(output, frames, transforms):
+            prediction = torch.from_numpy(np.ascontiguousarray(prediction.T))  # (anchors, 4 + nc)
+            scores, class_ids = prediction[:, 4:].max(dim=1)
+            keep = scores >= conf
+            if classes is not None:
+                keep &= torch.isin(class_ids, torch.tensor(classes))
+            boxes, scores, class_ids = prediction[keep, :4], scores[keep], class_ids[keep]
+
+            # xywh (ruang input model) -> xyxy (ruang frame asli)
+            xyxy = torch.cat([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2], dim=1)
+            xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / gain).clamp(0, frame.shape[1])
+            xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / gain).clamp(0, frame.shape[0])
+
+            keep = torchvision.ops.batched_nms(xyxy, scores, class_ids, iou)[:self.max_det]
+            detections = torch.cat([xyxy[keep], scores[keep, None], class_ids[keep, None].float()], dim=1)
+            results.append(Results(frame, path='', names=self.names, boxes=detections))
+        return results
+
+    def _run(self, blob):
+        raise NotImplementedError
+
+    def __call__(self, frames, classes=None, conf=0.25, iou=0.7, **kwargs):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        blob, transforms = self._preprocess(frames)
+        return self._postprocess(self._run(blob), frames, transforms, classes, conf, iou)
+
+
+class OnnxRuntimeModel(ExportedModel):
+    """Inferensi CPU lewat ONNX Runtime dengan jumlah thread yang bisa diatur"""
+
+    def __init__(self, artifact, intra_op_threads=0, inter_op_threads=1, max_det=50):
+        super().__init__(artifact, max_det=max_det)
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnx membutuhkan paket onnxruntime") from e
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 = sesuai jumlah core
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(artifact, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINOModel(ExportedModel):
+    """Inferensi CPU lewat OpenVINO Runtime"""
+
+    def __init__(self, artifact, threads=0, max_det=50):
+        super().__init__(artifact, max_det=max_det)
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=openvino membutuhkan paket openvino") from e
+
+        xml = next(os.path.join(artifact, f) for f in os.listdir(artifact) if f.endswith('.xml'))
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = threads
+        self.compiled = ov.Core().compile_model(xml, 'CPU', config)
+        self.output = self.compiled.output(0)
+
+    def _run(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+def require_backend_packages(backend):
+    """Pastikan paket opsional backend terpasang sebelum export yang lama dimulai"""
+    missing = [name for name in BACKEND_PACKAGES.get(backend, ()) if importlib.util.find_spec(name) is None]
+    if missing:
+        raise RuntimeError(f"INFERENCE_BACKEND={backend} membutuhkan paket {', '.join(missing)} "
+                           f"(pip install -r requirements-inference.txt)")
+
+def load_exported_model(weights_path, backend, cache_dir='model_cache', imgsz=640,
+                        intra_op_threads=0, inter_op_threads=1, max_det=50):
+    if backend not in BACKENDS[1:]:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    require_backend_packages(backend)
+    artifact = export_model(weights_path, backend, cache_dir=cache_dir, imgsz=imgsz)
+    if backend == 'onnx':
+        return OnnxRuntimeModel(artifact, intra_op_threads, inter_op_threads, max_det=max_det)
+    return OpenVINOModel(artifact, threads=intra_op_threads, max_det=max_det)
+
+def warm_up(model, batch_size=1, imgsz=640, **kwargs):
+    """Jalankan satu inferensi dummy agar inisialisasi graph/alokasi tidak dibayar request pertama"""
+    frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * batch_size
+    model(frames, **kwargs)
@@ -0,0 +1,205 @@
+import os
+import sys
+import glob
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Batas bucket histogram durasi (detik)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    'sintesa_stage_seconds': 'Waktu yang dihabiskan per tahap pemrosesan video',
+    'sintesa_frames_total': 'Jumlah frame video berdasarkan hasil pemrosesan',
+    'sintesa_tiles_total': 'Jumlah input model dari crop ROI dan tile frame beresolusi tinggi',
+    'sintesa_videos_total': 'Jumlah video yang selesai diproses berdasarkan status',
+    'sintesa_alerts_total': 'Jumlah notifikasi Telegram berdasarkan status pengiriman',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Counter dan histogram sederhana per proses. Setiap proses (web maupun worker) menulis
+    snapshot-nya ke METRICS_DIR, lalu endpoint /metrics menggabungkan semua snapshot
+    sehingga angka dari proses worker ikut terlihat.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram['buckets'][index] += 1
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, dict(labels), dict(h, buckets=list(h['buckets']))]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def flush(self, directory, min_interval=0.0):
+        """Tulis snapshot proses ini ke directory secara atomik (dibatasi min_interval detik)"""
+        now = time.time()
+        if now - self._last_flush < min_interval:
+            return
+        self._last_flush = now
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"  # Beberapa thread bisa flush bersamaan
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+def rss_mb():
+    """Memori resident proses ini (MB); puncak (ru_maxrss) jika /proc tidak tersedia"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss dalam KB di Linux dan byte di macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+class StartupTimer:
+    """
+    Waktu dan memori per tahap start-up proses (import, konfigurasi, database, model, ...),
+    untuk melihat ke mana waktu boot habis. mark() menutup tahap yang berjalan sejak mark
+    sebelumnya; phase() mengukur tahap yang terjadi belakangan (mis. pemuatan model lazy).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []  # [nama, detik, RSS MB setelah tahap]
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append([name, now - self._last, rss_mb()])
+        self._last = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append([name, time.perf_counter() - start, rss_mb()])
+            self._last = time.perf_counter()
+
+    def report(self):
+        """Tabel teks: detik per tahap, porsinya dari total, dan RSS setelah tahap"""
+        total = sum(seconds for _, seconds, _ in self.phases) or 1e-9
+        width = max([len(name) for name, _, _ in self.phases] + [5])
+        lines = [f"{'phase':<{width}}  {'seconds':>8}  {'share':>6}  {'rss_mb':>7}"]
+        for name, seconds, rss in self.phases:
+            rss = f"{rss:7.1f}" if rss is not None else f"{'-':>7}"
+            lines.append(f"{name:<{width}}  {seconds:8.3f}  {seconds / total:6.1%}  {rss}")
+        lines.append(f"{'total':<{width}}  {total:8.3f}")
+        return '\n'.join(lines)
+
+
+def load_snapshots(directory, live=None):
+    """Baca snapshot semua proses; snapshot live (proses ini) menggantikan file miliknya sendiri"""
+    snapshots = []
+    own_path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        if live is not None and path == own_path:
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    if live is not None:
+        snapshots.append(live.snapshot())
+    return snapshots
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(snapshots):
+    """Gabungkan snapshot dan tulis dalam format teks Prometheus (exposition format 0.0.4)"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        buckets = snapshot['buckets']
+        for name, labels, value in snapshot['counters']:
+            key = (name, _label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, _label_key(labels))
+            merged = histograms.setdefault(key, {'le': buckets, 'buckets': [0] * len(buckets), 'count': 0, 'sum': 0.0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+            merged['count'] += histogram['count']
+            merged['sum'] += histogram['sum']
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for le, count in zip(histogram['le'], histogram['buckets']):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,414 @@
+import os
+import time
+import zlib
+import random
+import logging
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from frame_transport import FrameRing
+from inference import file_sha256
+
+logger = logging.getLogger('sintesa')
+
+
+def parse_model_versions(value, default_path):
+    """'default=a.pt,candidate=b.pt' -> {'default': 'a.pt', 'candidate': 'b.pt'}; kosong = hanya default_path"""
+    versions = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, path = item.split('=', 1)
+            versions[name.strip()] = path.strip()
+    return versions or {'default': default_path}
+
+def parse_traffic(value):
+    """'candidate=0.1' -> {'candidate': 0.1}: porsi video yang diproses versi tersebut (A/B)"""
+    traffic = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, share = item.split('=', 1)
+            traffic[name.strip()] = float(share)
+    return traffic
+
+def parse_address(value):
+    """'host:port' -> (host, port) untuk TCP; selain itu path unix socket"""
+    host, _, port = value.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return value
+
+def require_authkey(authkey):
+    """Tolak koneksi server inferensi tanpa kunci rahasia (lihat InferenceServer)"""
+    if not authkey:
+        raise ValueError('An authkey is required for the inference server connection')
+
+
+class LoadedModel:
+    def __init__(self, version, model):
+        self.version = version
+        self.model = model
+        self.lock = threading.Lock()  # Predictor ultralytics tidak aman dipakai beberapa thread sekaligus
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """
+    Versi model bernama (nama -> file bobot) yang dimuat saat pertama kali dipakai.
+
+    Id versi berbentuk 'nama:sha12' (12 karakter pertama SHA-256 file bobot). File bobot
+    diperiksa paling sering setiap reload_interval detik; jika isinya berubah, bobot baru
+    dimuat di samping yang lama lalu ditukar (hot reload). Versi lama tetap bisa dipakai
+    dengan id lengkapnya, sehingga video yang sedang diproses selesai dengan versi yang sama,
+    dan dilepas setelah retire_seconds tidak dipakai. traffic (nama -> porsi) mengarahkan
+    sebagian video ke versi selain default untuk perbandingan A/B.
+    """
+
+    def __init__(self, versions, loader, default=None, traffic=None, predict_kwargs=None,
+                 reload_interval=5.0, retire_seconds=300.0):
+        self.versions = dict(versions)
+        self.loader = loader  # loader(path) -> objek seperti YOLO
+        self.default = default or next(iter(self.versions))
+        self.traffic = {name: share for name, share in (traffic or {}).items() if name in self.versions}
+        self.predict_kwargs = predict_kwargs or {}
+        self.reload_interval = reload_interval
+        self.retire_seconds = retire_seconds
+        if self.default not in self.versions:
+            raise ValueError(f"Unknown default model: {self.default}")
+
+        self._current = {}  # nama -> LoadedModel
+        self._retired = {}  # id versi -> LoadedModel
+        self._checked = {}  # nama -> waktu pemeriksaan file terakhir
+        self._hashes = {}  # path -> ((mtime, size), sha256)
+        self._lock = threading.Lock()
+        self._loading = {name: threading.Lock() for name in self.versions}
+
+    def _file_version(self, name):
+        path = self.versions[name]
+        if not os.path.exists(path):
+            return f"{name}:{os.path.basename(path)}"
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != key:
+            cached = self._hashes[path] = (key, file_sha256(path))
+        return f"{name}:{cached[1][:12]}"
+
+    def _split(self, version):
+        name = (version or self.default).split(':', 1)[0]
+        if name not in self.versions:
+            raise KeyError(f"Unknown model: {name}")
+        return name
+
+    def select(self, key=None):
+        """Nama versi untuk satu video; key (mis. hash konten) membuat pilihannya tetap sama"""
+        if not self.traffic:
+            return self.default
+        point = (zlib.crc32(key.encode()) / 2 ** 32) if key else random.random()
+        for name, share in sorted(self.traffic.items()):
+            if point < share:
+                return name
+            point -= share
+        return self.default
+
+    def version(self, name=None):
+        """Id versi yang akan dipakai untuk nama ini (tanpa memuat modelnya)"""
+        name = self._split(name)
+        loaded = self._current.get(name)
+        if loaded is not None and time.time() - self._checked.get(name, 0) < self.reload_interval:
+            return loaded.version
+        return self._file_version(name)
+
+    def _load(self, name, version):
+        start = time.time()
+        model = self.loader(self.versions[name])
+        logger.info("Loaded model %s from %s in %.2fs", version, self.versions[name], time.time() - start)
+        return LoadedModel(version, model)
+
+    def get(self, version=None):
+        """LoadedModel untuk nama atau id versi; dimuat (ulang) jika belum ada atau bobotnya berubah"""
+        name = self._split(version)
+        now = time.time()
+        with self._lock:
+            if version in self._retired:
+                loaded = self._retired[version]
+                loaded.last_used = now
+                return loaded
+            loaded = self._current.get(name)
+            if loaded is not None and now - self._checked.get(name, 0) < self.reload_interval:
+                loaded.last_used = now
+                return loaded
+
+        # Muat di luar _lock agar inferensi versi lain tidak ikut menunggu
+        with self._loading[name]:
+            loaded = self._current.get(name)
+            file_version = self._file_version(name)
+            if loaded is None or loaded.version != file_version:
+                fresh = self._load(name, file_version)
+                with self._lock:
+                    if loaded is not None:
+                        logger.info("Model %s replaced by %s", loaded.version, fresh.version)
+                        self._retired[loaded.version] = loaded
+                    self._current[name] = loaded = fresh
+            with self._lock:
+                self._checked[name] = time.time()
+                loaded.last_used = time.time()
+                self._retire(now)
+        if version and ':' in version and version != loaded.version:
+            # Versi yang diminta baru saja diganti: tetap dipakai sampai dilepas
+            with self._lock:
+                retired = self._retired.get(version)
+            if retired is not None:
+                return retired
+            logger.warning("Model version %s is no longer available, using %s", version, loaded.version)
+        return loaded
+
+    def _retire(self, now):
+        for version, loaded in list(self._retired.items()):
+            if now - loaded.last_used > self.retire_seconds:
+                del self._retired[version]
+                logger.info("Released model %s", version)
+
+    def infer(self, frames, version=None, **kwargs):
+        """Jalankan model; mengembalikan (id versi yang dipakai, list Results)"""
+        loaded = self.get(version)
+        with loaded.lock:
+            results = loaded.model(frames, **self.predict_kwargs, **kwargs)
+        return loaded.version, results
+
+    def names(self, version=None):
+        return self.get(version).model.names
+
+    def reload(self, name=None):
+        """Periksa file bobot sekarang juga (tanpa menunggu reload_interval)"""
+        name = self._split(name)
+        self._checked.pop(name, None)
+        return self.get(name).version
+
+    def describe(self):
+        return [{
+            'name': name,
+            'path': path,
+            'version': self.version(name),
+            'loaded': name in self._current,
+            'default': name == self.default,
+            'traffic': self.traffic.get(name, 0.0) if name != self.default else
+                       max(0.0, 1.0 - sum(self.traffic.values())),
+            'retired': sorted(v for v in self._retired if v.startswith(f"{name}:")),
+        } for name, path in self.versions.items()]
+
+
+def _result_boxes(result):
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    data = boxes.data
+    return (data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)).astype(np.float32)
+
+
+class InferenceServer:
+    """
+    Satu proses yang memegang ModelRegistry dan melayani inferensi untuk semua proses web,
+    worker dan monitor kamera lewat multiprocessing.connection (socket lokal). Balasan
+    inferensi hanya berisi kotak deteksi; frame tidak dikirim balik. Klien di mesin yang
+    sama mengirim frame lewat FrameRing milik koneksinya ('infer_shared'): pesan hanya
+    berisi index slot, dan frame dibaca sebagai view shared memory tanpa salinan.
+    Pesan klien di-unpickle, jadi authkey (rahasia bersama) wajib: tanpa itu siapa pun yang
+    bisa menjangkau socket atau port bisa menjalankan kode di proses server.
+    """
+
+    def __init__(self, registry, address, authkey=None):
+        require_authkey(authkey)
+        self.registry = registry
+        self.address = address
+        self.authkey = authkey
+
+    def handle(self, message, rings=None):
+        command, args = message[0], message[1:]
+        if command == 'infer':
+            frames, version, kwargs = args
+            version, results = self.registry.infer(frames, version, **kwargs)
+            return version, self.registry.names(version), [_result_boxes(result) for result in results]
+        if command == 'infer_shared':
+            ring, frames, version, kwargs = args
+            ring = self._attach(rings if rings is not None else {}, ring)
+            try:
+                version, results = self.registry.infer([ring.view(*frame) for frame in frames], version, **kwargs)
+                return version, self.registry.names(version), [_result_boxes(result) for result in results]
+            finally:
+                # Slot boleh ditulis ulang klien setelah balasan dikirim
+                ring.release(frames[-1][0])
+        if command == 'names':
+            return self.registry.names(*args)
+        if command == 'select':
+            return self.registry.select(*args)
+        if command == 'version':
+            return self.registry.version(*args)
+        if command == 'reload':
+            return self.registry.reload(*args)
+        if command == 'describe':
+            return self.registry.describe()
+        raise ValueError(f"Unknown command: {command}")
+
+    @staticmethod
+    def _attach(rings, descriptor):
+        # Satu ring per koneksi; klien membuat ring baru (nama baru) jika frame-nya membesar
+        name = descriptor[0]
+        if name not in rings:
+            for ring in rings.values():
+                ring.close()
+            rings.clear()
+            rings[name] = FrameRing.attach(*descriptor)
+        return rings[name]
+
+    def _serve_connection(self, conn):
+        rings = {}
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    for ring in rings.values():
+                        ring.close()
+                    return
+                try:
+                    reply = ('ok', self.handle(message, rings))
+                except Exception as e:
+                    logger.exception("Inference server request failed")
+                    reply = ('error', f"{type(e).__name__}: {e}")
+                conn.send(reply)
+
+    def serve_forever(self, stop=None, ready=None):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)  # Socket sisa proses sebelumnya
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info("Inference server listening on %s", listener.address)
+            if ready is not None:
+                ready.set()
+            while stop is None or not stop.is_set():
+                try:
+                    conn = listener.accept()
+                except OSError:
+                    if stop is not None and stop.is_set():
+                        break
+                    raise
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+class RemoteModelRegistry:
+    """
+    Klien InferenceServer dengan antarmuka yang sama seperti ModelRegistry. Setiap thread
+    memakai koneksinya sendiri dan menyambung ulang sekali jika server di-restart.
+    shared_memory mengirim frame lewat FrameRing per thread (ring_slots slot, minimal
+    sebesar batch) alih-alih pickle; hanya untuk server di mesin yang sama. Jika server
+    tidak bisa membuka shared memory klien, klien kembali ke pickle.
+    """
+
+    def __init__(self, address, authkey=None, timeout=30.0, shared_memory=False, ring_slots=8):
+        require_authkey(authkey)
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self.shared_memory = shared_memory
+        self.ring_slots = ring_slots
+        self._local = threading.local()
+
+    def _connect(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.5)  # Server mungkin masih memuat model
+
+    def _request(self, *message):
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            try:
+                conn.send(message)
+                status, value = conn.recv()
+                break
+            except (EOFError, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status == 'error':
+            raise RuntimeError(f"Inference server: {value}")
+        return value
+
+    def _ring(self, frames):
+        ring = getattr(self._local, 'ring', None)
+        slot_bytes = max(frame.nbytes for frame in frames)
+        if ring is None or ring.slot_bytes < slot_bytes or ring.slots < len(frames):
+            if ring is not None:
+                ring.close()
+            self._local.ring = None
+            ring = self._local.ring = FrameRing.create(max(self.ring_slots, len(frames)), slot_bytes)
+        return ring
+
+    def _infer_shared(self, frames, version, kwargs):
+        try:
+            ring = self._ring(frames)
+        except OSError as e:
+            logger.warning("Shared memory frame transport unavailable, sending frames over the socket: %s", e)
+            self.shared_memory = False
+            return None
+
+        descriptors = [ring.put(frame) for frame in frames]
+        try:
+            return self._request('infer_shared', ring.descriptor(), descriptors, version, kwargs)
+        except Exception as e:
+            # Slot yang mungkin belum dilepas server membuat ring tidak bisa dipakai lagi
+            ring.close()
+            self._local.ring = None
+            if not isinstance(e, RuntimeError) or 'FileNotFoundError' not in str(e):
+                raise
+        logger.warning("Inference server cannot open shared memory (different host?), sending frames over the socket")
+        self.shared_memory = False
+        return None
+
+    def infer(self, frames, version=None, **kwargs):
+        # Diimport di sini: klien yang belum pernah inferensi tidak perlu memuat torch
+        import torch
+        from ultralytics.engine.results import Results
+
+        reply = self._infer_shared(frames, version, kwargs) if self.shared_memory and frames else None
+        version, names, boxes = reply or self._request('infer', frames, version, kwargs)
+        results = [Results(frame, path='', names=names, boxes=torch.from_numpy(data))
+                   for frame, data in zip(frames, boxes)]
+        return version, results
+
+    def select(self, key=None):
+        return self._request('select', key)
+
+    def version(self, name=None):
+        return self._request('version', name)
+
+    def names(self, version=None):
+        return self._request('names', version)
+
+    def reload(self, name=None):
+        return self._request('reload', name)
+
+    def describe(self):
+        return self._request('describe')
+
+
+class RegistryModel:
+    """Objek seperti YOLO (model(frames, ...)) yang meneruskan inferensi ke registry"""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __call__(self, frames, version=None, **kwargs):
+        return self.registry.infer(frames, version, **kwargs)[1]
+
+    @property
+    def names(self):
+        return self.registry.names()
@@ -0,0 +1,157 @@
+import queue
+import threading
+
+from video_io import iter_frames
+
+_END = object()  # Penanda akhir stream antar tahap
+
+
+def run_detection_pipeline(capture, should_infer, infer_batch, handle_frame,
+                           batch_size=8, queue_size=2, on_batch=None, max_batch_frames=None, first_frame=1,
+                           preprocess=None, next_decode=None, seek_frames=0):
+    """
+    Jalankan decode -> inferensi -> anotasi/encode sebagai tiga tahap yang berjalan bersamaan.
+
+    - decode (thread): membaca frame dari capture dan mengelompokkan per batch
+    - inferensi (thread pemanggil): menjalankan infer_batch pada frame yang dipilih should_infer
+    - anotasi/encode (thread): memanggil handle_frame(frame_index, frame, sampled, result, conf)
+      untuk setiap frame sesuai urutan aslinya
+
+    Antar tahap dihubungkan queue berukuran tetap (queue_size batch), sehingga decode
+    tertahan ketika model tertinggal dan memori tetap terbatas berapapun panjang videonya.
+    Sebuah batch juga dikirim ketika sudah berisi max_batch_frames frame (default
+    batch_size * 4), agar bagian video yang jarang disampel tidak menumpuk di memori.
+    on_batch(frame_index, detections) dipanggil di thread pemanggil begitu setiap batch selesai
+    diinferensi, sebelum diteruskan ke encode: frame_index adalah frame terakhir batch dan
+    detections berisi (frame_index, conf) setiap frame sampelnya. Umpan balik ke sampler
+    sebaiknya lewat sini, karena thread encode bisa tertinggal jauh; decode tetap bisa
+    mendahului hingga queue_size + 1 batch yang masih memakai keputusan lama.
+    first_frame adalah nomor frame pertama yang dibaca capture (mis. capture yang sudah di-seek).
+    preprocess(frame) (opsional) dijalankan di thread decode untuk frame yang dipilih; model
+    menerima hasilnya lewat infer_batch(inputs, originals=frames), sedangkan handle_frame
+    tetap menerima frame asli.
+    next_decode(frame_index) (opsional) mengembalikan frame berikutnya yang perlu didecode; frame
+    di antaranya hanya di-grab() atau dilompati dengan seek ke keyframe jika lebih dari
+    seek_frames frame (lihat video_io.iter_frames). Frame tersebut tidak diinferensi dan
+    handle_frame menerimanya dengan frame None; max_batch_frames hanya menghitung frame yang didecode.
+    Exception dari tahap manapun menghentikan seluruh pipeline dan dilempar ulang ke pemanggil.
+    """
+    max_batch_frames = max_batch_frames or batch_size * 4
+    decode_queue = queue.Queue(maxsize=queue_size)
+    encode_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def put(target_queue, item):
+        # Tunggu slot kosong (backpressure) kecuali pipeline sedang dihentikan
+        while not stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source_queue):
+        while True:
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return _END
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def decode():
+        try:
+            batch = []
+            sampled_count = 0
+            decoded_count = 0
+            for frame_index, _, frame in iter_frames(capture, first_frame, next_decode, seek_frames):
+                if stop.is_set():
+                    break
+                sampled = should_infer(frame_index, frame) and frame is not None
+                model_input = preprocess(frame) if sampled and preprocess else frame
+                batch.append((frame_index, frame, sampled, model_input))
+                if sampled:
+                    sampled_count += 1
+                if frame is not None:
+                    decoded_count += 1
+                if sampled_count >= batch_size or decoded_count >= max_batch_frames:
+                    if not put(decode_queue, batch):
+                        return
+                    batch = []
+                    sampled_count = 0
+                    decoded_count = 0
+            if batch:
+                put(decode_queue, batch)
+        except Exception as e:
+            fail(e)
+        finally:
+            put(decode_queue, _END)
+
+    def encode():
+        try:
+            while not stop.is_set():
+                batch = get(encode_queue)
+                if batch is _END:
+                    break
+                for frame_index, frame, sampled, result, conf in batch:
+                    handle_frame(frame_index, frame, sampled, result, conf)
+        except Exception as e:
+            fail(e)
+
+    decoder = threading.Thread(target=decode, name='pipeline-decode', daemon=True)
+    encoder = threading.Thread(target=encode, name='pipeline-encode', daemon=True)
+    decoder.start()
+    encoder.start()
+
+    try:
+        while not stop.is_set():
+            batch = get(decode_queue)
+            if batch is _END:
+                break
+
+            # Jalankan model sekali untuk seluruh frame sampel dalam batch
+            if preprocess:
+                detections = infer_batch([model_input for _, _, sampled, model_input in batch if sampled],
+                                         originals=[frame for _, frame, sampled, _ in batch if sampled])
+            else:
+                detections = infer_batch([frame for _, frame, sampled, _ in batch if sampled])
+            detections = iter(detections)
+            processed = []
+            for frame_index, frame, sampled, _ in batch:
+                result, conf = next(detections, (None, None)) if sampled else (None, None)
+                processed.append((frame_index, frame, sampled, result, conf))
+
+            if on_batch:
+                on_batch(batch[-1][0], [(frame_index, conf) for frame_index, _, sampled, _, conf in processed
+                                        if sampled])
+            if not put(encode_queue, processed):
+                break
+    except Exception as e:
+        fail(e)
+    finally:
+        put(encode_queue, _END)
+        decoder.join()
+        encoder.join()
+
+    if errors:
+        raise errors[0]
+
+
+def plan_shards(total_frames, shards, min_frames):
+    """
+    Bagi frame 1..total_frames menjadi paling banyak shards rentang berurutan yang masing-masing
+    minimal min_frames frame. Mengembalikan list (frame_awal, frame_akhir) inklusif; frame_akhir
+    rentang terakhir None (dibaca sampai akhir, karena jumlah frame dari container bisa meleset).
+    """
+    count = min(shards, total_frames // max(1, min_frames))
+    if count < 2:
+        return [(1, None)]
+    bounds = [1 + total_frames * i // count for i in range(count + 1)]
+    ranges = [(start, end - 1) for start, end in zip(bounds, bounds[1:])]
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
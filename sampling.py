@@ -0,0 +1,138 @@
+import threading
+
+import cv2
+
+
+class FixedStrideSampler:
+    """Pilih setiap frame ke-n untuk inferensi (perilaku lama: setiap frame ke-2)"""
+
+    def __init__(self, stride=2):
+        self.stride = max(1, stride)
+        self.frames_seen = 0
+        self.frames_inferred = 0
+
+    def next_frame(self, frame_index):
+        """Frame pertama mulai frame_index yang akan dipilih; frame sebelumnya tidak perlu didecode"""
+        return -(-frame_index // self.stride) * self.stride
+
+    def __call__(self, frame_index, frame):
+        self.frames_seen += 1
+        if frame_index % self.stride == 0:
+            self.frames_inferred += 1
+            return True
+        return False
+
+    def record_detection(self, frame_index, detected):
+        pass
+
+    def stats(self):
+        return {
+            'mode': 'fixed',
+            'frames_total': self.frames_seen,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_seen - self.frames_inferred,
+        }
+
+
+class MotionSampler:
+    """
+    Pemilih frame adaptif untuk rekaman CCTV yang sebagian besar statis.
+
+    Setiap frame dikecilkan ke grayscale beresolusi rendah lalu dibandingkan dengan
+    frame terakhir yang dikirim ke model. Frame hanya diinferensi jika ada gerakan
+    (proporsi piksel berubah >= motion_threshold) dan jaraknya dari inferensi
+    terakhir sudah mencapai stride saat ini. Stride langsung dirapatkan ke min_stride
+    setelah ada deteksi dan merenggang satu langkah per inferensi tanpa deteksi
+    hingga max_stride. idle_interval (frame) memaksa inferensi berkala meskipun
+    ruangan diam; 0 untuk menonaktifkan.
+    Pemilihan frame (thread decode) dan record_detection (thread inferensi) boleh dipanggil
+    dari thread berbeda; stride dijaga lock.
+    """
+
+    def __init__(self, min_stride=2, max_stride=8, motion_threshold=0.005,
+                 pixel_threshold=25, idle_interval=60, scale_width=160):
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.idle_interval = idle_interval
+        self.scale_width = scale_width
+
+        self.stride = self.min_stride
+        self._lock = threading.Lock()
+        self._reference = None
+        self._last_inferred = None
+
+        self.frames_seen = 0
+        self.frames_inferred = 0
+        self.frames_skipped_static = 0
+        self.frames_skipped_stride = 0
+        self.detections = 0
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.scale_width:
+            size = (self.scale_width, max(1, int(height * self.scale_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def motion_score(self, small):
+        """Proporsi piksel yang berubah dibanding frame referensi (0.0 - 1.0)"""
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self._reference)
+        return cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+
+    def next_frame(self, frame_index):
+        """
+        Frame pertama mulai frame_index yang mungkin dipilih (jarak stride dari inferensi
+        terakhir); frame sebelumnya dilewati tanpa melihat pikselnya, jadi tidak perlu didecode.
+        """
+        if self._last_inferred is None:
+            return frame_index
+        with self._lock:
+            return max(frame_index, self._last_inferred + self.stride)
+
+    def __call__(self, frame_index, frame):
+        self.frames_seen += 1
+        gap = frame_index - self._last_inferred if self._last_inferred is not None else None
+        with self._lock:
+            stride = self.stride
+
+        # frame None: tidak didecode karena next_frame() (stride bisa berubah sesudahnya)
+        if frame is None or (gap is not None and gap < stride):
+            self.frames_skipped_stride += 1
+            return False
+
+        small = self._downscale(frame)
+
+        idle = gap is None or (self.idle_interval and gap >= self.idle_interval)
+        if not idle and self.motion_score(small) < self.motion_threshold:
+            self.frames_skipped_static += 1
+            return False
+
+        self._reference = small
+        self._last_inferred = frame_index
+        self.frames_inferred += 1
+        return True
+
+    def record_detection(self, frame_index, detected):
+        """Umpan balik dari hasil inferensi untuk menyesuaikan stride"""
+        with self._lock:
+            if detected:
+                self.detections += 1
+                self.stride = self.min_stride
+            else:
+                self.stride = min(self.stride + 1, self.max_stride)
+
+    def stats(self):
+        return {
+            'mode': 'motion',
+            'frames_total': self.frames_seen,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped_static + self.frames_skipped_stride,
+            'frames_skipped_static': self.frames_skipped_static,
+            'frames_skipped_stride': self.frames_skipped_stride,
+            'frames_detected': self.detections,
+        }
@@ -0,0 +1,78 @@
+import os
+import logging
+
+logger = logging.getLogger('sintesa.storage')
+
+
+class ContentStore:
+    """
+    Penyimpanan berbasis isi (content-addressed) untuk video asli di folder upload.
+
+    Setiap isi disimpan sekali sebagai objects/<2 karakter hash>/<sha256><ext>; file di
+    folder upload menjadi hard link ke objek tersebut, sehingga upload ulang dengan isi
+    yang sama (nama file berbeda) tidak memakan ruang disk dua kali. Objek yang tidak lagi
+    punya link lain dihapus oleh collect_garbage(). Karena isi file dibagi lewat inode,
+    path yang sudah disimpan tidak boleh ditulis ulang di tempat: hapus dulu, lalu buat baru.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def object_path(self, content_hash, ext=''):
+        return os.path.join(self.directory, content_hash[:2], f"{content_hash}{ext}")
+
+    def add(self, path, content_hash):
+        """
+        Daftarkan file dengan hash content_hash. Jika isi yang sama sudah ada, path diganti
+        hard link ke objek lama (mengembalikan True: ruang disk dihemat). Filesystem tanpa
+        dukungan hard link dilewati tanpa error.
+        """
+        target = self.object_path(content_hash, os.path.splitext(path)[1].lower())
+        try:
+            if os.path.exists(target):
+                if os.path.samefile(target, path):
+                    return False
+                # Link sementara lalu rename agar path tidak pernah hilang di tengah jalan
+                tmp_path = f"{path}.link"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                os.link(target, tmp_path)
+                os.replace(tmp_path, path)
+                return True
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.link(path, target)
+        except OSError as e:
+            logger.warning("Could not add %s to content store: %s", path, e)
+        return False
+
+    def collect_garbage(self):
+        """Hapus objek yang hanya tinggal link di store (tidak dipakai file manapun); mengembalikan byte yang dibebaskan"""
+        freed = 0
+        if not os.path.isdir(self.directory):
+            return freed
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                stat = entry.stat()
+                if entry.is_file() and stat.st_nlink <= 1:
+                    os.remove(entry.path)
+                    freed += stat.st_size
+        return freed
+
+
+def find_orphans(directory, referenced, cutoff):
+    """
+    File langsung di directory (subfolder dilewati) yang tidak ada di referenced (path absolut)
+    dan terakhir diubah sebelum cutoff (timestamp). Memakai scandir: satu stat per file.
+    """
+    orphans = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if os.path.abspath(entry.path) in referenced:
+                continue
+            if entry.stat().st_mtime < cutoff:
+                orphans.append(entry.path)
+    return orphans
@@ -0,0 +1,404 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+logger = logging.getLogger('sintesa.streaming')
+
+def stream_fps(capture, default=25.0):
+    # Banyak kamera RTSP melaporkan 0 atau angka tidak wajar (mis. 90000)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0
+    return fps if 1 <= fps <= 120 else default
+
+
+class Segment:
+    """Potongan video kekerasan yang sudah selesai direkam dari satu kamera"""
+
+    def __init__(self, source_id, filename, raw_path, result_path, started_at, fps=25.0):
+        self.source_id = source_id
+        self.filename = filename
+        self.raw_path = raw_path
+        self.result_path = result_path
+        self.started_at = started_at
+        self.ended_at = started_at
+        self.fps = fps
+        self.frames = 0
+        self.detections = 0
+        self.peak_confidence = 0.0
+        self.confidence_sum = 0.0
+        # Nomor frame (dari 1) di dalam file segmen: deteksi pertama, terakhir dan tertinggi
+        self.first_detection_frame = None
+        self.last_detection_frame = None
+        self.peak_frame = None
+        self.screenshot = None  # Frame teranotasi dengan confidence tertinggi
+        self.ok = False
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.detections if self.detections else 0.0
+
+
+class SegmentRecorder:
+    """
+    Menulis satu segmen ke dua file: video asli dan video hasil yang diberi kotak
+    deteksi terakhir selama hold_frames frame setelah inferensi.
+    """
+
+    def __init__(self, segment, raw_writer, result_writer, hold_frames):
+        self.segment = segment
+        self.raw_writer = raw_writer
+        self.result_writer = result_writer
+        self.hold_frames = hold_frames
+        self.first_seq = None
+        self.last_detection_seq = None
+        self._result = None
+        self._result_seq = None
+
+    def write(self, seq, timestamp, frame):
+        if self.first_seq is None:
+            self.first_seq = seq
+            self.segment.started_at = datetime.fromtimestamp(timestamp)
+        self.segment.ended_at = datetime.fromtimestamp(timestamp)
+        self.segment.frames += 1
+
+        self.raw_writer.write(frame)
+        if self._result is not None and seq - self._result_seq <= self.hold_frames:
+            frame = self._result.plot(img=frame.copy())
+        self.result_writer.write(frame)
+
+    def detect(self, seq, result, conf):
+        self.last_detection_seq = seq
+        self._result, self._result_seq = result, seq
+        segment = self.segment
+        frame_number = seq - self.first_seq + 1 if self.first_seq is not None else 1
+        if segment.first_detection_frame is None:
+            segment.first_detection_frame = frame_number
+        segment.last_detection_frame = frame_number
+        segment.detections += 1
+        segment.confidence_sum += float(conf)
+        if conf > segment.peak_confidence:
+            segment.peak_confidence = float(conf)
+            segment.peak_frame = frame_number
+            segment.screenshot = result.plot()
+
+    def close(self):
+        raw_ok = self.raw_writer.release()
+        result_ok = self.result_writer.release()
+        self.segment.ok = bool(raw_ok and result_ok and self.segment.frames)
+        return self.segment
+
+
+class CameraStream:
+    """
+    Satu sumber video (RTSP/HTTP/file) yang dibaca terus-menerus di thread sendiri.
+
+    Frame terbaru disimpan di ring buffer berukuran tetap; StreamMonitor hanya mengambil
+    frame terakhir untuk inferensi sehingga frame di antaranya otomatis dilewati ketika
+    inferensi tertinggal. Ketika ada deteksi, isi ring buffer (pre-roll) dan frame
+    berikutnya ditulis ke disk hingga post_roll detik tanpa deteksi, lalu segmen
+    diserahkan ke on_segment(segment) di thread terpisah.
+    """
+
+    def __init__(self, source_id, url, name, output_dir, open_writer, on_segment,
+                 pre_roll=5.0, post_roll=5.0, max_segment=300.0, loop=False, realtime=None,
+                 reconnect_delay=5.0, capture_factory=cv2.VideoCapture, preprocess=None, region=None):
+        self.source_id = source_id
+        self.url = url
+        self.name = name
+        self.output_dir = output_dir
+        self.open_writer = open_writer
+        self.on_segment = on_segment
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.max_segment = max_segment
+        self.loop = loop
+        # File lokal dibaca sesuai fps aslinya agar berperilaku seperti kamera
+        self.realtime = os.path.exists(url) if realtime is None else realtime
+        self.reconnect_delay = reconnect_delay
+        self.capture_factory = capture_factory
+        self.preprocess = preprocess  # Dijalankan pada frame yang diinferensi (mis. FramePreprocessor)
+        self.region = region  # Crop ROI/tile per kamera (tiling.InferenceRegion), diteruskan ke infer_batch
+
+        self.fps = 25.0
+        self.ring = deque(maxlen=self._frames(pre_roll) + self._frames(2.0))
+        self.status = 'starting'
+        self.error = None
+        self._failed_stage = None  # Tahap yang gagal terakhir (lihat record_failure)
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.segments_recorded = 0
+        self.last_frame_at = None
+        self.last_inferred_at = 0.0
+
+        self._latest_seq = 0
+        self._taken_seq = 0
+        self._recording = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._finishers = []
+
+    def _frames(self, seconds):
+        return max(1, int(seconds * self.fps))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'stream-{self.source_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock:
+            recording, self._recording = self._recording, None
+        if recording is not None:
+            self._finish(recording)
+        for finisher in self._finishers:
+            finisher.join(timeout)
+        self.status = 'stopped'
+
+    def _open(self):
+        capture = self.capture_factory(self.url)
+        if not capture.isOpened():
+            capture.release()
+            return None
+        with self._lock:
+            self.fps = stream_fps(capture)
+            # Pre-roll ditambah kelonggaran 2 detik untuk latensi inferensi
+            self.ring = deque(self.ring, maxlen=self._frames(self.pre_roll) + self._frames(2.0))
+        return capture
+
+    def record_failure(self, stage, error):
+        """Tandai stream error (status dibaca proses monitor) sampai tahap yang sama berhasil lagi"""
+        self.status, self.error = 'error', f'{stage} failed: {error}'
+        self._failed_stage = stage
+
+    def _clear_failure(self, stage):
+        if self._failed_stage == stage:
+            self.status, self.error, self._failed_stage = 'running', None, None
+
+    def _run(self):
+        capture = None
+        next_frame_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                if capture is None:
+                    capture = self._open()
+                    if capture is None:
+                        self.status, self.error = 'error', f'Cannot open {self.url}'
+                        self._stop.wait(self.reconnect_delay)
+                        continue
+                    self.status, self.error, self._failed_stage = 'running', None, None
+
+                ret, frame = capture.read()
+                if not ret:
+                    if self.loop and capture.set(cv2.CAP_PROP_POS_FRAMES, 0) and self.frames_read:
+                        continue
+                    # Stream putus: sambung ulang setelah jeda
+                    capture.release()
+                    capture = None
+                    self.status = 'reconnecting'
+                    self._stop.wait(self.reconnect_delay)
+                    continue
+
+                if self.realtime:
+                    next_frame_at = max(next_frame_at + 1.0 / self.fps, time.monotonic() - 1.0)
+                    self._stop.wait(max(0.0, next_frame_at - time.monotonic()))
+                self.handle_frame(frame)
+            except Exception as e:
+                # Frame rusak atau writer gagal tidak boleh menghentikan thread: sambung ulang setelah jeda
+                logger.exception("Stream %s failed", self.source_id)
+                self.record_failure('Stream', e)
+                if capture is not None:
+                    capture.release()
+                    capture = None
+                self._stop.wait(self.reconnect_delay)
+
+        if capture is not None:
+            capture.release()
+
+    def handle_frame(self, frame, timestamp=None):
+        """Simpan frame ke ring buffer dan tulis ke segmen yang sedang direkam"""
+        timestamp = timestamp or time.time()
+        finished = None
+        with self._lock:
+            self.frames_read += 1
+            seq = self._latest_seq = self.frames_read
+            self.ring.append((seq, timestamp, frame))
+            self.last_frame_at = timestamp
+
+            recording = self._recording
+            if recording is not None:
+                recording.write(seq, timestamp, frame)
+                quiet = seq - recording.last_detection_seq > self._frames(self.post_roll)
+                too_long = seq - recording.first_seq >= self._frames(self.max_segment)
+                if quiet or too_long:
+                    finished, self._recording = recording, None
+        if finished is not None:
+            self._finish(finished, background=True)
+
+    def latest(self):
+        """(seq, frame) terbaru yang belum pernah diambil untuk inferensi, atau None"""
+        with self._lock:
+            if self._latest_seq <= self._taken_seq or not self.ring:
+                return None
+            seq, _, frame = self.ring[-1]
+            self._taken_seq = seq
+            return seq, frame
+
+    def record_inference(self, seq, result, conf):
+        """Hasil inferensi frame seq dari StreamMonitor; deteksi memulai/memperpanjang rekaman"""
+        self._clear_failure('Inference')
+        with self._lock:
+            self.frames_inferred += 1
+            if conf is None:
+                return
+            if self._recording is None:
+                self._recording = self._start_recording(seq)
+            self._recording.detect(seq, result, conf)
+
+    def _start_recording(self, seq):
+        started = datetime.now()
+        filename = f"{self.name}_{started:%d-%m-%y_%H-%M-%S}.mp4"
+        raw_path = os.path.join(self.output_dir, filename)
+        result_path = os.path.join(self.output_dir, f"result_{filename}")
+        height, width = self.ring[-1][2].shape[:2]
+
+        recording = SegmentRecorder(
+            Segment(self.source_id, filename, raw_path, result_path, started, fps=self.fps),
+            self.open_writer(raw_path, self.fps, (width, height)),
+            self.open_writer(result_path, self.fps, (width, height)),
+            hold_frames=self._frames(1.0)
+        )
+        recording.last_detection_seq = seq
+
+        # Pre-roll: frame sebelum deteksi yang masih ada di ring buffer
+        first_seq = seq - self._frames(self.pre_roll)
+        for frame_seq, timestamp, frame in self.ring:
+            if frame_seq >= first_seq:
+                recording.write(frame_seq, timestamp, frame)
+        return recording
+
+    def _finish(self, recording, background=False):
+        def finish():
+            try:
+                segment = recording.close()
+                self.segments_recorded += 1
+                self.on_segment(segment)
+            except Exception as e:
+                # Mis. gagal menyimpan ke database atau mengirim notifikasi
+                logger.exception("Failed to finish segment %s from stream %s",
+                                 recording.segment.filename, self.source_id)
+                self.record_failure('Segment', e)
+                return
+            self._clear_failure('Segment')
+
+        if not background:
+            finish()
+            return
+        # Menunggu ffmpeg dan menyimpan hasil tidak boleh menahan pembacaan stream
+        self._finishers = [t for t in self._finishers if t.is_alive()]
+        thread = threading.Thread(target=finish, name=f'segment-{self.source_id}', daemon=True)
+        self._finishers.append(thread)
+        thread.start()
+
+    def stats(self):
+        return {
+            'fps': self.fps,
+            'frames_read': self.frames_read,
+            'frames_inferred': self.frames_inferred,
+            'frames_dropped': self.frames_read - self.frames_inferred,
+            'segments_recorded': self.segments_recorded,
+            'recording': self._recording is not None,
+        }
+
+
+class StreamMonitor:
+    """
+    Penjadwal inferensi bersama untuk banyak kamera dalam satu proses.
+
+    Satu thread inferensi mengambil frame terbaru setiap kamera paling banyak
+    inference_fps kali per detik per kamera, lalu menjalankan model sekali untuk semua
+    kamera (hingga max_batch frame). Beban CPU model karenanya tetap terbatas berapapun
+    jumlah kamera; kamera yang paling lama menunggu didahulukan. Putaran yang gagal dicatat
+    sebagai error di kamera yang terlibat, lalu thread melanjutkan setelah error_delay detik.
+    """
+
+    def __init__(self, infer_batch, inference_fps=2.0, max_batch=8, error_delay=1.0):
+        self.infer_batch = infer_batch
+        self.interval = 1.0 / inference_fps if inference_fps > 0 else 0.0
+        self.max_batch = max(1, max_batch)
+        self.error_delay = error_delay
+        self.streams = {}
+        self._lock = threading.Lock()
+
+    def add(self, stream):
+        with self._lock:
+            self.streams[stream.source_id] = stream
+        stream.start()
+        return stream
+
+    def remove(self, source_id):
+        with self._lock:
+            stream = self.streams.pop(source_id, None)
+        if stream is not None:
+            stream.stop()
+        return stream
+
+    def run_once(self):
+        """Satu putaran inferensi; False jika belum ada kamera dengan frame baru"""
+        now = time.monotonic()
+        with self._lock:
+            streams = sorted(self.streams.values(), key=lambda s: s.last_inferred_at)
+
+        picked = []
+        for stream in streams:
+            if now - stream.last_inferred_at < self.interval:
+                continue
+            latest = stream.latest()
+            if latest is None:
+                continue
+            stream.last_inferred_at = now
+            picked.append((stream, *latest))
+            if len(picked) >= self.max_batch:
+                break
+
+        if not picked:
+            return False
+
+        frames = inputs = [frame for _, _, frame in picked]
+        kwargs = {}
+        if any(stream.preprocess for stream, _, _ in picked):
+            # Model menerima frame hasil preprocessing, hasilnya dipetakan kembali ke frame asli
+            inputs = [stream.preprocess(frame) if stream.preprocess else frame for stream, _, frame in picked]
+            kwargs['originals'] = frames
+        if any(stream.region is not None for stream, _, _ in picked):
+            kwargs['regions'] = [stream.region for stream, _, _ in picked]
+        try:
+            detections = self.infer_batch(inputs, **kwargs)
+            for (stream, seq, _), (result, conf) in zip(picked, detections):
+                stream.record_inference(seq, result, conf)
+        except Exception as e:
+            for stream, _, _ in picked:
+                stream.record_failure('Inference', e)
+            raise
+        return True
+
+    def run(self, stop):
+        while not stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Stream inference failed")
+                stop.wait(self.error_delay)
+                continue
+            if not busy:
+                stop.wait(0.01)
+
+    def stop(self):
+        for source_id in list(self.streams):
+            self.remove(source_id)
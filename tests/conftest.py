@@ -1,5 +1,11 @@
+import os
+import tempfile
 import pytest
 
+# Gunakan SQLite in-memory agar test tidak membutuhkan server PostgreSQL
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='sintesa-metrics-'))
+
 @pytest.fixture(scope='session')
 def sample_fixture():
     return "sample data"
\ No newline at end of file
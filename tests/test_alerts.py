@@ -0,0 +1,135 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alerts import TelegramAlertDispatcher
+
+
+class TelegramStub:
+    """Server HTTP lokal yang meniru API Telegram; responses dipakai berurutan"""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = list(responses or [])
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                stub.requests.append((self.path, body))
+                status, payload = stub.responses.pop(0) if stub.responses else (200, {'ok': True})
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = TelegramStub()
+    yield server
+    server.close()
+
+def make_dispatcher(url, results, **kwargs):
+    options = dict(api_url=url, timeout=2.0, backoff_base=0.01, min_interval=0.0,
+                   on_result=lambda status, seconds: results.append(status))
+    options.update(kwargs)
+    return TelegramAlertDispatcher('TOKEN', '42', **options)
+
+def test_message_and_photo_grouped_into_send_photo(stub, tmp_path):
+    photo = tmp_path / 'frame.jpg'
+    photo.write_bytes(b'jpeg-bytes')
+    results = []
+    dispatcher = make_dispatcher(stub.url, results)
+
+    assert dispatcher.send('Kekerasan di D404', photo_path=str(photo))
+    dispatcher.stop()
+
+    assert results == ['sent']
+    assert len(stub.requests) == 1
+    path, body = stub.requests[0]
+    assert path == '/botTOKEN/sendPhoto'
+    assert b'Kekerasan di D404' in body and b'jpeg-bytes' in body
+
+def test_retries_with_backoff_and_rate_limit(stub):
+    stub.responses = [
+        (500, {'ok': False}),
+        (429, {'ok': False, 'parameters': {'retry_after': 0.05}}),
+        (200, {'ok': True}),
+    ]
+    results = []
+    dispatcher = make_dispatcher(stub.url, results)
+
+    dispatcher.send('Kekerasan')
+    dispatcher.stop()
+
+    assert results == ['sent']
+    assert [path for path, _ in stub.requests] == ['/botTOKEN/sendMessage'] * 3
+
+def test_client_errors_are_not_retried(stub):
+    stub.responses = [(400, {'ok': False, 'description': 'chat not found'})]
+    results = []
+    dispatcher = make_dispatcher(stub.url, results)
+
+    dispatcher.send('Kekerasan')
+    dispatcher.stop()
+
+    assert results == ['failed']
+    assert len(stub.requests) == 1
+
+def test_unreachable_api_does_not_block_sender():
+    results = []
+    # Port 9 (discard) di localhost: koneksi ditolak
+    dispatcher = make_dispatcher('http://127.0.0.1:9', results, max_retries=1)
+
+    start = time.perf_counter()
+    assert dispatcher.send('Kekerasan')
+    assert time.perf_counter() - start < 0.1
+    dispatcher.stop()
+
+    assert results == ['failed']
+
+def test_disabled_without_token():
+    dispatcher = TelegramAlertDispatcher(None, None)
+    assert not dispatcher.enabled
+    assert dispatcher.send('Kekerasan') is False
+
+def test_stop_drains_queue_and_reports_dropped(stub):
+    # Rate limit panjang: alert pertama masih menunggu retry saat batas drain habis
+    stub.responses = [(429, {'ok': False, 'parameters': {'retry_after': 30}})]
+    results = []
+    dispatcher = make_dispatcher(stub.url, results, drain_timeout=0.2)
+
+    dispatcher.send('Kekerasan 1')
+    dispatcher.send('Kekerasan 2')
+    start = time.perf_counter()
+    assert dispatcher.stop() == 2
+    assert time.perf_counter() - start < 5
+
+    assert results == ['dropped', 'dropped']
+    assert len(stub.requests) == 1
+
+def test_stop_waits_for_queued_alerts(stub):
+    results = []
+    dispatcher = make_dispatcher(stub.url, results, min_interval=0.05)
+
+    for number in range(5):
+        dispatcher.send(f'Kekerasan {number}')
+    assert dispatcher.stop() == 0
+
+    assert results == ['sent'] * 5
@@ -1,11 +1,20 @@
 import os
+import sys
+import cv2
+import hashlib
 import pytest
+import numpy as np
 from flask import Flask
-from app import app, allowed_file, clean_uploads
+from app import app, db, allowed_file, enforce_retention, detect_violence_batch
+from app import DetectionJob, DetectionHistory, claim_next_job, run_job, VideoProcessingError
+from app import find_cached_detection, compute_cache_key, FFmpegVideoWriter
+from video_io import is_streamable
+from datetime import datetime, timedelta
 import tempfile
 import time
 from io import BytesIO
 import shutil
+import subprocess
 from unittest.mock import patch, MagicMock
 from werkzeug.datastructures import FileStorage
 
@@ -13,11 +22,23 @@ from werkzeug.datastructures import FileStorage
 def client():
     app.config['TESTING'] = True
     app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+    with app.app_context():
+        db.create_all()
     with app.test_client() as client:
         yield client
     # Cleanup after test
+    with app.app_context():
+        db.drop_all()
     shutil.rmtree(app.config['UPLOAD_FOLDER'])
 
+def test_import_does_not_load_model_libraries():
+    # Migrasi, CLI dan proses web tidak membayar import torch/ultralytics/moviepy
+    code = "import sys, app; print(sorted(m for m in ('torch', 'ultralytics', 'moviepy') if m in sys.modules))"
+    env = dict(os.environ, MODEL_WARMUP='1')
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+
 def test_allowed_file():
     # Test allowed file extensions
     assert allowed_file('video.mp4') == True
@@ -29,33 +50,112 @@ def test_allowed_file():
     assert allowed_file('document.pdf') == False
     assert allowed_file('noextension') == False
 
-def test_clean_uploads():
-    # Create temporary directory with files
-    temp_dir = tempfile.mkdtemp()
-    
-    # Create a file that's "old" (modify access time to be > 1 hour ago)
-    old_file = os.path.join(temp_dir, 'old_file.mp4')
-    with open(old_file, 'w') as f:
-        f.write('test')
+def test_enforce_retention(client):
+    temp_dir = app.config['UPLOAD_FOLDER']
     old_time = time.time() - 3700  # 1 hour + 100 seconds ago
-    os.utime(old_file, (old_time, old_time))
-    
-    # Create a new file
-    new_file = os.path.join(temp_dir, 'new_file.mp4')
-    with open(new_file, 'w') as f:
-        f.write('test')
-    
-    # Mock app.config and glob to use our temp directory
-    with patch('app.app.config', {'UPLOAD_FOLDER': temp_dir}):
-        with patch('app.glob.glob', return_value=[old_file, new_file]):
-            clean_uploads()
-    
-    # Check that old file is removed but new file remains
+
+    def make_file(name, mtime=None):
+        path = os.path.join(temp_dir, name)
+        with open(path, 'w') as f:
+            f.write('test')
+        if mtime:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    # File yatim (tanpa referensi DB): yang lama dihapus, yang baru tetap ada
+    old_file = make_file('old_file.mp4', old_time)
+    new_file = make_file('new_file.mp4')
+
+    # Hasil cache yang masih berlaku tetap disimpan meskipun file-nya lama
+    cached_original = make_file('cached.mp4', old_time)
+    cached_result = make_file('result_cached.mp4', old_time)
+
+    # Hasil cache yang sudah tidak dipakai melewati batas umur dihapus
+    expired_original = make_file('expired.mp4', old_time)
+    expired_result = make_file('result_expired.mp4', old_time)
+
+    with app.app_context():
+        db.session.add(DetectionHistory(
+            filename='cached.mp4', original_video_path=cached_original,
+            result_video_path=cached_result, cache_key='a' * 64
+        ))
+        expired = DetectionHistory(
+            filename='expired.mp4', original_video_path=expired_original,
+            result_video_path=expired_result, cache_key='b' * 64,
+            processed_at=datetime.utcnow() - timedelta(days=30)
+        )
+        db.session.add(expired)
+        db.session.commit()
+
+        summary = enforce_retention()
+
+        # Baris yang kedaluwarsa diarsipkan, tidak dibiarkan menunjuk ke file yang hilang
+        assert summary['indexed'] == 2 and summary['archived'] == 1 and summary['orphans'] == 1
+        assert expired.cache_key is None and expired.archived_at is not None
+        assert expired.artifacts == []
+        assert find_cached_detection('a' * 64) is not None
+        data = client.get('/history', headers={'Accept': 'application/json'}).get_json()
+        assert [d['archived'] for d in data['detections']] == [False, True]
+        assert b'diarsipkan' in client.get(f'/view/{expired.id}').data
+
+        # Putaran berikutnya memakai indeks (tanpa mengindeks ulang)
+        assert enforce_retention()['indexed'] == 0
+
     assert not os.path.exists(old_file)
     assert os.path.exists(new_file)
-    
-    # Cleanup
-    shutil.rmtree(temp_dir)
+    assert os.path.exists(cached_original) and os.path.exists(cached_result)
+    assert not os.path.exists(expired_original) and not os.path.exists(expired_result)
+
+def test_retention_enforces_size_quota(client):
+    temp_dir = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        for i in range(3):
+            path = os.path.join(temp_dir, f'video_{i}.mp4')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            db.session.add(DetectionHistory(
+                filename=f'video_{i}.mp4', original_video_path=path, cache_key=str(i) * 64,
+                processed_at=datetime.utcnow() - timedelta(minutes=10 - i)
+            ))
+        db.session.commit()
+
+        with patch.dict(app.config, {'CACHE_MAX_BYTES': 250}):
+            enforce_retention()
+
+        archived = [d.filename for d in DetectionHistory.query.filter(DetectionHistory.archived_at.isnot(None))]
+        assert archived == ['video_0.mp4']
+
+    # Entri yang paling lama tidak dipakai dihapus lebih dulu
+    assert not os.path.exists(os.path.join(temp_dir, 'video_0.mp4'))
+    assert os.path.exists(os.path.join(temp_dir, 'video_1.mp4'))
+    assert os.path.exists(os.path.join(temp_dir, 'video_2.mp4'))
+
+def test_duplicate_uploads_share_storage(client):
+    content = b'same video content'
+    with patch('app.enqueue_detection_job') as mock_enqueue:
+        for name in ('first.mp4', 'second.mp4'):
+            data = {'file': (BytesIO(content), name)}
+            client.post('/', data=data, content_type='multipart/form-data')
+    assert mock_enqueue.call_count == 2
+
+    first, second = (os.path.join(app.config['UPLOAD_FOLDER'], name) for name in ('first.mp4', 'second.mp4'))
+    assert os.path.samefile(first, second)  # Satu isi di disk
+    assert os.stat(first).st_nlink == 3  # Dua upload + objek content store
+
+    # Upload ulang dengan nama yang sama tidak menimpa isi yang dipakai file lain
+    with patch('app.enqueue_detection_job'):
+        client.post('/', data={'file': (BytesIO(b'other content'), 'first.mp4')}, content_type='multipart/form-data')
+    for path in (first, second):
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+    # Objek yang tidak lagi dipakai dihapus retensi
+    os.remove(first)
+    os.remove(second)
+    with app.app_context():
+        enforce_retention()
+    objects = os.path.join(app.config['UPLOAD_FOLDER'], 'objects')
+    assert sum(len(files) for _, _, files in os.walk(objects)) == 1
 
 def test_index_get(client):
     response = client.get('/')
@@ -84,11 +184,11 @@ def test_index_post_invalid_extension(mock_model, client):
     # This should fail silently because it never gets to an error message
     # as the file is not in allowed_extensions
 
-@patch('app.convert_video_for_browser', return_value=True)
+@patch.dict('app.app.config', {'JOBS_INLINE': True})
 @patch('app.cv2.VideoCapture')
-@patch('app.cv2.VideoWriter')
+@patch('app.FFmpegVideoWriter')
 @patch('app.model')
-def test_index_post_valid_file(mock_model, mock_writer, mock_capture, mock_convert, client):
+def test_index_post_valid_file(mock_model, mock_writer, mock_capture, client):
     # This test would need extensive mocking of cv2, os, and other components
     # Here's a simplified version that doesn't test the full video processing
     
@@ -96,11 +196,12 @@ def test_index_post_valid_file(mock_model, mock_writer, mock_capture, mock_conve
     mock_capture_instance = MagicMock()
     mock_capture_instance.isOpened.return_value = True
     mock_capture_instance.get.side_effect = lambda x: 640 if x == 3 else 480 if x == 4 else 30.0
-    mock_capture_instance.read.side_effect = [(True, MagicMock()), (False, None)]
+    mock_capture_instance.read.side_effect = [(True, np.zeros((480, 640, 3), dtype=np.uint8)), (False, None)]
     mock_capture.return_value = mock_capture_instance
     
     mock_writer_instance = MagicMock()
     mock_writer_instance.isOpened.return_value = True
+    mock_writer_instance.release.return_value = True
     mock_writer.return_value = mock_writer_instance
     
     # Mock the model results
@@ -122,4 +223,811 @@ def test_index_post_valid_file(mock_model, mock_writer, mock_capture, mock_conve
         
         assert response.status_code == 200
         # Check that processing was successful
-        assert b'result_test.mp4' in response.data
\ No newline at end of file
+        assert b'result_test.mp4' in response.data
+
+@patch('app.model')
+def test_detect_violence_batch(mock_model):
+    # Satu pemanggilan model untuk seluruh batch, hasil dipetakan sesuai urutan frame
+    def make_result(confidences):
+        result = MagicMock()
+        result.boxes.__len__.return_value = len(confidences)
+        result.boxes.conf.cpu.return_value.numpy.return_value = confidences
+        return result
+
+    results = [make_result([0.9]), make_result([]), make_result([0.1, 0.4])]
+    mock_model.return_value = results
+    frames = [MagicMock(), MagicMock(), MagicMock()]
+
+    detections = detect_violence_batch(frames)
+
+    mock_model.assert_called_once()
+    assert mock_model.call_args[0][0] == frames
+    assert [result for result, _ in detections] == results
+    assert [conf for _, conf in detections] == [0.9, None, 0.4]
+    assert detect_violence_batch([]) == []
+
+def test_detect_violence_batch_regions(client):
+    import torch
+    from ultralytics.engine.results import Results
+    from app import inference_region
+
+    calls = []
+
+    def fake_model(inputs, **kwargs):
+        # Setiap input mendapat satu kotak di pojok kiri atas input tersebut
+        calls.append([image.shape[:2] for image in inputs])
+        return [Results(image, path='', names={1: 'violence'}, boxes=torch.tensor([[0.0, 0.0, 20.0, 20.0, 0.9, 1.0]]))
+                for image in inputs]
+
+    frames = [np.zeros((720, 1280, 3), dtype=np.uint8), np.zeros((720, 1280, 3), dtype=np.uint8)]
+    settings = {'TILE_ROOMS': ['D404'], 'TILE_SIZE': 640, 'TILE_OVERLAP': 0.2,
+                'ROI_ROOMS': {'D405': [(0.5, 0.5, 1.0, 1.0)]}}
+    with app.app_context(), patch.dict('app.app.config', settings), patch('app.model', side_effect=fake_model):
+        assert inference_region('D406') is None
+        tiled, roi = inference_region('D404'), inference_region('D405')
+        assert compute_cache_key('abc', 'D404') != compute_cache_key('abc')
+        assert compute_cache_key('abc', 'D405') != compute_cache_key('abc', 'D404')
+
+        detections = detect_violence_batch(frames, regions=[tiled, roi])
+
+    # Tile, crop utuh, dan crop ROI dalam satu pemanggilan model
+    assert len(calls) == 1 and len(calls[0]) == len(tiled.windows(1280, 720)) + 1
+    assert calls[0][-1] == (360, 640)
+    (tiled_result, tiled_conf), (roi_result, roi_conf) = detections
+    assert tiled_result.orig_shape == (720, 1280) and tiled_conf == pytest.approx(0.9)
+    assert [640.0, 360.0, 660.0, 380.0] in roi_result.boxes.xyxy.tolist()
+    assert len(roi_result.boxes) == 1
+
+def test_index_post_enqueues_job(client):
+    response = client.post('/', data={
+        'file': (BytesIO(b'fake video content'), 'test.mp4')
+    }, content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data['status'] == 'queued'
+    assert data['filename'] == 'test.mp4'
+
+    # Halaman HTML menampilkan ID job untuk dipantau
+    response = client.post('/', data={
+        'file': (BytesIO(b'fake video content'), 'test.mp4')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert b'job-status' in response.data
+
+    progress = client.get(f"/jobs/{data['job_id']}/progress").get_json()
+    assert progress == {'job_id': data['job_id'], 'status': 'queued', 'progress': 0.0}
+    assert client.get('/jobs/unknown').status_code == 404
+
+def test_same_named_uploads_keep_their_own_files(client):
+    rng = np.random.default_rng(0)
+    contents = []
+    for _ in range(2):
+        source = os.path.join(tempfile.mkdtemp(), 'source.mp4')
+        writer = FFmpegVideoWriter(source, 10.0, (64, 48), preset='ultrafast')
+        for _ in range(10):
+            writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+        writer.release()
+        with open(source, 'rb') as f:
+            contents.append(f.read())
+        shutil.rmtree(os.path.dirname(source))
+
+    job_ids = []
+    for content in contents:
+        response = client.post('/', data={'file': (BytesIO(content), 'D404_11-06-25_11-00.mp4')},
+                               content_type='multipart/form-data', headers={'Accept': 'application/json'})
+        job_ids.append(response.get_json()['job_id'])
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, None))
+        return results
+
+    with app.app_context(), patch('app.detect_violence_batch', side_effect=fake_batch):
+        while (job := claim_next_job()) is not None:
+            run_job(job)
+        jobs = [db.session.get(DetectionJob, job_id) for job_id in job_ids]
+        assert [job.status for job in jobs] == ['completed', 'completed']
+        # Upload kedua tidak menimpa input maupun hasil upload pertama
+        for job, content in zip(jobs, contents):
+            detection = job.detection
+            assert detection.room == 'D404'
+            with open(detection.original_video_path, 'rb') as f:
+                assert f.read() == content
+            assert os.path.getsize(detection.result_video_path) > 0
+        assert len({job.detection.result_video_path for job in jobs}) == 2
+
+def test_claim_and_run_job(client):
+    with app.app_context():
+        detection = DetectionHistory(filename='test.mp4', violence_detected=True)
+        db.session.add(detection)
+        db.session.commit()
+        first = DetectionJob(filename='test.mp4', filepath='/tmp/test.mp4')
+        db.session.add(first)
+        db.session.commit()
+
+        job = claim_next_job()
+        assert job.id == first.id
+        assert job.status == 'running'
+        # Tidak ada job lain di antrian
+        assert claim_next_job() is None
+
+        with patch('app.process_video', return_value=detection) as mock_process:
+            run_job(job)
+        mock_process.assert_called_once()
+        assert job.status == 'completed'
+        assert job.progress == 100.0
+        assert job.detection_id == detection.id
+
+        failing = DetectionJob(filename='bad.mp4', filepath='/tmp/bad.mp4')
+        db.session.add(failing)
+        db.session.commit()
+        job = claim_next_job()
+        with patch('app.process_video', side_effect=VideoProcessingError('Error opening video')):
+            run_job(job)
+        assert job.status == 'failed'
+        assert job.error == 'Error opening video'
+
+        first_id, detection_id = first.id, detection.id
+
+    status = client.get(f'/jobs/{first_id}').get_json()
+    assert status['view_url'] == f'/view/{detection_id}'
+
+def test_index_post_returns_cached_result(client):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    content = b'same video content'
+    with app.app_context():
+        cache_key = compute_cache_key(hashlib.sha256(content).hexdigest())
+        for name in ('first.mp4', 'result_first.mp4'):
+            with open(os.path.join(upload_folder, name), 'wb') as f:
+                f.write(content)
+        db.session.add(DetectionHistory(
+            filename='first.mp4', violence_detected=True, cache_key=cache_key,
+            original_video_path=os.path.join(upload_folder, 'first.mp4'),
+            result_video_path=os.path.join(upload_folder, 'result_first.mp4')
+        ))
+        db.session.commit()
+
+    with patch('app.process_video') as mock_process:
+        response = client.post('/', data={
+            'file': (BytesIO(content), 'second.mp4')
+        }, content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+    mock_process.assert_not_called()
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'completed'
+    assert data['stats'] == {'cache_hit': True}
+    # Upload duplikat tidak disimpan dua kali
+    assert not os.path.exists(os.path.join(upload_folder, 'second.mp4'))
+
+    response = client.post('/', data={
+        'file': (BytesIO(content), 'third.mp4')
+    }, content_type='multipart/form-data')
+    assert b'result_first.mp4' in response.data
+    assert b'Kekerasan Terdeteksi' in response.data
+
+def test_metrics_endpoint(client):
+    from app import metrics
+    metrics.inc('sintesa_frames_total', result='processed')
+    with metrics.timer('sintesa_stage_seconds', stage='decode'):
+        pass
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'sintesa_frames_total{result="processed"}' in text
+    assert 'sintesa_stage_seconds_count{stage="decode"}' in text
+
+def test_models_endpoint(client):
+    from app import model_registry
+
+    version = model_registry.version()
+    with app.app_context():
+        for violent in (True, False, True):
+            db.session.add(DetectionHistory(filename='a.mp4', violence_detected=violent, model_version=version))
+        db.session.commit()
+        # Versi model menjadi bagian dari kunci cache
+        assert compute_cache_key('abc') == compute_cache_key('abc', model_version=version)
+        assert compute_cache_key('abc', model_version='candidate:000000000000') != compute_cache_key('abc')
+
+    models = client.get('/models').get_json()
+    assert [(m['name'], m['version'], m['default']) for m in models] == [('default', version, True)]
+    assert models[0]['usage'] == {version: {'detections': 3, 'violence_detected': 2}}
+    assert client.post('/models/unknown/reload').status_code == 404
+
+def test_stream_sources_api(client):
+    response = client.post('/streams', json={'url': 'rtsp://camera/d404', 'room': 'D404'})
+    assert response.status_code == 201
+    source = response.get_json()
+    assert source['name'] == 'D404'
+    assert source['enabled'] is True
+
+    assert client.post('/streams', json={'room': 'D404'}).status_code == 400
+    assert client.post('/streams', json={'url': 'rtsp://camera/d405', 'roi': '0 0 1'}).status_code == 400
+    assert [s['id'] for s in client.get('/streams').get_json()] == [source['id']]
+
+    response = client.delete(f"/streams/{source['id']}")
+    assert response.get_json()['enabled'] is False
+    assert client.get('/streams/999').status_code == 404
+
+def test_save_stream_segment(client):
+    from app import StreamSource, save_stream_segment
+    from streaming import Segment
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        source = StreamSource(name='Kamera D404', url='rtsp://camera/d404', room='D404')
+        db.session.add(source)
+        db.session.commit()
+
+        filename = 'D404_16-10-26_11-00-05.mp4'
+        segment = Segment(source.id, filename, os.path.join(upload_folder, filename),
+                          os.path.join(upload_folder, f'result_{filename}'), datetime(2026, 10, 16, 11, 0, 5))
+        segment.ok = True
+        segment.frames = 50
+        segment.detections = 2
+        segment.confidence_sum = 1.4
+        segment.peak_confidence = 0.8
+        segment.first_detection_frame, segment.last_detection_frame, segment.peak_frame = 26, 50, 30
+        segment.screenshot = np.zeros((48, 64, 3), dtype=np.uint8)
+        for path in (segment.raw_path, segment.result_path):
+            with open(path, 'wb') as f:
+                f.write(b'segment')
+
+        with patch('app.send_violence_alert') as mock_alert:
+            detection = save_stream_segment(segment)
+
+        mock_alert.assert_called_once()
+        assert mock_alert.call_args[0][3] is detection.events[0]
+        assert detection.room == 'D404'
+        assert detection.detection_date == '16 October 2026'
+        assert detection.detection_time == '11:00 WIB'
+        assert detection.stream_source_id == source.id
+        event = detection.events[0]
+        assert (event.start_time, event.end_time) == (1.0, 2.0)  # 25 fps
+        assert abs(event.mean_confidence - 0.7) < 1e-9
+        assert os.path.exists(detection.screenshot_path)
+        assert os.path.exists(detection.poster_path)
+
+        assert {a.kind for a in detection.artifacts} == {'original', 'result', 'screenshot', 'poster'}
+
+        # Segmen kamera tidak dianggap file yatim dan tidak kedaluwarsa
+        old = time.time() - 7200
+        for path in detection.artifact_paths():
+            os.utime(path, (old, old))
+        detection.processed_at = datetime.utcnow() - timedelta(days=30)
+        db.session.commit()
+        enforce_retention()
+        assert detection.archived_at is None
+        assert all(os.path.exists(p) for p in detection.artifact_paths())
+
+def test_history_keyset_pagination_and_filters(client):
+    with app.app_context():
+        base = datetime(2025, 6, 1, 8, 0)
+        for i in range(5):
+            db.session.add(DetectionHistory(
+                filename=f'D404_0{i + 1}-06-25_08-00.mp4', room='D404' if i % 2 == 0 else 'D405',
+                recorded_at=base + timedelta(days=i), processed_at=base + timedelta(days=i, hours=1),
+                violence_detected=i < 2
+            ))
+        db.session.commit()
+
+    headers = {'Accept': 'application/json'}
+    page = client.get('/history?limit=2', headers=headers).get_json()
+    assert [d['filename'][:8] for d in page['detections']] == ['D404_05-', 'D404_04-']
+    seen = [d['id'] for d in page['detections']]
+    while page['next_url']:
+        page = client.get(page['next_url'], headers=headers).get_json()
+        seen.extend(d['id'] for d in page['detections'])
+    assert len(seen) == len(set(seen)) == 5
+
+    page = client.get('/history?room=D404&date_from=2025-06-02&date_to=2025-06-05', headers=headers).get_json()
+    assert [d['recorded_at'] for d in page['detections']] == ['2025-06-05T08:00:00', '2025-06-03T08:00:00']
+
+    page = client.get('/history?verdict=violence', headers=headers).get_json()
+    assert all(d['violence_detected'] for d in page['detections'])
+    assert len(page['detections']) == 2
+
+    assert client.get('/history?cursor=bogus', headers=headers).status_code == 400
+
+    response = client.get('/history?limit=2')
+    assert response.status_code == 200
+    assert b'Muat lebih banyak' in response.data
+
+def test_chunked_upload_resume_and_checksum(client):
+    content = os.urandom(300_000)
+    response = client.post('/uploads', json={
+        'filename': 'D404_11-06-25_11-00.mp4', 'size': len(content),
+        'sha256': hashlib.sha256(content).hexdigest()
+    })
+    assert response.status_code == 201
+    upload_url = response.headers['Location']
+
+    # Chunk pertama, lalu chunk dengan offset salah (mis. setelah koneksi putus)
+    response = client.put(upload_url, data=content[:100_000], headers={'Upload-Offset': '0'})
+    assert response.headers['Upload-Offset'] == '100000'
+    response = client.put(upload_url, data=content[150_000:], headers={'Upload-Offset': '150000'})
+    assert response.status_code == 409
+
+    # Lanjutkan dari offset yang dilaporkan server
+    offset = client.head(upload_url).headers['Upload-Offset']
+    response = client.put(upload_url, data=content[int(offset):], headers={'Upload-Offset': offset})
+    data = response.get_json()
+    assert data['status'] == 'complete'
+    assert data['job_id']
+
+    with app.app_context():
+        job = db.session.get(DetectionJob, data['job_id'])
+        assert job.status == 'queued'
+        assert job.content_hash == hashlib.sha256(content).hexdigest()
+        with open(job.filepath, 'rb') as f:
+            assert f.read() == content
+
+def test_chunked_upload_checksum_mismatch(client):
+    content = b'x' * 1000
+    upload_url = client.post('/uploads', json={
+        'filename': 'test.mp4', 'size': len(content), 'sha256': '0' * 64
+    }).headers['Location']
+
+    data = client.put(upload_url, data=content, headers={'Upload-Offset': '0'}).get_json()
+
+    assert data['status'] == 'failed'
+    assert data['error'] == 'Checksum mismatch'
+    assert data['job_id'] is None
+    assert client.put(upload_url, data=b'x', headers={'Upload-Offset': '1000'}).status_code == 409
+    assert client.post('/uploads', json={'filename': 'test.txt', 'size': 10}).status_code == 400
+
+def test_chunked_uploads_with_same_name_do_not_share_files(client):
+    from app import UploadSession
+
+    first_url = client.post('/uploads', json={'filename': 'cctv.mp4', 'size': 10}).headers['Location']
+    client.put(first_url, data=b'first', headers={'Upload-Offset': '0'})
+    # Upload kedua dengan nama yang sama tidak memotong file upload pertama yang masih aktif
+    second_url = client.post('/uploads', json={'filename': 'cctv.mp4', 'size': 10}).headers['Location']
+    client.put(second_url, data=b'second', headers={'Upload-Offset': '0'})
+
+    with app.app_context():
+        first, second = (db.session.get(UploadSession, url.rsplit('/', 1)[1]) for url in (first_url, second_url))
+        assert first.filepath != second.filepath
+        with open(first.filepath, 'rb') as f:
+            assert f.read() == b'first'
+
+        # Input job yang masih antri juga tidak ditimpa
+        job_path = os.path.join(app.config['UPLOAD_FOLDER'], 'queued.mp4')
+        with open(job_path, 'wb') as f:
+            f.write(b'queued')
+        db.session.add(DetectionJob(filename='queued.mp4', filepath=job_path))
+        db.session.commit()
+    third_url = client.post('/uploads', json={'filename': 'queued.mp4', 'size': 10}).headers['Location']
+    with app.app_context():
+        assert db.session.get(UploadSession, third_url.rsplit('/', 1)[1]).filepath != job_path
+    with open(job_path, 'rb') as f:
+        assert f.read() == b'queued'
+
+def test_chunked_upload_starts_progressive_job(client):
+    rng = np.random.default_rng(0)
+    source = os.path.join(app.config['UPLOAD_FOLDER'], 'source.mp4')
+    writer = FFmpegVideoWriter(source, 25.0, (160, 120), preset='ultrafast')
+    for _ in range(30):
+        writer.write(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8))
+    writer.release()
+    with open(source, 'rb') as f:
+        content = f.read()
+
+    with patch.dict('app.app.config', {'UPLOAD_PROGRESSIVE_MIN_BYTES': 1024}):
+        upload_url = client.post('/uploads', json={'filename': 'cctv.mp4', 'size': len(content)}).headers['Location']
+        data = client.put(upload_url, data=content[:len(content) // 2], headers={'Upload-Offset': '0'}).get_json()
+    assert data['status'] == 'uploading'
+    assert data['job_id']  # Deteksi sudah diantrikan sebelum upload selesai
+
+    data = client.put(upload_url, data=content[len(content) // 2:],
+                      headers={'Upload-Offset': str(len(content) // 2)}).get_json()
+    assert data['status'] == 'complete'
+
+    with app.app_context():
+        job = db.session.get(DetectionJob, data['job_id'])
+        detection = DetectionHistory(filename='cctv.mp4')
+        with patch('app.process_video', return_value=detection) as mock_process:
+            run_job(job)
+        assert mock_process.call_args.kwargs['commit'] is False
+        assert job.status == 'completed'
+        assert job.content_hash == hashlib.sha256(content).hexdigest()
+        assert detection.id and detection.cache_key
+
+def test_progressive_job_discards_failed_upload(client):
+    rng = np.random.default_rng(0)
+    source = os.path.join(app.config['UPLOAD_FOLDER'], 'source.mp4')
+    writer = FFmpegVideoWriter(source, 25.0, (160, 120), preset='ultrafast')
+    for _ in range(30):
+        writer.write(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8))
+    writer.release()
+    with open(source, 'rb') as f:
+        content = f.read()
+
+    with patch.dict('app.app.config', {'UPLOAD_PROGRESSIVE_MIN_BYTES': 1024}):
+        upload_url = client.post('/uploads', json={'filename': 'cctv.mp4', 'size': len(content),
+                                                   'sha256': '0' * 64}).headers['Location']
+        client.put(upload_url, data=content[:len(content) // 2], headers={'Upload-Offset': '0'})
+    data = client.put(upload_url, data=content[len(content) // 2:],
+                      headers={'Upload-Offset': str(len(content) // 2)}).get_json()
+    assert data['status'] == 'failed'
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, 0.9))
+        return results
+
+    with app.app_context(), \
+            patch('app.detect_violence_batch', side_effect=fake_batch), \
+            patch('app.send_violence_alert') as mock_alert:
+        job = db.session.get(DetectionJob, data['job_id'])
+        run_job(job)
+        # Checksum tidak cocok: tidak ada riwayat, notifikasi maupun file hasil yang tertinggal
+        assert job.status == 'failed'
+        assert DetectionHistory.query.count() == 0
+        mock_alert.assert_not_called()
+    assert not any(name.startswith(('result_', 'detections_', 'poster_'))
+                   for name in os.listdir(app.config['UPLOAD_FOLDER']))
+
+def test_process_video_segments_events(client):
+    from app import process_video, model_registry
+
+    rng = np.random.default_rng(0)
+    filename = 'D404_11-06-25_11-00.mp4'
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    writer = FFmpegVideoWriter(filepath, 10.0, (64, 48), preset='ultrafast')
+    for _ in range(60):
+        writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    # Frame 11-25 dan 51-60 berisi kekerasan; frame 5 deteksi palsu satu frame
+    violent = set(range(11, 26)) | set(range(51, 61)) | {5}
+    inferred = []
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            inferred.append(True)
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, 0.8 if len(inferred) in violent else None))
+        return results
+
+    stats = {}
+    with app.app_context(), \
+            patch.dict('app.app.config', {'FRAME_SAMPLING': 'fixed', 'SAMPLER_MIN_STRIDE': 1}), \
+            patch('app.detect_violence_batch', side_effect=fake_batch), \
+            patch('app.send_violence_alert') as mock_alert:
+        detection = process_video(filepath, filename, stats=stats)
+
+        assert detection.violence_detected
+        assert [(e.start_frame, e.end_frame) for e in detection.events] == [(11, 25), (51, 60)]
+        assert detection.events[0].start_time == 1.0 and detection.events[0].end_time == 2.5
+        assert stats['events'] == 2 and stats['frames_detected'] == 26
+        assert detection.model_version == stats['model_version'] == model_registry.version()
+        assert mock_alert.call_count == 2  # Satu notifikasi per kejadian
+        assert all(os.path.exists(e.screenshot_path) for e in detection.events)
+        assert detection.screenshot_path == detection.events[0].screenshot_path
+        assert cv2.imread(detection.poster_path).shape == (48, 64, 3)
+        assert is_streamable(detection.preview_path)
+
+        data = client.get('/history', headers={'Accept': 'application/json'}).get_json()
+        assert len(data['detections'][0]['events']) == 2
+        assert data['detections'][0]['poster_url'] == '/static/uploads/poster_D404_11-06-25_11-00.jpg'
+        response = client.get(f'/view/{detection.id}')
+        assert b'00:01 - 00:02' in response.data
+        assert f'/{detection.preview_path}'.encode() in response.data
+
+def test_preprocess_rooms(client):
+    from app import process_video
+
+    filename = 'D404_11-06-25_11-00.mp4'
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    writer = FFmpegVideoWriter(filepath, 10.0, (128, 96), preset='ultrafast')
+    for _ in range(10):
+        writer.write(np.full((96, 128, 3), 40, dtype=np.uint8))
+    writer.release()
+
+    def fake_batch(frames, originals=None, **kwargs):
+        # Model menerima frame yang sudah diperkecil ke PREPROCESS_TARGET_SIZE
+        assert all(frame.shape == (48, 64, 3) for frame in frames)
+        assert all(original.shape == (96, 128, 3) for original in originals)
+        results = []
+        for original in originals:
+            result = MagicMock()
+            result.plot.return_value = original
+            results.append((result, None))
+        return results
+
+    stats = {}
+    settings = {'FRAME_SAMPLING': 'fixed', 'PREPROCESS_ROOMS': ['D404'], 'PREPROCESS_TARGET_SIZE': 64}
+    with app.app_context(), patch.dict('app.app.config', settings), \
+            patch('app.detect_violence_batch', side_effect=fake_batch):
+        # Hanya ruangan yang diaktifkan yang memakai preprocessing dan kunci cache terpisah
+        assert compute_cache_key('abc', 'D404') != compute_cache_key('abc')
+        assert compute_cache_key('abc', 'D405') == compute_cache_key('abc')
+
+        detection = process_video(filepath, filename, stats=stats)
+        assert not detection.violence_detected
+
+    assert stats['preprocess'] is True
+    assert stats['frames_total'] == 10
+
+def test_sharded_processing_matches_single_pass(client):
+    import cv2
+    from concurrent.futures import ThreadPoolExecutor
+    from app import process_video
+
+    # Nomor frame dikodekan sebagai kecerahan agar deteksi tidak bergantung urutan pemanggilan model
+    source = os.path.join(app.config['UPLOAD_FOLDER'], 'source.mp4')
+    writer = FFmpegVideoWriter(source, 10.0, (64, 48), preset='ultrafast', crf=10)
+    for i in range(1, 121):
+        writer.write(np.full((48, 64, 3), i * 2, dtype=np.uint8))
+    writer.release()
+
+    # Kejadian frame 35-45 melewati batas shard pertama (frame 40)
+    violent = set(range(35, 46)) | set(range(90, 101))
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, 0.8 if round(frame.mean() / 2) in violent else None))
+        return results
+
+    def run(filename, **config):
+        shutil.copy(source, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        stats = {}
+        settings = {'FRAME_SAMPLING': 'fixed', 'SAMPLER_MIN_STRIDE': 2, **config}
+        with patch.dict('app.app.config', settings), \
+                patch('app.detect_violence_batch', side_effect=fake_batch), \
+                patch('app.send_violence_alert'), \
+                patch('app.get_shard_executor', return_value=ThreadPoolExecutor(3)):
+            detection = process_video(os.path.join(app.config['UPLOAD_FOLDER'], filename), filename, stats=stats)
+        events = [(e.start_frame, e.end_frame, e.peak_confidence) for e in detection.events]
+        frames = []
+        for path in (detection.result_video_path, detection.preview_path):
+            cap = cv2.VideoCapture(path)
+            frames.append(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+            cap.release()
+        return events, stats, frames
+
+    with app.app_context():
+        single = run('single.mp4')
+        sharded = run('sharded.mp4', SHARD_PROCESSES=3, SHARD_MIN_SECONDS=2.0)
+
+    assert sharded[1].pop('shards') == 3
+    assert single == sharded
+    assert len(single[0]) == 2
+    assert single[0][0][0] < 40 < single[0][0][1]  # Tidak terpecah di batas shard
+    assert single[2] == [120, 120]  # Video hasil dan preview
+    assert not [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if '.part' in f]
+
+def test_uploaded_file_supports_range_and_etag(client):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], 'result_range.mp4')
+    with open(path, 'wb') as f:
+        f.write(bytes(range(256)) * 4)
+
+    response = client.get('/static/uploads/result_range.mp4', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 100-199/1024'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.data == (bytes(range(256)) * 4)[100:200]
+
+    response = client.get('/static/uploads/result_range.mp4')
+    assert response.status_code == 200 and response.mimetype == 'video/mp4'
+    response = client.get('/static/uploads/result_range.mp4', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    cv2.imwrite(os.path.join(app.config['UPLOAD_FOLDER'], 'poster_range.jpg'), np.zeros((8, 8, 3), dtype=np.uint8))
+    assert client.get('/static/uploads/poster_range.jpg').mimetype == 'image/jpeg'
+
+def test_ingest_command_skips_analyzed_files(client):
+    source_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    for name in ('D404_11-06-25_11-00.mp4', 'D404_11-06-25_12-00.mp4', 'D405_11-06-25_11-00.mp4'):
+        writer = FFmpegVideoWriter(os.path.join(source_dir, name), 10.0, (64, 48), preset='ultrafast')
+        for _ in range(20):
+            writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+        writer.release()
+    # Isi yang sama dengan nama lain hanya diproses sekali
+    shutil.copy(os.path.join(source_dir, 'D405_11-06-25_11-00.mp4'), os.path.join(source_dir, 'copy.mp4'))
+    with open(os.path.join(source_dir, 'notes.txt'), 'w') as f:
+        f.write('not a video')
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, 0.8))
+        return results
+
+    runner = app.test_cli_runner()
+    try:
+        with patch.dict('app.app.config', {'FRAME_SAMPLING': 'fixed', 'SAMPLER_MIN_STRIDE': 1}), \
+                patch('app.detect_violence_batch', side_effect=fake_batch), \
+                patch('app.send_violence_alert') as mock_alert:
+            result = runner.invoke(args=['ingest', source_dir, '--workers', '2', '--commit-every', '2'])
+            assert result.exit_code == 0, result.output
+            assert 'Files: 4 found, 3 processed, 1 skipped (already analyzed), 0 failed' in result.output
+            assert 'Violence: 3 video(s), 3 event(s)' in result.output
+            mock_alert.assert_not_called()
+
+            # Dijalankan ulang: semua file sudah ada di riwayat
+            result = runner.invoke(args=['ingest', source_dir])
+            assert 'Files: 4 found, 0 processed, 4 skipped (already analyzed), 0 failed' in result.output
+
+        with app.app_context():
+            detections = DetectionHistory.query.order_by(DetectionHistory.filename).all()
+            assert [d.room for d in detections] == ['D404', 'D404', 'D405']
+            assert all(d.cache_key and os.path.exists(d.original_video_path) for d in detections)
+        # File sumber tidak diubah
+        assert len(os.listdir(source_dir)) == 5
+    finally:
+        shutil.rmtree(source_dir)
+
+def test_ingest_command_keeps_same_named_files_apart(client):
+    source_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    for camera in ('cam1', 'cam2'):
+        os.makedirs(os.path.join(source_dir, camera))
+        writer = FFmpegVideoWriter(os.path.join(source_dir, camera, 'D404_11-06-25_11-00.mp4'), 10.0, (64, 48),
+                                   preset='ultrafast')
+        for _ in range(20):
+            writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+        writer.release()
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            result = MagicMock()
+            result.plot.return_value = frame
+            results.append((result, None))
+        return results
+
+    try:
+        with patch('app.detect_violence_batch', side_effect=fake_batch):
+            result = app.test_cli_runner().invoke(args=['ingest', source_dir, '--recursive', '--workers', '2'])
+        assert 'Files: 2 found, 2 processed, 0 skipped (already analyzed), 0 failed' in result.output
+
+        with app.app_context():
+            detections = DetectionHistory.query.all()
+            # Nama sama dari subfolder berbeda tidak saling menimpa; metadata tetap terbaca
+            assert len({d.original_video_path for d in detections}) == 2
+            assert len({d.result_video_path for d in detections}) == 2
+            for detection in detections:
+                with open(detection.original_video_path, 'rb') as f:
+                    assert hashlib.sha256(f.read()).hexdigest() == detection.content_hash
+            assert [d.room for d in detections] == ['D404', 'D404']
+    finally:
+        shutil.rmtree(source_dir)
+
+def test_detect_mode_stores_boxes_and_renders_on_demand(client):
+    import torch
+    from concurrent.futures import ThreadPoolExecutor
+    from ultralytics.engine.results import Results
+    from app import process_video, run_job
+    from detections import StoredDetections
+
+    filename = 'D404_11-06-25_11-00.mp4'
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    writer = FFmpegVideoWriter(filepath, 10.0, (64, 48), preset='ultrafast', crf=10)
+    for i in range(1, 61):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+
+    def fake_batch(frames, **kwargs):
+        results = []
+        for frame in frames:
+            violent = 20 <= round(frame.mean() / 4) <= 35
+            boxes = torch.tensor([[4, 4, 40, 30, 0.8, 1]] if violent else [], dtype=torch.float32).reshape(-1, 6)
+            results.append((Results(frame, path='', names={0: 'normal', 1: 'violence'}, boxes=boxes),
+                            0.8 if violent else None))
+        return results
+
+    stats = {}
+    settings = {'FRAME_SAMPLING': 'fixed', 'SAMPLER_MIN_STRIDE': 1, 'SHARD_PROCESSES': 2, 'SHARD_MIN_SECONDS': 2.0}
+    with app.app_context(), patch.dict('app.app.config', settings), \
+            patch('app.detect_violence_batch', side_effect=fake_batch), \
+            patch('app.send_violence_alert'), \
+            patch('app.get_shard_executor', return_value=ThreadPoolExecutor(2)):
+        content_hash = hashlib.sha256(open(filepath, 'rb').read()).hexdigest()
+        detection = process_video(filepath, filename, stats=stats, content_hash=content_hash, mode='detect')
+
+        # Tanpa video hasil, preview maupun encode; bukti kejadian tetap dibuat
+        assert stats['analysis_mode'] == 'detect' and stats['shards'] == 2
+        assert detection.violence_detected and detection.result_video_path is None
+        assert detection.preview_path is None and os.path.exists(detection.screenshot_path)
+        assert not [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.startswith('result_')]
+
+        stored = StoredDetections.load(detection.detections_path)
+        first = int(stored.frames[0])
+        assert stored.frames.tolist() == list(range(first, first + 16))
+        assert stored.boxes(first + 5).tolist() == [[4, 4, 40, 30, pytest.approx(0.8), 1]]
+        assert len(stored.boxes(5)) == 0 and stored.metadata['fps'] == 10.0
+
+        data = client.get(f'/view/{detection.id}/detections').get_json()
+        assert data['frames'][0]['frame'] == first and data['frames'][0]['time'] == pytest.approx((first - 1) / 10)
+        assert detection.to_dict()['rendered'] is False
+        assert b'Render video hasil' in client.get(f'/view/{detection.id}').data
+
+        # Upload ulang dalam mode full: hasil cache dipakai, hanya render yang diantrikan
+        with open(filepath, 'rb') as f:
+            response = client.post('/?mode=full', data={'file': (BytesIO(f.read()), 'D404_11-06-25_11-00 (1).mp4')},
+                                   headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+        assert response.status_code == 202
+        job = db.session.get(DetectionJob, response.get_json()['job_id'])
+        assert job.mode == 'render' and job.detection_id == detection.id
+
+        with patch('app.detect_violence_batch') as mock_batch:
+            run_job(job)
+        mock_batch.assert_not_called()
+        db.session.refresh(detection)
+        assert job.status == 'completed' and job.stats['frames_annotated'] == 16
+        cap = cv2.VideoCapture(detection.result_video_path)
+        assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 60
+        cap.release()
+        assert is_streamable(detection.preview_path)
+        assert client.post(f'/view/{detection.id}/render').status_code == 409
+
+def test_detect_mode_decodes_sampled_frames_at_reduced_size(client):
+    import torch
+    from ultralytics.engine.results import Results
+    from app import process_video
+    from detections import StoredDetections
+
+    filename = 'D404_11-06-25_11-00.mp4'
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    writer = FFmpegVideoWriter(filepath, 10.0, (64, 48), preset='ultrafast')
+    for _ in range(30):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    shapes = []
+
+    def fake_batch(frames, **kwargs):
+        shapes.extend(frame.shape for frame in frames)
+        boxes = torch.tensor([[2, 2, 20, 12, 0.8, 1]], dtype=torch.float32)
+        return [(Results(frame, path='', names={0: 'normal', 1: 'violence'}, boxes=boxes), 0.8) for frame in frames]
+
+    stats = {}
+    settings = {'FRAME_SAMPLING': 'fixed', 'SAMPLER_MIN_STRIDE': 3, 'DECODE_MAX_WIDTH': 32}
+    with app.app_context(), patch.dict('app.app.config', settings), \
+            patch('app.detect_violence_batch', side_effect=fake_batch), \
+            patch('app.send_violence_alert'):
+        detection = process_video(filepath, filename, stats=stats, mode='detect')
+
+        # Hanya frame sampel yang didecode, pada lebar DECODE_MAX_WIDTH
+        assert shapes == [(24, 32, 3)] * 10
+        assert stats['frames_total'] == 30 and stats['frames_skipped'] == 20
+        # Kotak disimpan dalam koordinat video asli
+        stored = StoredDetections.load(detection.detections_path)
+        assert stored.frames.tolist() == list(range(3, 31, 3))
+        assert stored.boxes(3)[:, :4].tolist() == [[4, 4, 40, 24]]
+        assert stored.metadata['width'] == 64
+
+        # Hanya run yang benar-benar didecode diperkecil yang memasukkan DECODE_MAX_WIDTH ke kunci cache
+        full_key, detect_key = compute_cache_key('abc'), compute_cache_key('abc', mode='detect')
+        with patch.dict('app.app.config', {'DECODE_MAX_WIDTH': 0}):
+            assert compute_cache_key('abc') == full_key
+            assert compute_cache_key('abc', mode='detect') == full_key != detect_key
+
+def test_model_server_requires_authkey(client):
+    from app import create_model_registry, models_command
+
+    with patch.dict('app.app.config', {'MODEL_SERVER': '127.0.0.1:8765', 'MODEL_SERVER_AUTHKEY': b''}):
+        with pytest.raises(RuntimeError):
+            create_model_registry()
+        result = app.test_cli_runner().invoke(models_command)
+        assert result.exit_code != 0 and 'MODEL_SERVER_AUTHKEY' in result.output
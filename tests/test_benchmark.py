@@ -0,0 +1,47 @@
+import cv2
+import pytest
+
+from benchmark import compare_with_baseline, make_synthetic_video, parse_resolutions, summarize
+
+
+def test_summarize_latencies():
+    stats = summarize([0.01, 0.02, 0.03, 0.04], 4)
+
+    assert stats['fps'] == 40.0
+    assert stats['p50_ms'] == pytest.approx(25.0)
+    assert stats['p95_ms'] == pytest.approx(38.5)
+    # Tahap yang hanya diukur total per video tidak punya latensi per frame
+    assert summarize([], 30, total=2.0) == {
+        'frames': 30, 'total_s': 2.0, 'fps': 15.0, 'p50_ms': None, 'p95_ms': None
+    }
+
+def test_make_synthetic_video(tmp_path):
+    path = make_synthetic_video(str(tmp_path / 'synthetic.mp4'), 160, 90, 12)
+
+    cap = cv2.VideoCapture(path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) == 160
+    assert int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == 90
+    frames = 0
+    while cap.read()[0]:
+        frames += 1
+    cap.release()
+    assert frames == 12
+
+def test_compare_with_baseline():
+    def report(decode_fps, inference_fps):
+        return {'runs': [{'video': '640x360_60f', 'stages': {
+            'decode': {'fps': decode_fps},
+            'inference': {'fps': inference_fps},
+        }}]}
+
+    baseline = report(1000.0, 10.0)
+    assert compare_with_baseline(report(950.0, 9.5), baseline, 0.15) == []
+
+    regressions = compare_with_baseline(report(1000.0, 8.0), baseline, 0.15)
+    assert regressions == [{
+        'video': '640x360_60f', 'stage': 'inference',
+        'baseline_fps': 10.0, 'fps': 8.0, 'change': -0.2,
+    }]
+
+def test_parse_resolutions():
+    assert parse_resolutions('640x360,1920X1080') == [(640, 360), (1920, 1080)]
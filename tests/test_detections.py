@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from detections import DetectionRecorder, StoredDetections
+from events import ConfidenceTrack
+
+
+def make_result(frame, boxes):
+    return Results(frame, path='', names={0: 'normal', 1: 'violence'},
+                   boxes=torch.tensor(boxes, dtype=torch.float32).reshape(-1, 6))
+
+def test_save_load_and_annotate_like_results():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    recorder = DetectionRecorder()
+    recorder.append(3, make_result(frame, [[4, 4, 40, 30, 0.8, 1]]))
+    shard = DetectionRecorder()
+    shard.append(7, make_result(frame, [[1, 2, 10, 12, 0.6, 1], [20, 20, 60, 44, 0.9, 0]]))
+    recorder.extend(shard)
+    track = ConfidenceTrack()
+    for frame_index in range(1, 9):
+        track.append(frame_index, 0.8 if frame_index in (3, 7) else None)
+
+    path = os.path.join(tempfile.mkdtemp(), 'detections.npz')
+    recorder.save(path, track, fps=10.0)
+    stored = StoredDetections.load(path)
+
+    assert len(recorder) == 2 and stored.frames.tolist() == [3, 7]
+    assert stored.names == {0: 'normal', 1: 'violence'} and stored.metadata['fps'] == 10.0
+    assert stored.boxes(7)[:, 4].tolist() == np.float32([0.6, 0.9]).tolist()
+    assert len(stored.boxes(5)) == 0 and len(stored.boxes(100)) == 0
+    assert len(stored.track_frames) == 8
+
+    # Render ulang sama dengan anotasi saat analisis
+    expected = make_result(frame, [[4, 4, 40, 30, 0.8, 1]]).plot()
+    assert np.array_equal(stored.annotate(frame, 3), expected)
+    assert stored.annotate(frame, 4) is frame
+    assert stored.to_dict()['frames'][1]['time'] == 0.6
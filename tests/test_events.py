@@ -0,0 +1,75 @@
+import numpy as np
+
+from events import ConfidenceTrack, PeakFrames, hysteresis, segment_events
+
+
+def track_from(confidences, stride=1):
+    track = ConfidenceTrack(capacity=4)
+    for i, conf in enumerate(confidences):
+        track.append((i + 1) * stride, conf)
+    return track
+
+def test_confidence_track_grows():
+    track = track_from([None, 0.5, None, 0.7, 0.6, None])
+
+    assert track.frame_indices.tolist() == [1, 2, 3, 4, 5, 6]
+    assert np.allclose(track.confidences, [0, 0.5, 0, 0.7, 0.6, 0])
+
+def test_hysteresis_holds_between_thresholds():
+    values = np.array([0.1, 0.4, 0.3, 0.25, 0.1, 0.3, 0.5])
+    active = hysteresis(values, enter_threshold=0.35, exit_threshold=0.2)
+
+    # 0.3 dan 0.25 tetap aktif setelah masuk; 0.3 setelah keluar belum cukup untuk masuk lagi
+    assert active.tolist() == [False, True, True, True, False, False, True]
+
+def test_single_frame_false_positive_is_removed():
+    confidences = [0.0] * 20
+    confidences[10] = 0.9
+    track = track_from(confidences)
+
+    assert segment_events(track.frame_indices, track.confidences, fps=10.0) == []
+
+def test_segment_events_intervals():
+    # Kejadian frame 11-30 dengan satu frame kosong di tengahnya, lalu sepi
+    confidences = [0.0] * 10 + [0.6] * 10 + [0.0] + [0.8] * 9 + [0.0] * 20
+    track = track_from(confidences)
+
+    events = segment_events(track.frame_indices, track.confidences, fps=10.0)
+
+    assert len(events) == 1
+    event = events[0]
+    assert (event.start_frame, event.end_frame) == (11, 30)
+    assert event.start_time == 1.0 and event.end_time == 3.0
+    assert event.peak_confidence == np.float32(0.8)
+    assert event.peak_frame == 22
+    assert abs(event.mean_confidence - (0.6 * 10 + 0.8 * 9) / 19) < 1e-6
+
+def test_segment_events_merges_close_intervals_and_drops_short_ones():
+    confidences = [0.0] * 5 + [0.7] * 5 + [0.0] * 10 + [0.7] * 5 + [0.0] * 40 + [0.5] * 3 + [0.0] * 5
+    track = track_from(confidences)
+
+    events = segment_events(track.frame_indices, track.confidences, fps=10.0,
+                            merge_gap=2.0, min_duration=0.5)
+
+    # Dua kejadian berjarak 1 detik digabung; kejadian 0.3 detik di akhir dibuang
+    assert [(e.start_frame, e.end_frame) for e in events] == [(6, 25)]
+
+def test_segment_events_sampled_frames_cover_stride():
+    # Hanya setiap frame ke-4 yang diinferensi; interval mencakup frame di antaranya
+    track = track_from([0.0, 0.8, 0.8, 0.8, 0.0, 0.0], stride=4)
+
+    events = segment_events(track.frame_indices, track.confidences, fps=8.0)
+
+    assert [(e.start_frame, e.end_frame) for e in events] == [(8, 19)]
+
+def test_peak_frames_per_cluster():
+    peaks = PeakFrames(gap_frames=5)
+    peaks.offer(10, 0.5, 'a')
+    peaks.offer(12, 0.9, 'b')
+    peaks.offer(14, 0.6, 'c')
+    peaks.offer(40, 0.4, 'd')
+
+    assert len(peaks.clusters) == 2
+    assert peaks.best(8, 20) == 'b'
+    assert peaks.best(35, 45) == 'd'
+    assert peaks.best(25, 30) is None
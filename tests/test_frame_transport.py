@@ -0,0 +1,66 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from frame_transport import FrameRing, RingFull
+
+
+def make_frame(value, shape=(72, 128, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+def consume(descriptor, frames, queue):
+    # Dijalankan di proses terpisah: baca frame sebagai view lalu lepaskan slotnya
+    ring = FrameRing.attach(*descriptor)
+    for frame in frames:
+        view = ring.view(*frame)
+        queue.put((int(view[0, 0, 0]), view.flags.owndata))
+        del view
+        ring.release(frame[0])
+    ring.close()
+
+def test_put_view_release_reuses_slots():
+    ring = FrameRing.create(2, make_frame(0).nbytes)
+    try:
+        first = ring.put(make_frame(1))
+        second = ring.put(make_frame(2))
+        assert [first[0], second[0]] == [0, 1]
+        with pytest.raises(RingFull):
+            ring.put(make_frame(3), timeout=0.01)
+
+        view = ring.view(*first)
+        assert not view.flags.owndata and int(view[0, 0, 0]) == 1
+        del view
+        ring.release(first[0])
+        # Slot pertama dipakai ulang tanpa alokasi baru
+        third = ring.put(make_frame(3))
+        assert third[0] == 2 and int(ring.view(*third)[0, 0, 0]) == 3
+        assert (ring.written, ring.released) == (3, 1)
+    finally:
+        ring.close()
+
+def test_reserve_writes_in_place():
+    ring = FrameRing.create(2, make_frame(0).nbytes)
+    try:
+        index, view = ring.reserve((72, 128, 3))
+        view[...] = 7  # mis. capture.read(view)
+        ring.commit(index)
+        assert int(ring.view(index, (72, 128, 3), '|u1')[10, 10, 2]) == 7
+        with pytest.raises(ValueError):
+            ring.reserve((720, 1280, 3))
+    finally:
+        ring.close()
+
+def test_frames_cross_process_without_pickling():
+    ring = FrameRing.create(4, make_frame(0).nbytes)
+    try:
+        frames = [ring.put(make_frame(value)) for value in (10, 20, 30)]
+        queue = multiprocessing.get_context('spawn').Queue()
+        process = multiprocessing.get_context('spawn').Process(target=consume, args=(ring.descriptor(), frames, queue))
+        process.start()
+        received = [queue.get(timeout=30) for _ in frames]
+        process.join(30)
+        assert received == [(10, False), (20, False), (30, False)]
+        assert ring.released == 3
+    finally:
+        ring.close()
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+from inference import ExportedModel, load_exported_model, warm_up
+
+
+class FakeExportedModel(ExportedModel):
+    """Backend palsu yang mengembalikan output mentah yang sudah ditentukan"""
+
+    def __init__(self, artifact, output):
+        super().__init__(artifact)
+        self.output = output
+        self.blobs = []
+
+    def _run(self, blob):
+        self.blobs.append(blob)
+        return self.output
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / 'model.onnx'
+    path.write_bytes(b'')
+    with open(f'{path}.json', 'w') as f:
+        json.dump({'names': {'0': 'NonViolence', '1': 'Violence'}, 'imgsz': 64}, f)
+    return str(path)
+
+def make_output(*anchors):
+    # Format output YOLOv8: (batch, 4 + nc, anchors) dengan box xywh di ruang input model
+    output = np.zeros((1, 6, len(anchors)), dtype=np.float32)
+    for i, (xywh, scores) in enumerate(anchors):
+        output[0, :4, i] = xywh
+        output[0, 4:, i] = scores
+    return output
+
+def test_exported_model_postprocess(artifact):
+    output = make_output(
+        ([32, 32, 16, 16], [0.0, 0.9]),   # kekerasan
+        ([33, 32, 16, 16], [0.0, 0.8]),   # overlap -> dibuang NMS
+        ([10, 10, 8, 8], [0.95, 0.0]),    # kelas lain
+        ([50, 50, 8, 8], [0.0, 0.1]),     # di bawah threshold
+    )
+    model = FakeExportedModel(artifact, output)
+    # Frame 128x64 -> gain 0.5, padding vertikal 16 piksel
+    frame = np.zeros((64, 128, 3), dtype=np.uint8)
+
+    results = model([frame], classes=[1], conf=0.25, iou=0.5)
+
+    assert model.blobs[0].shape == (1, 3, 64, 64)
+    assert model.names == {0: 'NonViolence', 1: 'Violence'}
+    boxes = results[0].boxes
+    assert boxes.conf.cpu().numpy().tolist() == pytest.approx([0.9])
+    assert boxes.cls.tolist() == [1.0]
+    assert boxes.xyxy[0].tolist() == pytest.approx([48, 16, 80, 48])
+    assert results[0].plot().shape == frame.shape
+
+def test_warm_up_runs_dummy_batch(artifact):
+    model = FakeExportedModel(artifact, np.zeros((2, 6, 0), dtype=np.float32))
+    warm_up(model, batch_size=2, imgsz=64)
+    assert model.blobs[0].shape == (2, 3, 64, 64)
+
+def test_load_exported_model_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        load_exported_model('model.pt', 'tensorrt')
+
+def test_load_exported_model_names_missing_package():
+    from unittest.mock import patch
+
+    # Paket hilang dilaporkan sebelum export dimulai
+    with patch('inference.importlib.util.find_spec', side_effect=lambda name: None if name == 'onnxruntime' else True), \
+            patch('inference.export_model') as mock_export:
+        with pytest.raises(RuntimeError, match='onnxruntime'):
+            load_exported_model('model.pt', 'onnx')
+    mock_export.assert_not_called()
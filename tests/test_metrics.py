@@ -0,0 +1,66 @@
+import os
+import time
+
+from metrics import Metrics, StartupTimer, load_snapshots, render_prometheus
+
+
+def test_counters_and_histograms_render():
+    metrics = Metrics(buckets=(0.01, 0.1, 1.0))
+    metrics.inc('sintesa_frames_total', result='processed')
+    metrics.inc('sintesa_frames_total', 2, result='processed')
+    metrics.inc('sintesa_frames_total', result='skipped')
+    metrics.observe('sintesa_stage_seconds', 0.05, stage='decode')
+    metrics.observe('sintesa_stage_seconds', 0.5, stage='decode')
+    metrics.observe('sintesa_stage_seconds', 5.0, stage='decode')
+
+    text = render_prometheus([metrics.snapshot()])
+
+    assert '# TYPE sintesa_frames_total counter' in text
+    assert 'sintesa_frames_total{result="processed"} 3' in text
+    assert 'sintesa_frames_total{result="skipped"} 1' in text
+    assert '# TYPE sintesa_stage_seconds histogram' in text
+    assert 'sintesa_stage_seconds_bucket{le="0.01",stage="decode"} 0' in text
+    assert 'sintesa_stage_seconds_bucket{le="0.1",stage="decode"} 1' in text
+    assert 'sintesa_stage_seconds_bucket{le="1.0",stage="decode"} 2' in text
+    assert 'sintesa_stage_seconds_bucket{le="+Inf",stage="decode"} 3' in text
+    assert 'sintesa_stage_seconds_count{stage="decode"} 3' in text
+    assert 'sintesa_stage_seconds_sum{stage="decode"} 5.55' in text
+
+def test_timer_records_duration():
+    metrics = Metrics()
+    with metrics.timer('sintesa_stage_seconds', stage='encode'):
+        pass
+
+    name, labels, histogram = metrics.snapshot()['histograms'][0]
+    assert (name, labels) == ('sintesa_stage_seconds', {'stage': 'encode'})
+    assert histogram['count'] == 1
+
+def test_snapshots_from_other_processes_are_merged(tmp_path):
+    worker = Metrics()
+    worker.inc('sintesa_videos_total', status='completed')
+    worker.flush(str(tmp_path))
+    # Simulasikan snapshot dari proses worker lain
+    os.replace(tmp_path / f'metrics-{os.getpid()}.json', tmp_path / 'metrics-999999.json')
+
+    web = Metrics()
+    web.inc('sintesa_videos_total', status='completed')
+    web.flush(str(tmp_path))
+    web.inc('sintesa_videos_total', status='cached')  # Belum di-flush, tetap ikut lewat snapshot live
+
+    text = render_prometheus(load_snapshots(str(tmp_path), live=web))
+
+    assert 'sintesa_videos_total{status="completed"} 2' in text
+    assert 'sintesa_videos_total{status="cached"} 1' in text
+
+def test_startup_timer_report():
+    startup = StartupTimer()
+    time.sleep(0.01)
+    startup.mark('imports')
+    with startup.phase('model_load'):
+        time.sleep(0.02)
+
+    assert [name for name, _, _ in startup.phases] == ['imports', 'model_load']
+    assert startup.phases[0][1] >= 0.01 and startup.phases[1][1] >= 0.02
+    lines = startup.report().splitlines()
+    assert lines[0].split() == ['phase', 'seconds', 'share', 'rss_mb']
+    assert lines[2].startswith('model_load') and lines[-1].startswith('total')
@@ -0,0 +1,166 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from model_registry import (InferenceServer, ModelRegistry, RegistryModel, RemoteModelRegistry,
+                            parse_address, parse_model_versions, parse_traffic)
+
+
+class FakeModel:
+    """Model palsu: confidence deteksinya dibaca dari isi file bobot"""
+
+    names = {0: 'normal', 1: 'violence'}
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.confidence = float(f.read())
+        self.calls = []
+
+    def __call__(self, frames, **kwargs):
+        self.calls.append(kwargs)
+        boxes = torch.tensor([[1.0, 2.0, 10.0, 20.0, self.confidence, 1.0]])
+        return [Results(frame, path='', names=self.names, boxes=boxes) for frame in frames]
+
+def write_weights(path, confidence):
+    with open(path, 'w') as f:
+        f.write(str(confidence))
+    # mtime baru walaupun ditulis dalam detik yang sama
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    return str(path)
+
+def make_registry(tmp_path, **kwargs):
+    versions = {
+        'default': write_weights(tmp_path / 'default.pt', 0.5),
+        'candidate': write_weights(tmp_path / 'candidate.pt', 0.8),
+    }
+    loaded = []
+
+    def loader(path):
+        loaded.append(path)
+        return FakeModel(path)
+
+    return ModelRegistry(versions, loader, reload_interval=0, **kwargs), loaded
+
+def frames(count=2):
+    return [np.zeros((32, 32, 3), dtype=np.uint8)] * count
+
+def test_parse_settings():
+    assert parse_model_versions('', 'a.pt') == {'default': 'a.pt'}
+    assert parse_model_versions('main=a.pt, next = b.pt', 'x.pt') == {'main': 'a.pt', 'next': 'b.pt'}
+    assert parse_traffic('candidate=0.1') == {'candidate': 0.1}
+    assert parse_address('/tmp/models.sock') == '/tmp/models.sock'
+    assert parse_address('127.0.0.1:7070') == ('127.0.0.1', 7070)
+
+def test_registry_loads_lazily(tmp_path):
+    registry, loaded = make_registry(tmp_path, predict_kwargs={'device': 'cpu'})
+    version = registry.version()
+    assert version.startswith('default:') and not loaded
+
+    used, results = registry.infer(frames(), conf=0.25)
+    assert used == version
+    assert len(results) == 2 and float(results[0].boxes.conf[0]) == pytest.approx(0.5)
+    assert registry.get().model.calls == [{'device': 'cpu', 'conf': 0.25}]
+    assert loaded == [str(tmp_path / 'default.pt')]
+
+    registry.infer(frames(), version='candidate')
+    assert len(loaded) == 2
+
+def test_registry_hot_reload_keeps_pinned_version(tmp_path):
+    registry, loaded = make_registry(tmp_path)
+    old = registry.version()
+    registry.infer(frames())
+
+    write_weights(tmp_path / 'default.pt', 0.6)
+    new = registry.version()
+    assert new != old
+
+    # Video baru memakai bobot baru, video yang sudah berjalan tetap memakai versinya
+    version, results = registry.infer(frames())
+    assert version == new and float(results[0].boxes.conf[0]) == pytest.approx(0.6)
+    version, results = registry.infer(frames(), version=old)
+    assert version == old and float(results[0].boxes.conf[0]) == pytest.approx(0.5)
+    assert [info['retired'] for info in registry.describe()][0] == [old]
+
+    # Versi lama dilepas setelah tidak dipakai
+    registry.retire_seconds = 0
+    registry.infer(frames())
+    assert registry.describe()[0]['retired'] == []
+    version, _ = registry.infer(frames(), version=old)
+    assert version == new
+
+def test_registry_traffic_split(tmp_path):
+    registry, _ = make_registry(tmp_path, traffic={'candidate': 0.5})
+    picks = [registry.select(f'video-{i}') for i in range(200)]
+    assert picks == [registry.select(f'video-{i}') for i in range(200)]  # Tetap untuk key yang sama
+    assert 60 < picks.count('candidate') < 140
+    assert {info['name']: info['traffic'] for info in registry.describe()} == {'default': 0.5, 'candidate': 0.5}
+
+    with pytest.raises(KeyError):
+        registry.get('unknown')
+
+def test_remote_registry_round_trip(tmp_path):
+    registry, loaded = make_registry(tmp_path)
+    address = str(tmp_path / 'models.sock')
+    server = InferenceServer(registry, address, authkey=b'test')
+    ready = threading.Event()
+    threading.Thread(target=server.serve_forever, kwargs={'ready': ready}, daemon=True).start()
+    assert ready.wait(5)
+
+    remote = RemoteModelRegistry(address, authkey=b'test')
+    model = RegistryModel(remote)
+    images = [np.full((32, 32, 3), i, dtype=np.uint8) for i in range(3)]
+
+    results = model(images, version='candidate', conf=0.25)
+    assert [int(result.orig_img[0, 0, 0]) for result in results] == [0, 1, 2]
+    assert results[0].boxes.xyxy.tolist() == [[1.0, 2.0, 10.0, 20.0]]
+    assert float(results[0].boxes.conf[0]) == pytest.approx(0.8)
+    assert model.names == FakeModel.names
+    assert remote.version() == registry.version()
+    assert remote.select('abc') == 'default'
+    assert [info['name'] for info in remote.describe()] == ['default', 'candidate']
+
+    with pytest.raises(RuntimeError, match='Unknown model'):
+        remote.infer(images, version='unknown')
+    assert len(loaded) == 2  # Model hanya dimuat di proses server
+
+def test_remote_registry_shared_memory_frames(tmp_path):
+    registry, _ = make_registry(tmp_path)
+    received = []
+    infer = registry.infer
+
+    def record(frames, version=None, **kwargs):
+        received.append([frame.flags.owndata for frame in frames])
+        return infer(frames, version, **kwargs)
+
+    registry.infer = record
+    address = str(tmp_path / 'models.sock')
+    server = InferenceServer(registry, address, authkey=b'test')
+    ready = threading.Event()
+    threading.Thread(target=server.serve_forever, kwargs={'ready': ready}, daemon=True).start()
+    assert ready.wait(5)
+
+    remote = RemoteModelRegistry(address, authkey=b'test', shared_memory=True, ring_slots=2)
+    for size in (32, 64):
+        # Frame lebih besar dari slot: ring baru dibuat dan server menempel ke ring tersebut
+        images = [np.full((size, size, 3), i, dtype=np.uint8) for i in range(3)]
+        version, results = remote.infer(images, version='candidate')
+        assert [int(result.orig_img[0, 0, 0]) for result in results] == [0, 1, 2]
+        assert float(results[0].boxes.conf[0]) == pytest.approx(0.8)
+    # Server membaca frame sebagai view shared memory, bukan salinan hasil unpickle
+    assert received == [[False] * 3, [False] * 3]
+    ring = remote._local.ring
+    assert ring.slots == 3 and ring.released == ring.written == 3
+
+def test_inference_server_requires_authkey(tmp_path):
+    registry, _ = make_registry(tmp_path)
+    address = str(tmp_path / 'models.sock')
+    # Pesan di-unpickle: tanpa kunci rahasia server maupun klien menolak berjalan
+    with pytest.raises(ValueError):
+        InferenceServer(registry, address)
+    with pytest.raises(ValueError):
+        RemoteModelRegistry(('127.0.0.1', 8765), authkey=b'')
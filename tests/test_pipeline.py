@@ -0,0 +1,167 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import plan_shards, run_detection_pipeline
+
+
+class FakeCapture:
+    """Capture sederhana yang menghasilkan angka sebagai pengganti frame"""
+
+    def __init__(self, total):
+        self.total = total
+        self.read_count = 0
+        self.grab_count = 0
+
+    def read(self):
+        if self.read_count >= self.total:
+            return False, None
+        self.read_count += 1
+        return True, self.read_count
+
+    def grab(self):
+        ret, _ = self.read()
+        self.grab_count += ret
+        return ret
+
+def test_pipeline_keeps_frame_order():
+    batches = []
+
+    def infer_batch(frames):
+        batches.append(list(frames))
+        return [(f'result-{frame}', 0.9 if frame % 4 == 0 else None) for frame in frames]
+
+    handled = []
+    run_detection_pipeline(
+        FakeCapture(21),
+        lambda frame_index, frame: frame_index % 2 == 0,
+        infer_batch,
+        lambda *args: handled.append(args),
+        batch_size=3,
+    )
+
+    assert [args[0] for args in handled] == list(range(1, 22))
+    assert batches == [[2, 4, 6], [8, 10, 12], [14, 16, 18], [20]]
+    assert handled[3] == (4, 4, True, 'result-4', 0.9)
+    assert handled[5] == (6, 6, True, 'result-6', None)
+    assert handled[6] == (7, 7, False, None, None)
+
+def test_pipeline_reports_detections_before_encode():
+    encode_started = threading.Event()
+    release = threading.Event()
+    handled = []
+    reported = []
+
+    def handle_frame(*args):
+        handled.append(args[0])
+        encode_started.set()
+        release.wait(timeout=5)
+
+    def on_batch(frame_index, detections):
+        reported.append((frame_index, detections))
+        if len(reported) == 2:
+            # Hasil batch kedua sampai sementara encode masih tertahan di frame pertama
+            assert encode_started.wait(timeout=5)
+            assert handled == [1]
+            release.set()
+
+    run_detection_pipeline(
+        FakeCapture(8),
+        lambda frame_index, frame: frame_index % 2 == 0,
+        lambda frames: [(None, 0.9 if frame == 4 else None) for frame in frames],
+        handle_frame,
+        batch_size=2,
+        on_batch=on_batch,
+    )
+
+    assert reported == [(4, [(2, None), (4, 0.9)]), (8, [(6, None), (8, None)])]
+
+def test_pipeline_applies_backpressure():
+    capture = FakeCapture(1000)
+    release = threading.Event()
+
+    def slow_infer(frames):
+        release.wait(timeout=5)
+        return [(None, None) for _ in frames]
+
+    worker = threading.Thread(target=run_detection_pipeline, args=(
+        capture, lambda frame_index, frame: True, slow_infer, lambda *args: None
+    ), kwargs={'batch_size': 2, 'queue_size': 1})
+    worker.start()
+    time.sleep(0.3)
+
+    # Decode tertahan oleh queue: 1 batch di inferensi, 1 di queue, 1 menunggu slot
+    assert capture.read_count <= 6
+    release.set()
+    worker.join(timeout=5)
+    assert capture.read_count == 1000
+
+def test_pipeline_propagates_errors():
+    def failing_infer(frames):
+        raise RuntimeError('model crashed')
+
+    with pytest.raises(RuntimeError, match='model crashed'):
+        run_detection_pipeline(
+            FakeCapture(100), lambda frame_index, frame: True, failing_infer, lambda *args: None,
+            batch_size=2,
+        )
+
+    def failing_handler(*args):
+        raise ValueError('encoder crashed')
+
+    with pytest.raises(ValueError, match='encoder crashed'):
+        run_detection_pipeline(
+            FakeCapture(100), lambda frame_index, frame: True,
+            lambda frames: [(None, None) for _ in frames], failing_handler,
+            batch_size=2,
+        )
+
+def test_pipeline_first_frame_offset():
+    handled = []
+    run_detection_pipeline(
+        FakeCapture(5), lambda i, frame: True, lambda frames: [(None, None)] * len(frames),
+        lambda i, frame, sampled, result, conf: handled.append(i), first_frame=101
+    )
+    assert handled == [101, 102, 103, 104, 105]
+
+def test_plan_shards():
+    assert plan_shards(1000, 4, 100) == [(1, 250), (251, 500), (501, 750), (751, None)]
+    # Jumlah bagian dibatasi durasi minimum
+    assert plan_shards(1000, 8, 400) == [(1, 500), (501, None)]
+    assert plan_shards(1000, 4, 600) == [(1, None)]
+    assert plan_shards(0, 4, 100) == [(1, None)]
+
+def test_pipeline_preprocesses_sampled_frames():
+    calls = []
+
+    def infer_batch(frames, originals=None):
+        calls.append((list(frames), originals))
+        return [(None, None) for _ in frames]
+
+    handled = []
+    run_detection_pipeline(
+        FakeCapture(4), lambda i, frame: i % 2 == 0, infer_batch,
+        lambda i, frame, sampled, result, conf: handled.append(frame),
+        preprocess=lambda frame: -frame
+    )
+    # Model menerima frame hasil preprocessing, tahap encode tetap menerima frame asli
+    assert calls == [([-2, -4], [2, 4])]
+    assert handled == [1, 2, 3, 4]
+
+def test_pipeline_grabs_frames_that_are_not_needed():
+    capture = FakeCapture(20)
+    handled = []
+    run_detection_pipeline(
+        capture,
+        lambda frame_index, frame: frame_index % 5 == 0,
+        lambda frames: [(None, None) for _ in frames],
+        lambda *args: handled.append(args),
+        next_decode=lambda frame_index: -(-frame_index // 5) * 5,
+    )
+
+    # Semua nomor frame tetap sampai ke handle_frame, hanya frame sampel yang didecode
+    assert [args[0] for args in handled] == list(range(1, 21))
+    assert [args[1] for args in handled if args[2]] == [5, 10, 15, 20]
+    assert handled[0] == (1, None, False, None, None)
+    assert capture.grab_count == 16
@@ -0,0 +1,71 @@
+import threading
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from preprocessing import FramePreprocessor, preprocess_frame, restore_original
+
+
+def make_frame(height=120, width=160, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+def reference_preprocess(frame):
+    # Implementasi awal: CLAHE kanal L lalu bilateralFilter pada resolusi penuh
+    lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    l = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(l)
+    enhanced = cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2BGR)
+    return cv2.bilateralFilter(enhanced, 9, 75, 75)
+
+def test_preprocess_frame_matches_reference():
+    frame = make_frame()
+    for _ in range(2):  # Buffer dipakai ulang pada pemanggilan kedua
+        assert np.array_equal(preprocess_frame(frame), reference_preprocess(frame))
+
+def test_preprocessor_returns_new_array_per_frame():
+    preprocessor = FramePreprocessor()
+    first = preprocessor(make_frame(seed=1))
+    copy = first.copy()
+    preprocessor(make_frame(seed=2))
+    assert np.array_equal(first, copy)
+
+def test_preprocessor_target_size():
+    preprocessor = FramePreprocessor(target_size=80)
+    assert preprocessor(make_frame(120, 160)).shape == (60, 80, 3)
+    # Frame yang lebih kecil dari target tidak diperbesar
+    assert preprocessor(make_frame(40, 64)).shape == (40, 64, 3)
+    assert preprocessor.output_size(1920, 1080) == (80, 45)
+
+def test_preprocessor_is_thread_safe():
+    preprocessor = FramePreprocessor(target_size=64)
+    frames = [make_frame(seed=i) for i in range(4)]
+    expected = [preprocessor(frame) for frame in frames]
+    mismatches = []
+
+    def worker():
+        for _ in range(20):
+            for frame, reference in zip(frames, expected):
+                if not np.array_equal(preprocessor(frame), reference):
+                    mismatches.append(True)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not mismatches
+
+def test_restore_original_scales_boxes():
+    small = np.zeros((45, 80, 3), dtype=np.uint8)
+    original = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    boxes = torch.tensor([[10.0, 5.0, 40.0, 20.0, 0.9, 1.0]])
+    result = restore_original(Results(small, path='', names={1: 'violence'}, boxes=boxes), original)
+
+    assert result.orig_img is original
+    assert result.orig_shape == (1080, 1920)
+    assert torch.allclose(result.boxes.xyxy, torch.tensor([[240.0, 120.0, 960.0, 480.0]]))
+    assert float(result.boxes.conf[0]) == float(boxes[0, 4])
+    assert result.plot().shape == original.shape
@@ -0,0 +1,73 @@
+import numpy as np
+
+from sampling import FixedStrideSampler, MotionSampler
+
+
+def static_frame():
+    return np.full((240, 320, 3), 80, dtype=np.uint8)
+
+def moving_frame(offset):
+    frame = static_frame()
+    frame[60:180, offset:offset + 60] = 255
+    return frame
+
+def test_fixed_stride_sampler():
+    sampler = FixedStrideSampler(2)
+    selected = [i for i in range(1, 11) if sampler(i, None)]
+
+    assert selected == [2, 4, 6, 8, 10]
+    assert sampler.stats()['frames_skipped'] == 5
+
+def test_motion_sampler_skips_static_frames():
+    sampler = MotionSampler(min_stride=2, max_stride=8, idle_interval=0)
+    selected = [i for i in range(1, 101) if sampler(i, static_frame())]
+
+    # Hanya frame pertama yang diinferensi pada ruangan yang diam
+    assert selected == [1]
+    stats = sampler.stats()
+    assert stats['frames_inferred'] == 1
+    assert stats['frames_skipped_static'] + stats['frames_skipped_stride'] == 99
+
+def test_motion_sampler_idle_interval():
+    sampler = MotionSampler(min_stride=2, idle_interval=30)
+    selected = [i for i in range(1, 101) if sampler(i, static_frame())]
+
+    assert selected == [1, 31, 61, 91]
+
+def test_motion_sampler_adapts_stride():
+    sampler = MotionSampler(min_stride=2, max_stride=6, idle_interval=0)
+    selected = []
+    for i in range(1, 41):
+        if sampler(i, moving_frame(i * 5)):
+            selected.append(i)
+            sampler.record_detection(i, False)
+
+    # Tanpa deteksi stride merenggang hingga max_stride
+    gaps = np.diff(selected)
+    assert list(gaps[:4]) == [3, 4, 5, 6]
+    assert gaps[-1] == 6
+    assert sampler.stride == 6
+
+    # Deteksi langsung merapatkan stride
+    sampler.record_detection(selected[-1], True)
+    assert sampler.stride == 2
+
+def test_next_frame_skips_frames_without_pixels():
+    assert [FixedStrideSampler(3).next_frame(i) for i in (1, 3, 4)] == [3, 3, 6]
+
+    sampler = MotionSampler(min_stride=2, max_stride=6, idle_interval=0)
+    selected = []
+    frame_index = 1
+    while frame_index <= 40:
+        target = sampler.next_frame(frame_index)
+        # Frame sebelum target tidak didecode (frame None)
+        for skipped in range(frame_index, min(target, 41)):
+            assert not sampler(skipped, None)
+        if target <= 40 and sampler(target, moving_frame(target * 5)):
+            selected.append(target)
+            sampler.record_detection(target, False)
+        frame_index = target + 1
+
+    # Sama dengan sampler yang melihat setiap frame (test_motion_sampler_adapts_stride)
+    assert list(np.diff(selected)[:4]) == [3, 4, 5, 6]
+    assert sampler.stats()['frames_total'] == 40
@@ -0,0 +1,255 @@
+import os
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from streaming import CameraStream, StreamMonitor
+from video_io import FFmpegVideoWriter
+
+
+class FakeWriter:
+    def __init__(self, path, fps, frame_size):
+        self.path = path
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def release(self):
+        return True
+
+class FakeResult:
+    def plot(self, img=None):
+        return np.full((48, 64, 3), 255, dtype=np.uint8) if img is None else img + 1
+
+def make_frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+def make_stream(tmp_path, segments, **kwargs):
+    writers = []
+
+    def open_writer(path, fps, frame_size):
+        writers.append(FakeWriter(path, fps, frame_size))
+        return writers[-1]
+
+    stream = CameraStream(1, 'rtsp://camera', 'D404', str(tmp_path), open_writer, segments.append,
+                          pre_roll=0.2, post_roll=0.2, **kwargs)
+    stream.fps = 10.0  # 2 frame pre-roll dan post-roll
+    return stream, writers
+
+def test_camera_stream_records_segment_with_pre_and_post_roll(tmp_path):
+    segments = []
+    stream, writers = make_stream(tmp_path, segments)
+
+    for i in range(1, 6):
+        stream.handle_frame(make_frame(i), timestamp=1000.0 + i)
+    stream.record_inference(5, FakeResult(), 0.8)
+    for i in range(6, 12):
+        stream.handle_frame(make_frame(i), timestamp=1000.0 + i)
+    stream.stop()
+
+    assert len(segments) == 1
+    segment = segments[0]
+    raw, result = writers
+    # Frame 3-4 (pre-roll), 5 (deteksi), lalu sampai post-roll habis setelah frame 7
+    assert [int(f[0, 0, 0]) for f in raw.frames] == [3, 4, 5, 6, 7, 8]
+    assert segment.ok and segment.frames == 6 and segment.detections == 1
+    assert segment.peak_confidence == 0.8
+    assert segment.first_detection_frame == segment.last_detection_frame == segment.peak_frame == 3
+    assert segment.raw_path == os.path.join(str(tmp_path), segment.filename)
+    assert segment.result_path == os.path.join(str(tmp_path), f'result_{segment.filename}')
+    assert segment.filename.startswith('D404_')
+    # Kotak deteksi ikut digambar pada frame setelah inferensi di video hasil
+    assert int(result.frames[3][0, 0, 0]) == 7
+
+def test_camera_stream_latest_skips_frames_when_behind(tmp_path):
+    stream, _ = make_stream(tmp_path, [])
+    for i in range(1, 4):
+        stream.handle_frame(make_frame(i))
+
+    seq, frame = stream.latest()
+    assert seq == 3 and int(frame[0, 0, 0]) == 3
+    assert stream.latest() is None  # Tidak ada frame baru sejak terakhir diambil
+
+def test_stream_monitor_batches_cameras(tmp_path):
+    calls = []
+
+    def infer_batch(frames):
+        calls.append(len(frames))
+        return [(FakeResult(), None) for _ in frames]
+
+    monitor = StreamMonitor(infer_batch, inference_fps=0, max_batch=8)
+    streams = []
+    for source_id in range(3):
+        stream, _ = make_stream(tmp_path, [])
+        stream.source_id = source_id
+        stream.handle_frame(make_frame(source_id))
+        monitor.streams[source_id] = stream
+        streams.append(stream)
+
+    assert monitor.run_once()
+    assert calls == [3]  # Satu pemanggilan model untuk semua kamera
+    assert not monitor.run_once()
+    assert all(stream.frames_inferred == 1 for stream in streams)
+
+def test_stream_monitor_preprocesses_per_camera(tmp_path):
+    calls = []
+
+    def infer_batch(frames, originals=None):
+        calls.append(([int(f[0, 0, 0]) for f in frames], [int(f[0, 0, 0]) for f in originals]))
+        return [(FakeResult(), None) for _ in frames]
+
+    monitor = StreamMonitor(infer_batch, inference_fps=0, max_batch=8)
+    for source_id, preprocess in enumerate([None, lambda frame: frame + 100]):
+        stream, _ = make_stream(tmp_path, [], preprocess=preprocess)
+        stream.source_id = source_id
+        stream.handle_frame(make_frame(source_id + 1))
+        monitor.streams[source_id] = stream
+
+    assert monitor.run_once()
+    assert calls == [([1, 102], [1, 2])]
+
+def test_stream_monitor_passes_regions_per_camera(tmp_path):
+    calls = []
+
+    def infer_batch(frames, regions=None):
+        calls.append(regions)
+        return [(FakeResult(), None) for _ in frames]
+
+    monitor = StreamMonitor(infer_batch, inference_fps=0, max_batch=8)
+    for source_id, region in enumerate([None, 'tiled']):
+        stream, _ = make_stream(tmp_path, [], region=region)
+        stream.source_id = source_id
+        stream.handle_frame(make_frame(source_id + 1))
+        monitor.streams[source_id] = stream
+
+    assert monitor.run_once()
+    assert calls == [[None, 'tiled']]
+
+def test_looping_file_as_camera(tmp_path):
+    # File lokal yang diputar ulang menggantikan kamera RTSP
+    source = str(tmp_path / 'camera.mp4')
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), 10.0, (64, 48))
+    for i in range(10):
+        writer.write(make_frame(i * 20))
+    writer.release()
+
+    segments = []
+    done = threading.Event()
+
+    def on_segment(segment):
+        segments.append(segment)
+        done.set()
+
+    detected = []
+
+    def infer_batch(frames):
+        # Deteksi hanya pada inferensi pertama
+        results = [(FakeResult(), 0.9 if not detected else None) for _ in frames]
+        detected.append(True)
+        return results
+
+    stream = CameraStream(1, source, 'D404', str(tmp_path),
+                          lambda path, fps, size: FFmpegVideoWriter(path, fps, size), on_segment,
+                          pre_roll=0.5, post_roll=1.0, loop=True, realtime=False)
+    monitor = StreamMonitor(infer_batch, inference_fps=0)
+    monitor.add(stream)
+
+    stop = threading.Event()
+    inference = threading.Thread(target=monitor.run, args=(stop,), daemon=True)
+    inference.start()
+    try:
+        assert done.wait(30)
+    finally:
+        stop.set()
+        inference.join()
+        monitor.stop()
+
+    segment = segments[0]
+    assert segment.ok
+    assert stream.frames_read > 10  # File sudah diputar ulang
+    assert os.path.getsize(segment.raw_path) > 0
+    assert os.path.getsize(segment.result_path) > 0
+
+def test_stream_monitor_survives_failed_inference(tmp_path):
+    calls = []
+    failed = threading.Event()
+    recovered = threading.Event()
+
+    def infer_batch(frames):
+        calls.append(len(frames))
+        if len(calls) == 1:
+            raise RuntimeError('model crashed')
+        recovered.set()
+        return [(FakeResult(), None) for _ in frames]
+
+    stream, _ = make_stream(tmp_path, [])
+    original_record_failure = stream.record_failure
+
+    def record_failure(stage, error):
+        original_record_failure(stage, error)
+        failed.set()
+
+    stream.record_failure = record_failure
+    monitor = StreamMonitor(infer_batch, inference_fps=0, error_delay=0.01)
+    monitor.streams[stream.source_id] = stream
+
+    stop = threading.Event()
+    inference = threading.Thread(target=monitor.run, args=(stop,), daemon=True)
+    inference.start()
+    try:
+        stream.handle_frame(make_frame(1))
+        assert failed.wait(5)
+        assert (stream.status, stream.error) == ('error', 'Inference failed: model crashed')
+        # Thread inferensi tetap berjalan dan error hilang setelah inferensi berikutnya berhasil
+        stream.handle_frame(make_frame(2))
+        assert recovered.wait(5)
+    finally:
+        stop.set()
+        inference.join()
+    assert stream.frames_inferred == 1
+    assert stream.status == 'running' and stream.error is None
+
+def test_camera_stream_reconnects_after_frame_error(tmp_path, caplog):
+    class FakeCapture:
+        def __init__(self, url):
+            pass
+
+        def isOpened(self):
+            return True
+
+        def get(self, prop):
+            return 10.0
+
+        def read(self):
+            return True, make_frame(1)
+
+        def release(self):
+            pass
+
+    opened = []
+
+    def capture_factory(url):
+        opened.append(url)
+        return FakeCapture(url)
+
+    stream, _ = make_stream(tmp_path, [], capture_factory=capture_factory, realtime=False, reconnect_delay=0.01)
+    handled = []
+
+    def handle_frame(frame):
+        handled.append(frame)
+        if len(handled) == 1:
+            raise ValueError('bad frame')
+        stream._stop.set()
+
+    stream.handle_frame = handle_frame
+    stream.start()
+    stream._thread.join(5)
+
+    # Frame rusak dicatat sebagai error, lalu stream disambung ulang dan membaca lagi
+    assert 'Stream 1 failed' in caplog.text and 'bad frame' in caplog.text
+    assert len(handled) == 2
+    assert len(opened) == 2
+    assert stream.status == 'running'
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from tiling import InferenceRegion, merge_boxes, parse_roi, parse_room_rois, tile_positions
+
+
+def make_results(inputs, boxes_per_input):
+    return [Results(image, path='', names={0: 'normal', 1: 'violence'}, boxes=torch.tensor(boxes, dtype=torch.float32).reshape(-1, 6))
+            for image, boxes in zip(inputs, boxes_per_input)]
+
+def test_parse_roi():
+    assert parse_roi('') is None
+    assert parse_roi('0 0.5 1 1') == [(0.0, 0.5, 1.0, 1.0)]
+    assert parse_roi('0,0,0.5,0.5 | 0.5 0.5 1.2 1') == [(0.0, 0.0, 0.5, 0.5), (0.5, 0.5, 1.0, 1.0)]
+    assert parse_room_rois('D404=0 0.3 1 1, D405=') == {'D404': [(0.0, 0.3, 1.0, 1.0)]}
+    with pytest.raises(ValueError):
+        parse_roi('0 0 1')
+    with pytest.raises(ValueError):
+        parse_roi('0.5 0 0.5 1')
+
+def test_tile_positions_cover_with_overlap():
+    assert tile_positions(500, 640, 0.2) == [0]
+    positions = tile_positions(1920, 640, 0.2)
+    assert positions[0] == 0 and positions[-1] == 1920 - 640
+    assert all(b - a <= 640 * 0.8 for a, b in zip(positions, positions[1:]))
+
+def test_split_batches_tiles_and_full_frame():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    region = InferenceRegion(tile_size=640, overlap=0.2)
+    parts = region.split(frame)
+    # 4 x 2 tile ditambah satu crop utuh
+    assert len(parts) == 9
+    assert all(part.shape == (640, 640, 3) for part in parts[:-1])
+    assert parts[-1].shape == frame.shape
+
+    assert len(InferenceRegion(tile_size=640, full_frame=False).split(frame)) == 8
+    assert len(InferenceRegion(tile_size=2000).split(frame)) == 1
+
+def test_roi_crops_and_masks_frame():
+    frame = np.full((100, 200, 3), 255, dtype=np.uint8)
+    region = InferenceRegion(roi=[(0.0, 0.5, 0.5, 1.0)])
+    [crop] = region.split(frame)
+    assert crop.shape == (50, 100, 3)
+
+    # Dua persegi: crop memuat keduanya, piksel di antaranya dihitamkan
+    region = InferenceRegion(roi=[(0.0, 0.0, 0.25, 0.5), (0.75, 0.5, 1.0, 1.0)])
+    [crop] = region.split(frame)
+    assert crop.shape == frame.shape
+    assert crop[10, 10].tolist() == [255, 255, 255] and crop[10, 190].tolist() == [0, 0, 0]
+    assert crop[90, 190].tolist() == [255, 255, 255]
+
+def test_merge_maps_boxes_and_suppresses_tile_fragments():
+    frame = np.zeros((100, 300, 3), dtype=np.uint8)
+    region = InferenceRegion(roi=[(0.0, 0.0, 1.0, 1.0)], tile_size=100, overlap=0.0)
+    inputs = region.split(frame)
+    assert [part.shape[1] for part in inputs] == [100, 100, 100, 300]
+
+    results = make_results(inputs, [
+        [],
+        [[10, 10, 60, 60, 0.8, 1]],  # Orang kecil, hanya terlihat di tile kedua
+        [[0, 20, 30, 90, 0.5, 1]],  # Potongan objek besar di tepi tile ketiga
+        [[180, 10, 290, 95, 0.7, 1]],  # Objek besar utuh dari crop utuh
+    ])
+    result = region.merge(results, frame)
+
+    assert result.orig_img is frame and result.orig_shape == (100, 300)
+    assert sorted(result.boxes.xyxy.tolist()) == [[110.0, 10.0, 160.0, 60.0], [180.0, 10.0, 290.0, 95.0]]
+    assert sorted(result.boxes.conf.tolist()) == pytest.approx([0.7, 0.8])
+    assert result.plot().shape == frame.shape
+
+def test_merge_boxes_keeps_other_classes():
+    data = np.array([
+        [0, 0, 10, 10, 0.9, 1],
+        [1, 1, 9, 9, 0.6, 1],
+        [1, 1, 9, 9, 0.5, 0],
+    ], dtype=np.float32)
+    assert merge_boxes(data, 0.6)[:, 4].tolist() == pytest.approx([0.9, 0.5])
+
+def test_region_settings():
+    assert InferenceRegion(roi=[(0, 0, 1, 0.5)]).settings() == {'roi': [[0, 0, 1, 0.5]]}
+    settings = InferenceRegion(tile_size=640).settings()
+    assert settings['tile_size'] == 640 and settings['roi'] is None
@@ -0,0 +1,226 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from video_io import (FFmpegVideoReader, FFmpegVideoWriter, FrameRangeCapture, GrowingFileCapture, concat_videos,
+                      is_streamable, iter_frames, make_thumbnail)
+
+
+@pytest.fixture
+def output_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+def test_ffmpeg_writer_encodes_h264(output_dir):
+    output_path = os.path.join(output_dir, 'result.mp4')
+    # Dimensi ganjil harus tetap bisa di-encode ke yuv420p
+    writer = FFmpegVideoWriter(output_path, 10.0, (161, 121), preset='ultrafast', crf=30)
+    assert writer.isOpened()
+
+    for i in range(12):
+        writer.write(np.full((121, 161, 3), i * 20, dtype=np.uint8))
+    assert writer.release() is True
+    # release() kedua kali aman dipanggil
+    assert writer.release() is True
+
+    cap = cv2.VideoCapture(output_path)
+    assert cap.isOpened()
+    codec = int(cap.get(cv2.CAP_PROP_FOURCC)).to_bytes(4, 'little').decode()
+    frames = 0
+    while cap.read()[0]:
+        frames += 1
+    cap.release()
+
+    assert codec in ('avc1', 'h264')
+    assert frames == 12
+
+def test_ffmpeg_writer_reports_failure(output_dir):
+    # Folder tujuan tidak ada sehingga ffmpeg gagal menulis output
+    output_path = os.path.join(output_dir, 'missing', 'result.mp4')
+    writer = FFmpegVideoWriter(output_path, 10.0, (64, 48))
+    for _ in range(3):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+
+    assert writer.release() is False
+    assert writer.error
+
+def test_ffmpeg_writer_preview_rendition(output_dir):
+    output_path = os.path.join(output_dir, 'result.mp4')
+    preview_path = os.path.join(output_dir, 'preview.mp4')
+    writer = FFmpegVideoWriter(output_path, 10.0, (321, 241), preset='ultrafast',
+                               preview_path=preview_path, preview_height=120)
+    for i in range(10):
+        writer.write(np.full((241, 321, 3), i * 20, dtype=np.uint8))
+    assert writer.release() is True
+
+    sizes = []
+    for path in (output_path, preview_path):
+        cap = cv2.VideoCapture(path)
+        sizes.append((int(cap.get(3)), int(cap.get(4)), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))))
+        cap.release()
+        assert is_streamable(path)
+    assert sizes == [(322, 242, 10), (160, 120, 10)]
+
+def test_make_thumbnail():
+    image = np.zeros((720, 1280, 3), dtype=np.uint8)
+    assert make_thumbnail(image, 320).shape == (180, 320, 3)
+    small = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert make_thumbnail(small, 320) is small
+
+def write_test_video(path, frames=60):
+    rng = np.random.default_rng(0)
+    writer = FFmpegVideoWriter(path, 25.0, (160, 120), preset='ultrafast')
+    for _ in range(frames):
+        writer.write(rng.integers(0, 255, (120, 160, 3), dtype=np.uint8))
+    assert writer.release()
+
+def test_is_streamable(output_dir):
+    faststart = os.path.join(output_dir, 'faststart.mp4')
+    write_test_video(faststart, frames=5)
+    assert is_streamable(faststart)
+
+    # moov di akhir file (tanpa +faststart) harus menunggu upload selesai
+    plain = os.path.join(output_dir, 'plain.mp4')
+    writer = cv2.VideoWriter(plain, cv2.VideoWriter_fourcc(*'mp4v'), 10.0, (64, 48))
+    for _ in range(5):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    assert not is_streamable(plain)
+
+def test_growing_file_capture_decodes_while_file_arrives(output_dir):
+    source = os.path.join(output_dir, 'source.mp4')
+    write_test_video(source)
+    with open(source, 'rb') as f:
+        data = f.read()
+
+    growing = os.path.join(output_dir, 'growing.mp4')
+    head = len(data) // 3
+    with open(growing, 'wb') as f:
+        f.write(data[:head])
+
+    finished = threading.Event()
+    first_frame = threading.Event()
+
+    def upload_tail():
+        # Sisa file baru ditulis setelah frame pertama berhasil didecode
+        first_frame.wait(10)
+        with open(growing, 'ab') as f:
+            f.write(data[head:])
+        finished.set()
+
+    threading.Thread(target=upload_tail, daemon=True).start()
+    cap = GrowingFileCapture(growing, lambda: (finished.is_set(), len(data)), poll_interval=0.05)
+    assert cap.isOpened()
+    assert cap.get(cv2.CAP_PROP_FRAME_COUNT) == 60
+
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frames == 0:
+            assert not finished.is_set()
+            first_frame.set()
+        frames += 1
+    cap.release()
+
+    assert frames == 60
+    assert frame is None
+
+def test_growing_file_capture_stops_when_upload_stalls(output_dir):
+    source = os.path.join(output_dir, 'source.mp4')
+    write_test_video(source)
+    with open(source, 'rb') as f:
+        data = f.read()
+    partial = os.path.join(output_dir, 'partial.mp4')
+    with open(partial, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    cap = GrowingFileCapture(partial, lambda: (False, len(data)), poll_interval=0.05, stall_timeout=0.3)
+    start = time.monotonic()
+    frames = 0
+    while cap.read()[0]:
+        frames += 1
+    cap.release()
+
+    assert 0 < frames < 60
+    assert time.monotonic() - start < 10
+
+def read_all(capture):
+    frames = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+def test_frame_range_capture_matches_sequential_decode(output_dir):
+    path = os.path.join(output_dir, 'video.mp4')
+    write_test_video(path, frames=60)
+    frames = read_all(cv2.VideoCapture(path))
+
+    shard = read_all(FrameRangeCapture(path, 23, 40))
+    assert len(shard) == 18
+    assert all(np.array_equal(a, b) for a, b in zip(shard, frames[22:40]))
+    assert len(read_all(FrameRangeCapture(path, 41))) == 20
+
+def test_ffmpeg_reader_scales_and_seeks_exactly(output_dir):
+    path = os.path.join(output_dir, 'video.mp4')
+    write_test_video(path, frames=60)
+    frames = read_all(cv2.VideoCapture(path))
+
+    reader = FFmpegVideoReader(path)
+    assert reader.get(cv2.CAP_PROP_FRAME_WIDTH) == 160 and reader.scale == 1.0
+    decoded = read_all(reader)
+    assert len(decoded) == 60
+    assert np.mean([np.abs(a.astype(int) - b).mean() for a, b in zip(decoded, frames)]) < 3
+
+    reader = FFmpegVideoReader(path, 23, 40, max_width=80)
+    assert reader.frame_size == (80, 60) and reader.scale == 2.0
+    ret, frame = reader.read()
+    assert frame.shape == (60, 80, 3)
+    # Frame terdekat (setelah diperkecil) adalah frame 23
+    small = [cv2.resize(f, (80, 60), interpolation=cv2.INTER_AREA).astype(int) for f in frames]
+    assert np.argmin([np.abs(frame - f).mean() for f in small]) == 22
+    assert reader.grab() and reader.seek(39)
+    assert len(read_all(reader)) == 2  # Frame 39 dan 40
+
+def test_iter_frames_grabs_and_seeks_to_needed_frames(output_dir):
+    path = os.path.join(output_dir, 'video.mp4')
+    write_test_video(path, frames=60)
+    frames = read_all(cv2.VideoCapture(path))
+
+    def next_decode(frame_index):
+        return -(-frame_index // 25) * 25
+
+    for capture in (FrameRangeCapture(path), FFmpegVideoReader(path)):
+        items = list(iter_frames(capture, next_decode=next_decode, seek_frames=10))
+        capture.release()
+        # Semua frame tetap terdaftar dengan timestamp; hanya frame 25 dan 50 yang didecode
+        assert [index for index, _, _ in items] == list(range(1, 61))
+        assert items[24][1] == pytest.approx(24 / 25.0)
+        decoded = [(index, frame) for index, _, frame in items if frame is not None]
+        assert [index for index, _ in decoded] == [25, 50]
+        assert all(np.abs(frame.astype(int) - frames[index - 1]).mean() < 3 for index, frame in decoded)
+
+def test_concat_videos_without_reencoding(output_dir):
+    parts = []
+    for number in range(3):
+        path = os.path.join(output_dir, f'part{number}.mp4')
+        write_test_video(path, frames=10 + number)
+        parts.append(path)
+    output_path = os.path.join(output_dir, 'joined.mp4')
+
+    assert concat_videos(parts, output_path)
+    assert len(read_all(cv2.VideoCapture(output_path))) == 33
+    assert is_streamable(output_path)
+    assert not concat_videos([os.path.join(output_dir, 'missing.mp4')], output_path)
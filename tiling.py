@@ -0,0 +1,169 @@
+import math
+
+import numpy as np
+
+
+def parse_roi(value):
+    """
+    ROI dari teks 'x1 y1 x2 y2|x1 y1 x2 y2' (koordinat relatif 0..1 terhadap lebar/tinggi
+    frame, beberapa persegi dipisah '|'). Mengembalikan list tuple; teks kosong = None.
+    """
+    if not value or not value.strip():
+        return None
+    rects = []
+    for part in value.split('|'):
+        coords = [float(number) for number in part.replace(',', ' ').split()]
+        if len(coords) != 4:
+            raise ValueError(f"ROI rectangle needs 4 coordinates: {part!r}")
+        x1, y1, x2, y2 = (min(max(coord, 0.0), 1.0) for coord in coords)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Empty ROI rectangle: {part!r}")
+        rects.append((x1, y1, x2, y2))
+    return rects
+
+def parse_room_rois(value):
+    """ROI per ruangan dari 'D404=0 0.3 1 1|0.6 0 1 0.3, D405=...' (format ROI lihat parse_roi)"""
+    rois = {}
+    for item in value.split(','):
+        if '=' in item:
+            room, roi = item.split('=', 1)
+            rects = parse_roi(roi)
+            if room.strip() and rects:
+                rois[room.strip()] = rects
+    return rois
+
+def tile_positions(length, tile_size, overlap):
+    """Posisi awal tile sepanjang satu sumbu: tile selebar tile_size menutup 0..length dengan tumpang tindih minimal overlap"""
+    if length <= tile_size:
+        return [0]
+    stride = tile_size * (1.0 - overlap)
+    count = math.ceil((length - tile_size) / stride) + 1
+    return [round(i * (length - tile_size) / (count - 1)) for i in range(count)]
+
+def box_overlap(box, boxes):
+    """Luas irisan dibagi luas kotak yang lebih kecil (intersection over smaller) antara box dan setiap boxes"""
+    width = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    height = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return width * height / np.maximum(np.minimum(area, areas), 1e-6)
+
+def merge_boxes(data, threshold):
+    """
+    NMS lintas tile per kelas pada data kotak (n, 6+) [x1, y1, x2, y2, ..., conf, cls].
+    Overlap diukur terhadap kotak yang lebih kecil: potongan objek di tepi tile berada
+    hampir seluruhnya di dalam kotak utuhnya (dari tile tetangga atau pass seluruh frame)
+    sehingga IoU-nya kecil, tetapi tetap harus dibuang.
+    """
+    if len(data) < 2:
+        return data
+    keep = []
+    for cls in np.unique(data[:, -1]):
+        indices = np.flatnonzero(data[:, -1] == cls)
+        indices = indices[np.argsort(-data[indices, -2], kind='stable')]
+        while len(indices):
+            best, indices = indices[0], indices[1:]
+            keep.append(best)
+            if len(indices):
+                indices = indices[box_overlap(data[best, :4], data[indices, :4]) < threshold]
+    return data[np.sort(keep)]
+
+
+class InferenceRegion:
+    """
+    Wilayah inferensi per kamera/ruangan untuk frame CCTV beresolusi tinggi.
+
+    roi (list persegi relatif, lihat parse_roi) memotong frame ke persegi terkecil yang
+    memuat semua ROI; piksel di luar ROI dihitamkan, sehingga area yang tidak relevan
+    (jalan, layar TV, pintu) tidak memicu deteksi dan model tidak membuang resolusi untuk
+    area tersebut. tile_size > 0 membagi crop menjadi tile tile_size x tile_size piksel
+    yang tumpang tindih sebesar overlap; semua tile dari semua frame dalam satu batch
+    diinferensi dalam satu pemanggilan model, sehingga orang kecil di kamera 4K tetap
+    terlihat pada resolusi aslinya. full_frame menambahkan crop utuh sebagai input
+    tambahan untuk objek besar yang terpotong tile. Kotak dari semua input digabung
+    dengan merge_boxes (merge_threshold). Biayanya: jumlah input model per frame.
+    """
+
+    def __init__(self, roi=None, tile_size=None, overlap=0.2, full_frame=True, merge_threshold=0.6):
+        self.roi = [tuple(rect) for rect in roi] if roi else None
+        self.tile_size = tile_size or None
+        self.overlap = min(max(overlap, 0.0), 0.9)
+        self.full_frame = full_frame
+        self.merge_threshold = merge_threshold
+
+    def settings(self):
+        """Pengaturan yang memengaruhi hasil deteksi (kunci cache, perbandingan konfigurasi kamera)"""
+        settings = {'roi': [list(rect) for rect in self.roi] if self.roi else None}
+        if self.tile_size:
+            settings.update(tile_size=self.tile_size, overlap=self.overlap, full_frame=self.full_frame,
+                            merge_threshold=self.merge_threshold)
+        return settings
+
+    def crop_box(self, width, height):
+        """(x1, y1, x2, y2) piksel crop ROI pada frame width x height"""
+        if not self.roi:
+            return 0, 0, width, height
+        return (
+            math.floor(min(rect[0] for rect in self.roi) * width),
+            math.floor(min(rect[1] for rect in self.roi) * height),
+            math.ceil(max(rect[2] for rect in self.roi) * width),
+            math.ceil(max(rect[3] for rect in self.roi) * height),
+        )
+
+    def windows(self, width, height):
+        """Jendela (x1, y1, x2, y2) dalam koordinat frame yang dikirim ke model untuk frame width x height"""
+        left, top, right, bottom = self.crop_box(width, height)
+        crop_width, crop_height = right - left, bottom - top
+        windows = []
+        if self.tile_size and max(crop_width, crop_height) > self.tile_size:
+            for y in tile_positions(crop_height, self.tile_size, self.overlap):
+                for x in tile_positions(crop_width, self.tile_size, self.overlap):
+                    windows.append((left + x, top + y, left + min(x + self.tile_size, crop_width),
+                                    top + min(y + self.tile_size, crop_height)))
+            if self.full_frame:
+                windows.append((left, top, right, bottom))
+        else:
+            windows.append((left, top, right, bottom))
+        return windows
+
+    def _masked(self, frame):
+        # Satu persegi: crop sudah tepat sama dengan ROI, tidak perlu salinan
+        if not self.roi or len(self.roi) == 1:
+            return frame
+        height, width = frame.shape[:2]
+        masked = np.zeros_like(frame)
+        for x1, y1, x2, y2 in self.roi:
+            region = (slice(math.floor(y1 * height), math.ceil(y2 * height)),
+                      slice(math.floor(x1 * width), math.ceil(x2 * width)))
+            masked[region] = frame[region]
+        return masked
+
+    def split(self, frame):
+        """Input model untuk frame: list potongan (view) sesuai windows()"""
+        frame = self._masked(frame)
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.windows(frame.shape[1], frame.shape[0])]
+
+    def merge(self, results, frame):
+        """
+        Gabungkan hasil Ultralytics untuk input split(frame) menjadi satu hasil pada frame:
+        kotak digeser ke koordinat frame lalu di-NMS lintas tile. Objek hasil pertama dipakai
+        ulang (names, speed) dengan orig_img frame.
+        """
+        windows = self.windows(frame.shape[1], frame.shape[0])
+        merged = results[0]
+        data = merged.boxes.data
+        parts = []
+        for (x1, y1, _, _), result in zip(windows, results):
+            boxes = result.boxes.data
+            boxes = boxes.cpu().numpy() if hasattr(boxes, 'cpu') else np.asarray(boxes)
+            boxes = boxes.astype(np.float32, copy=True)
+            boxes[:, [0, 2]] += x1
+            boxes[:, [1, 3]] += y1
+            parts.append(boxes)
+        boxes = merge_boxes(np.concatenate(parts), self.merge_threshold)
+
+        merged.orig_img = frame
+        merged.orig_shape = frame.shape[:2]
+        # Tipe data kotak (tensor/ndarray) mengikuti hasil model
+        merged.update(boxes=data.new_tensor(boxes) if hasattr(data, 'new_tensor') else boxes)
+        return merged
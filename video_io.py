@@ -0,0 +1,516 @@
+import os
+import time
+import struct
+import logging
+import threading
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+import imageio_ffmpeg
+
+logger = logging.getLogger('sintesa.video_io')
+
+
+class FFmpegVideoWriter:
+    """
+    Encoder H.264 satu tahap: frame BGR dikirim mentah lewat pipe ke proses ffmpeg
+    (binary bawaan imageio-ffmpeg) dan langsung ditulis sebagai MP4 yang bisa
+    diputar browser. Antarmukanya mengikuti cv2.VideoWriter (isOpened/write/release).
+
+    preview_path (opsional) menulis rendition kecil (tinggi preview_height, kualitas
+    preview_crf) dari frame yang sama di proses ffmpeg yang sama, untuk halaman yang
+    tidak perlu memuat video resolusi penuh.
+    """
+
+    def __init__(self, output_path, fps, frame_size, preset='veryfast', crf=23,
+                 preview_path=None, preview_height=360, preview_crf=30):
+        self.output_path = output_path
+        self.preview_path = preview_path
+        self.frame_size = frame_size
+        self.failed = False
+        self.error = None
+        self._released = False
+
+        width, height = frame_size
+        # moov atom di depan agar video bisa langsung diputar (dan di-seek lewat Range request)
+        encode = ['-c:v', 'libx264', '-preset', preset, '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+        command = [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo',
+            '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps:.3f}',
+            '-i', '-',
+            '-an',
+        ]
+        # libx264 + yuv420p membutuhkan dimensi genap
+        pad = 'pad=ceil(iw/2)*2:ceil(ih/2)*2'
+        if preview_path:
+            command += [
+                '-filter_complex', f"[0:v]{pad},split=2[full][small];[small]scale=-2:'min({preview_height},ih)'[preview]",
+                '-map', '[full]', *encode, '-crf', str(crf), output_path,
+                '-map', '[preview]', *encode, '-crf', str(preview_crf), preview_path,
+            ]
+        else:
+            command += ['-vf', pad, *encode, '-crf', str(crf), output_path]
+
+        # stderr ditampung di file agar pipe tidak penuh selama encode berjalan
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr
+            )
+        except OSError as e:
+            logger.error("Failed to start ffmpeg: %s", e)
+            self._process = None
+            self.failed = True
+            self.error = str(e)
+
+    def isOpened(self):
+        return self._process is not None and not self.failed
+
+    def write(self, frame):
+        if not self.isOpened():
+            return
+        try:
+            self._process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, ValueError) as e:
+            self.failed = True
+            self.error = str(e)
+
+    def release(self):
+        """Tutup pipe dan tunggu ffmpeg selesai. Mengembalikan True jika encode berhasil."""
+        if self._released:
+            return not self.failed
+        self._released = True
+
+        if self._process is None:
+            self._stderr.close()
+            return False
+
+        if self._process.stdin and not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                self.failed = True
+        returncode = self._process.wait()
+
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors='replace').strip()
+        self._stderr.close()
+
+        if returncode != 0:
+            self.failed = True
+            self.error = stderr or f"ffmpeg exited with code {returncode}"
+        if self.failed:
+            logger.error("Encoding error: %s", self.error)
+        return not self.failed
+
+
+def make_thumbnail(image, width=320):
+    """Perkecil gambar BGR ke lebar width (rasio tetap); gambar yang lebih kecil tidak diubah"""
+    height, source_width = image.shape[:2]
+    if source_width <= width:
+        return image
+    return cv2.resize(image, (width, max(1, round(height * width / source_width))), interpolation=cv2.INTER_AREA)
+
+def is_streamable(path):
+    """
+    True jika file bisa didecode berurutan dari awal tanpa menunggu akhir file:
+    MP4/MOV dengan atom moov sebelum mdat (faststart), AVI atau MPEG-TS.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if header[:4] == b'RIFF' or header[:1] == b'\x47':
+            return True
+
+        f.seek(0)
+        while True:
+            box = f.read(8)
+            if len(box) < 8:
+                return False
+            size, box_type = struct.unpack('>I4s', box)
+            if box_type == b'moov':
+                return True
+            if box_type == b'mdat' or size == 0:
+                return False
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0] - 8
+            f.seek(size - 8, 1)
+
+
+class GrowingFileCapture:
+    """
+    Capture untuk video yang masih di-upload. Byte file diteruskan ke ffmpeg lewat pipe
+    sambil mengikuti pertumbuhan file, hingga is_finished() mengembalikan
+    (True, ukuran_akhir) dan seluruh byte sudah terkirim, atau file tidak bertambah
+    selama stall_timeout detik. Resolusi, fps dan jumlah frame dibaca dengan OpenCV dari
+    bagian awal file, sehingga file harus streamable (lihat is_streamable).
+    Antarmukanya mengikuti cv2.VideoCapture (isOpened/get/read/grab/release).
+    """
+
+    def __init__(self, path, is_finished, poll_interval=0.5, stall_timeout=300.0, chunk_size=1024 * 1024):
+        self.path = path
+        self.is_finished = is_finished
+        self.poll_interval = poll_interval
+        self.stall_timeout = stall_timeout
+        self.chunk_size = chunk_size
+        self._process = None
+        self._feeder = None
+        self._stop = threading.Event()
+
+        probe = cv2.VideoCapture(path)
+        self.props = {prop: probe.get(prop) for prop in (
+            cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_COUNT
+        )}
+        probe.release()
+        self.width = int(self.props[cv2.CAP_PROP_FRAME_WIDTH])
+        self.height = int(self.props[cv2.CAP_PROP_FRAME_HEIGHT])
+        if self.width <= 0 or self.height <= 0:
+            return
+
+        command = [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-an',
+            # Satu frame keluaran untuk setiap frame video, tanpa duplikasi/drop
+            '-fps_mode', 'passthrough',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            'pipe:1',
+        ]
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr
+            )
+        except OSError as e:
+            logger.error("Failed to start ffmpeg: %s", e)
+            self._stderr.close()
+            return
+
+        self._feeder = threading.Thread(target=self._feed, name='upload-feeder', daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        try:
+            with open(self.path, 'rb') as f:
+                last_growth = time.monotonic()
+                while not self._stop.is_set():
+                    chunk = f.read(self.chunk_size)
+                    if chunk:
+                        self._process.stdin.write(chunk)
+                        last_growth = time.monotonic()
+                        continue
+
+                    finished, final_size = self.is_finished()
+                    if finished and f.tell() >= final_size:
+                        break
+                    if time.monotonic() - last_growth > self.stall_timeout:
+                        logger.warning("Upload stalled, decoding %s up to byte %d", self.path, f.tell())
+                        break
+                    self._stop.wait(self.poll_interval)
+        except (BrokenPipeError, ValueError, OSError):
+            pass
+        finally:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def isOpened(self):
+        return self._process is not None
+
+    def get(self, prop):
+        return self.props.get(prop, 0)
+
+    def read(self):
+        if self._process is None:
+            return False, None
+        frame_bytes = self.width * self.height * 3
+        buffer = bytearray(frame_bytes)
+        view = memoryview(buffer)
+        received = 0
+        while received < frame_bytes:
+            n = self._process.stdout.readinto(view[received:])
+            if not n:
+                return False, None
+            received += n
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def grab(self):
+        # Byte frame tetap harus dibaca dari pipe agar frame berikutnya sejajar
+        return self.read()[0]
+
+    def release(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._feeder.join()
+        self._process.stdout.close()
+        self._stderr.close()
+        self._process = None
+
+
+class FrameRangeCapture:
+    """
+    Baca frame start_frame..end_frame (nomor frame dari 1, inklusif; end_frame None berarti
+    sampai akhir video) dari sebuah file. Posisi awal dicari dengan CAP_PROP_POS_FRAMES:
+    decoder mulai dari keyframe terdekat lalu maju hingga frame yang diminta. Jika backend
+    tidak bisa seek dengan tepat, frame sebelumnya dilewati dengan grab() (tanpa konversi
+    warna) dari awal file. Antarmukanya mengikuti cv2.VideoCapture.
+    """
+
+    def __init__(self, path, start_frame=1, end_frame=None, capture_factory=cv2.VideoCapture):
+        self.capture = capture_factory(path)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.position = start_frame  # Nomor frame yang akan dikembalikan read() berikutnya
+        if self.capture.isOpened() and start_frame > 1:
+            self._seek(start_frame - 1)
+
+    def _seek(self, skip):
+        if self.capture.set(cv2.CAP_PROP_POS_FRAMES, skip) and int(self.capture.get(cv2.CAP_PROP_POS_FRAMES)) == skip:
+            return
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(skip):
+            if not self.capture.grab():
+                break
+
+    def seek(self, frame_index):
+        """
+        Lompat ke frame_index (read() berikutnya) lewat keyframe terdekat sebelumnya. False jika
+        backend tidak bisa seek dengan tepat; posisi dikembalikan dan pemanggil maju dengan grab().
+        """
+        if self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index - 1) and \
+                int(self.capture.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index - 1:
+            self.position = frame_index
+            return True
+        self._seek(self.position - 1)
+        return False
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def read(self):
+        if self.end_frame is not None and self.position > self.end_frame:
+            return False, None
+        ret, frame = self.capture.read()
+        if ret:
+            self.position += 1
+        return ret, frame
+
+    def grab(self):
+        """Lewati satu frame: didecode tetapi tanpa konversi warna ke BGR dan tanpa salinan"""
+        if self.end_frame is not None and self.position > self.end_frame:
+            return False
+        ret = self.capture.grab()
+        if ret:
+            self.position += 1
+        return ret
+
+    def release(self):
+        self.capture.release()
+
+
+class FFmpegVideoReader:
+    """
+    Decoder video lewat proses ffmpeg (binary bawaan imageio-ffmpeg) dengan antarmuka
+    FrameRangeCapture (isOpened/get/read/grab/seek/release, start_frame, end_frame).
+
+    max_width (opsional) memperkecil frame di dalam ffmpeg (filter scale, area) sebelum
+    dikonversi ke BGR dan dikirim lewat pipe, sehingga konversi warna, salinan pipe dan
+    alokasi array menyusut sebanding luas frame. hwaccel (mis. 'cuda', 'vaapi',
+    'videotoolbox', 'auto') meneruskan decode H.264/HEVC ke GPU/decoder hardware. get()
+    tetap melaporkan ukuran video sumber; ukuran frame yang dibaca ada di frame_size dan
+    faktor pengali koordinat frame ke sumber di scale.
+
+    Posisi awal (start_frame) dan seek() memakai input seeking ffmpeg: demuxer melompat ke
+    keyframe sebelum waktu frame lalu membuang frame hingga waktu tersebut; proses ffmpeg
+    dijalankan ulang, jadi seek hanya sepadan untuk lompatan jauh (lihat iter_frames).
+    Waktu frame dihitung dari fps (video dengan frame rate konstan).
+    """
+
+    def __init__(self, path, start_frame=1, end_frame=None, max_width=None, hwaccel=None):
+        self.path = path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.hwaccel = hwaccel
+        self.position = start_frame
+        self._process = None
+        self._stderr = None
+
+        probe = cv2.VideoCapture(path)
+        self.props = {prop: probe.get(prop) for prop in (
+            cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_COUNT
+        )}
+        probe.release()
+        width = int(self.props[cv2.CAP_PROP_FRAME_WIDTH])
+        height = int(self.props[cv2.CAP_PROP_FRAME_HEIGHT])
+        self.fps = self.props[cv2.CAP_PROP_FPS] or 30.0
+        self.frame_size = (width, height)
+        if max_width and 0 < max_width < width:
+            # Dimensi genap: beberapa format piksel hardware tidak menerima ukuran ganjil
+            scaled_width = max_width - max_width % 2
+            self.frame_size = (scaled_width, max(2, round(height * scaled_width / width / 2) * 2))
+        self.scale = width / self.frame_size[0] if width > 0 else 1.0
+        self._scratch = bytearray(self.frame_size[0] * self.frame_size[1] * 3)
+        if width > 0 and height > 0:
+            self._start(start_frame)
+
+    def _start(self, frame_index):
+        self._stop()
+        command = [imageio_ffmpeg.get_ffmpeg_exe(), '-loglevel', 'error', '-nostdin']
+        if self.hwaccel:
+            command += ['-hwaccel', self.hwaccel]
+        if frame_index > 1:
+            # Setengah frame sebelum waktu frame_index agar pembulatan timestamp tidak menggeser frame
+            command += ['-ss', f'{(frame_index - 1.5) / self.fps:.6f}']
+        command += ['-i', self.path, '-an', '-sn', '-fps_mode', 'passthrough']
+        if self.frame_size != (int(self.props[cv2.CAP_PROP_FRAME_WIDTH]), int(self.props[cv2.CAP_PROP_FRAME_HEIGHT])):
+            command += ['-vf', f'scale={self.frame_size[0]}:{self.frame_size[1]}:flags=area']
+        command += ['-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=self._stderr)
+        except OSError as e:
+            logger.error("Failed to start ffmpeg: %s", e)
+            self._process = None
+            self._stderr.close()
+            return False
+        self.position = frame_index
+        return True
+
+    def _stop(self):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stdout.close()
+        self._stderr.close()
+        self._process = None
+
+    def _read_into(self, buffer):
+        if self._process is None or (self.end_frame is not None and self.position > self.end_frame):
+            return False
+        view = memoryview(buffer)
+        received = 0
+        while received < len(buffer):
+            n = self._process.stdout.readinto(view[received:])
+            if not n:
+                return False
+            received += n
+        self.position += 1
+        return True
+
+    def isOpened(self):
+        return self._process is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position - 1
+        return self.props.get(prop, 0)
+
+    def read(self):
+        buffer = bytearray(len(self._scratch))
+        if not self._read_into(buffer):
+            return False, None
+        width, height = self.frame_size
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+    def grab(self):
+        """Lewati satu frame tanpa membuat array baru (buffer sementara dipakai ulang)"""
+        return self._read_into(self._scratch)
+
+    def seek(self, frame_index):
+        """Lanjutkan dari frame_index dengan menjalankan ulang ffmpeg dari keyframe terdekat"""
+        return self._start(frame_index)
+
+    def release(self):
+        self._stop()
+
+
+def iter_frames(capture, first_frame=1, next_decode=None, seek_frames=0, fps=None):
+    """
+    Iterasi frame capture sebagai (frame_index, timestamp, frame); frame_index dimulai dari
+    first_frame (nomor frame yang dibaca pertama) dan timestamp dalam detik dari awal video.
+
+    next_decode(frame_index) (opsional) mengembalikan nomor frame berikutnya yang benar-benar
+    perlu didecode (>= frame_index), mis. frame yang mungkin dipilih sampler. Frame di
+    antaranya tidak dikonversi ke BGR (grab()) dan dikembalikan dengan frame None, sehingga
+    urutan dan nomor frame tetap lengkap untuk pemanggil. Lompatan lebih dari seek_frames
+    frame (0 = tidak pernah) dilakukan dengan capture.seek() ke keyframe terdekat jika
+    capture mendukungnya; seek tidak dilakukan melewati jumlah frame yang diketahui.
+    """
+    if fps is None:
+        fps = (capture.get(cv2.CAP_PROP_FPS) if hasattr(capture, 'get') else 0) or 30.0
+    seek = getattr(capture, 'seek', None)
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if seek else 0
+    frame_index = first_frame
+    while True:
+        target = next_decode(frame_index) if next_decode else frame_index
+        if seek_frames and seek and target - frame_index > seek_frames and target <= total_frames and seek(target):
+            for skipped in range(frame_index, target):
+                yield skipped, (skipped - 1) / fps, None
+            frame_index = target
+        while frame_index < target:
+            if not capture.grab():
+                return
+            yield frame_index, (frame_index - 1) / fps, None
+            frame_index += 1
+        ret, frame = capture.read()
+        if not ret:
+            return
+        yield frame_index, (frame_index - 1) / fps, frame
+        frame_index += 1
+
+
+def concat_videos(paths, output_path):
+    """
+    Sambung beberapa MP4 dengan codec dan parameter encode yang sama menjadi satu file
+    tanpa encode ulang (concat demuxer ffmpeg, stream copy). Mengembalikan True jika berhasil.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as listing:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            listing.write(f"file '{escaped}'\n")
+
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(),
+        '-y', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', listing.name,
+        '-c', 'copy',
+        '-movflags', '+faststart',
+        output_path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(listing.name)
+    if result.returncode != 0:
+        logger.error("Concat error: %s", result.stderr.decode(errors='replace').strip())
+        return False
+    return True
+
+
+# Konversi video untuk kompatibilitas browser
+def convert_video_for_browser(input_path, output_path):
+    try:
+        from moviepy import VideoFileClip  # Jalur lama yang jarang dipakai, import-nya berat
+
+        clip = VideoFileClip(input_path)
+        clip.write_videofile(output_path, codec='libx264', audio=False, fps=clip.fps)
+        clip.close()
+        return True
+    except Exception as e:
+        print(f"Conversion error: {e}")
+        return False